@@ -0,0 +1,83 @@
+"""The productivity leaderboard of the admins.
+
+Each figure is one grouped query over its table, counting or summing the rows
+created in the period per admin, and the rows are merged per admin in Python. A
+leaderboard is cached per period: LEADERBOARD_CACHE_SECONDS for the current period,
+whose figures still move, and LEADERBOARD_CLOSED_CACHE_SECONDS for past ones."""
+from datetime import date, datetime, time, timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from core import metrics
+from core.models import Contract, ContractPOS, Costumer, MarketingGoal, MIDRevenue
+
+
+PERIODS = ('week', 'month', 'quarter', 'year')
+FIGURES = ('goals_created', 'goals_accepted', 'costumers_onboarded', 'contracts_signed', 'pos_deployed',
+           'income', 'profit')
+
+
+def period_bounds(period, day):
+    """The first day of the period containing the day and the first day after it"""
+    if period == 'week':
+        start = day - timedelta(days=day.weekday())
+        return start, start + timedelta(days=7)
+    if period == 'year':
+        return date(day.year, 1, 1), date(day.year + 1, 1, 1)
+    months = 3 if period == 'quarter' else 1
+    first_month = (day.month - 1) // months * months
+    start = date(day.year, first_month + 1, 1)
+    end_month = first_month + months
+    return start, date(day.year + end_month // 12, end_month % 12 + 1, 1)
+
+
+def midnight(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def grouped(queryset, user_field, **figures):
+    """Run one grouped query, returning {user id: {figure: value}}"""
+    rows = queryset.order_by().values(user_field).annotate(**figures)
+    return {row[user_field]: row for row in rows if row[user_field] is not None}
+
+
+def build(start, end):
+    created = {'created_at__gte': midnight(start), 'created_at__lt': midnight(end)}
+    tables = [
+        grouped(MarketingGoal.objects.filter(created_at__gte=start, created_at__lt=end), 'created_by',
+                goals_created=Count('id'), goals_accepted=Count('id', filter=Q(status='A'))),
+        grouped(Costumer.objects.visible().filter(**created), 'created_by', costumers_onboarded=Count('id')),
+        grouped(Contract.objects.visible().filter(**created), 'created_by', contracts_signed=Count('id')),
+        grouped(ContractPOS.objects.filter(**created), 'created_by', pos_deployed=Count('id')),
+        # the revenue of a contract goes to the admin who signed it
+        grouped(MIDRevenue.objects.filter(date__gte=midnight(start), date__lt=midnight(end)),
+                'contract__created_by', income=Sum('income'), profit=Sum('profit')),
+    ]
+    user_ids = set().union(*tables)
+    users = get_user_model().objects.filter(pk__in=user_ids).values('id', 'username', 'name')
+    admins = []
+    for user in users:
+        row = dict(user, **{figure: 0 for figure in FIGURES})
+        for table in tables:
+            figures = table.get(user['id'], {})
+            row.update((figure, figures[figure] or 0) for figure in FIGURES if figure in figures)
+        admins.append(row)
+    return admins
+
+
+def get_leaderboard(period, day):
+    """Return the period's bounds and figures per admin, from the cache if fresh"""
+    start, end = period_bounds(period, day)
+    key = 'leaderboard:%s:%s' % (period, start.isoformat())
+    admins = cache.get(key)
+    metrics.record_cache_lookup('leaderboard', admins is not None)
+    if admins is None:
+        admins = build(start, end)
+        closed = end <= timezone.localdate()
+        cache.set(key, admins, settings.LEADERBOARD_CLOSED_CACHE_SECONDS if closed
+                  else settings.LEADERBOARD_CACHE_SECONDS)
+    return {'period': period, 'start': start, 'end': end - timedelta(days=1), 'admins': admins}
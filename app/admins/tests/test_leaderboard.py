@@ -0,0 +1,101 @@
+from datetime import date, datetime, timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from admins.leaderboard import period_bounds
+from core.models import ContractPOS, MarketingGoal, MIDRevenue
+from core.testing import QueryBudgetMixin
+from crm.tests.test_costumers_contracts import create_contract, create_costumer, create_pos
+
+
+LEADERBOARD_URL = reverse('admins:leaderboard')
+
+
+class LeaderboardTest(QueryBudgetMixin, TestCase):
+    """Test the admin productivity leaderboard"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.manager = get_user_model().objects.create_superuser(username='manager', email='manager@test.com',
+                                                                 password='testpassword')
+        self.seller = get_user_model().objects.create_user(username='seller', email='seller@test.com',
+                                                           password='testpassword')
+        self.other = get_user_model().objects.create_user(username='other', email='other@test.com',
+                                                          password='testpassword')
+        self.client.force_authenticate(self.manager)
+
+        MarketingGoal.objects.create(trading_name='Goal 1', business_field='Food', status='A',
+                                     created_by=self.seller)
+        MarketingGoal.objects.create(trading_name='Goal 2', business_field='Food', status='P',
+                                     created_by=self.seller)
+        MarketingGoal.objects.create(trading_name='Goal 3', business_field='Food', status='P',
+                                     created_by=self.other)
+        costumer = create_costumer('Costumer', self.seller)
+        contract = create_contract(costumer, self.seller, '2026-01-01')
+        ContractPOS.objects.create(contract=contract, pos=create_pos('Model', self.other), price=50,
+                                   hardware_cost=10, software_cost=5, created_by=self.other)
+        MIDRevenue.objects.create(contract=contract, income=120, profit=30, date=timezone.now())
+        last_year = timezone.make_aware(datetime(timezone.localdate().year - 1, 6, 15))
+        MIDRevenue.objects.create(contract=contract, income=80, profit=20, date=last_year)
+
+    def test_staff_required(self):
+        """Only staff see the leaderboard"""
+        self.client.force_authenticate(self.seller)
+        response = self.client.get(LEADERBOARD_URL)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_leaderboard(self):
+        """The figures of the period are given per admin, ranked by the sorted figure"""
+        response = self.client.get(LEADERBOARD_URL)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['period'], 'month')
+        self.assertWithinQueryBudget(response)
+        seller, other = response.data['admins']
+        self.assertEqual(seller['username'], 'seller')
+        self.assertEqual((seller['goals_created'], seller['goals_accepted'], seller['costumers_onboarded'],
+                          seller['contracts_signed'], seller['pos_deployed']), (2, 1, 1, 1, 0))
+        self.assertEqual((seller['income'], seller['profit']), (120, 30))
+        self.assertEqual((other['goals_created'], other['pos_deployed'], other['income']), (1, 1, 0))
+
+        response = self.client.get(LEADERBOARD_URL, {'sort': 'pos_deployed'})
+        self.assertEqual([admin['username'] for admin in response.data['admins']], ['other', 'seller'])
+
+    def test_cached_per_period(self):
+        """A period is built once and served from the cache until it expires"""
+        self.client.get(LEADERBOARD_URL)
+        MarketingGoal.objects.create(trading_name='Goal 4', business_field='Food', status='P',
+                                     created_by=self.other)
+        response = self.client.get(LEADERBOARD_URL, {'sort': 'goals_created'})
+        self.assertWithinQueryBudget(response, 0)
+        self.assertEqual(response.data['admins'][1]['goals_created'], 1)
+
+        response = self.client.get(LEADERBOARD_URL, {'period': 'year', 'sort': 'goals_created'})
+        self.assertEqual([admin['goals_created'] for admin in response.data['admins']], [2, 2])
+
+    def test_past_period(self):
+        """A past period only counts its own rows"""
+        last_year = timezone.localdate().replace(month=1, day=1) - timedelta(days=1)
+        response = self.client.get(LEADERBOARD_URL, {'period': 'year', 'date': last_year.isoformat()})
+        self.assertEqual(response.data['start'], date(last_year.year, 1, 1))
+        income = {admin['username']: admin['income'] for admin in response.data['admins']}
+        self.assertEqual(income, {'seller': 80})
+
+    def test_period_bounds(self):
+        """Weeks start on Monday, quarters every three months"""
+        self.assertEqual(period_bounds('week', date(2026, 10, 18)), (date(2026, 10, 12), date(2026, 10, 19)))
+        self.assertEqual(period_bounds('month', date(2026, 12, 5)), (date(2026, 12, 1), date(2027, 1, 1)))
+        self.assertEqual(period_bounds('quarter', date(2026, 11, 5)), (date(2026, 10, 1), date(2027, 1, 1)))
+        self.assertEqual(period_bounds('year', date(2026, 11, 5)), (date(2026, 1, 1), date(2027, 1, 1)))
+
+    def test_invalid_parameters(self):
+        """The period, date and sort are validated"""
+        for params in ({'period': 'decade'}, {'date': '18/10/2026'}, {'sort': 'password'}):
+            response = self.client.get(LEADERBOARD_URL, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -5,11 +5,21 @@ from rest_framework.response import Response
 from rest_framework.settings import api_settings
 from rest_framework.views import APIView
 from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import ValidationError
+
+import io
+import os
+import pstats
 
 from django.contrib.auth import get_user_model
-from django.http import Http404
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from django.http import FileResponse, Http404, HttpResponse
 
+from admins import leaderboard
 from admins.serializers import AdminSerializer, AuthTokenSerializer, ProfileSerializer
+from core import metrics
+from core.middleware import profile_path
 from core.models import User
 
 class CreateAdminView(generics.CreateAPIView):
@@ -27,7 +37,11 @@ class CreateTokenView(ObtainAuthToken):
     def post(self, request, *args, **kwargs):
         serializer = self.serializer_class(data=request.data,
                                            context={'request': request})
-        serializer.is_valid(raise_exception=True)
+        try:
+            serializer.is_valid(raise_exception=True)
+        except ValidationError:
+            metrics.AUTH_FAILURES.inc()
+            raise
         user = serializer.validated_data['user']
         serialize_user = AdminSerializer(user)
         token, created = Token.objects.get_or_create(user=user)
@@ -53,7 +67,7 @@ class ListUsersView(generics.ListAPIView):
     serializer_class = AdminSerializer
     authentication_classes = (authentication.TokenAuthentication,)
     permission_classes = (permissions.IsAdminUser,)
-    queryset = get_user_model().objects.all()
+    queryset = get_user_model().objects.select_related('nationality')
 
     def filter_queryset(self,queryset):
         """To order by name"""
@@ -92,3 +106,49 @@ class AdminProfileAPIView(generics.RetrieveAPIView):
     authentication_classes = (authentication.TokenAuthentication,)
     permission_classes = (permissions.IsAuthenticated,)
     queryset = get_user_model().objects.all()
+
+
+class RequestProfileView(APIView):
+    """The API view for staff to download a stored request profile"""
+    authentication_classes = (authentication.TokenAuthentication,)
+    permission_classes = (permissions.IsAdminUser,)
+
+    def get(self, request, profile_id):
+        """Return the pstats dump, or a text summary with ?output=text"""
+        path = profile_path(profile_id)
+        if not os.path.exists(path):
+            raise Http404
+        if request.query_params.get('output') == 'text':
+            output = io.StringIO()
+            stats = pstats.Stats(path, stream=output)
+            stats.sort_stats('cumulative').print_stats(50)
+            return HttpResponse(output.getvalue(), content_type='text/plain')
+        return FileResponse(open(path, 'rb'), as_attachment=True, filename='%s.prof' % profile_id)
+
+
+class LeaderboardView(APIView):
+    """The figures of every admin over a period, best first.
+
+    `period` is week, month (the default), quarter or year, `date` any day of the
+    period (today by default) and `sort` the figure ranking the admins."""
+    authentication_classes = (authentication.TokenAuthentication,)
+    permission_classes = (permissions.IsAdminUser,)
+
+    def get(self, request):
+        period = request.query_params.get('period', 'month')
+        if period not in leaderboard.PERIODS:
+            raise ValidationError({'period': 'One of %s.' % ', '.join(leaderboard.PERIODS)})
+        day = timezone.localdate()
+        if request.query_params.get('date'):
+            try:
+                day = parse_date(request.query_params['date'])
+            except ValueError:
+                day = None
+            if day is None:
+                raise ValidationError({'date': 'A date as YYYY-MM-DD is required.'})
+        sort = request.query_params.get('sort', 'contracts_signed')
+        if sort not in leaderboard.FIGURES:
+            raise ValidationError({'sort': 'One of %s.' % ', '.join(leaderboard.FIGURES)})
+        board = leaderboard.get_leaderboard(period, day)
+        board['admins'] = sorted(board['admins'], key=lambda admin: (-admin[sort], admin['username']))
+        return Response(board)
@@ -2,6 +2,8 @@
 ASGI config for app project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Besides Django it serves the server-sent events stream of the goal changes
+(crm.stream), which needs to stream from the event loop.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/3.1/howto/deployment/asgi/
@@ -13,4 +15,12 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from crm import stream  # noqa: E402, needs the apps loaded by get_asgi_application
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http' and scope['path'] == stream.PATH:
+        return await stream.goal_stream(scope, receive, send)
+    return await django_application(scope, receive, send)
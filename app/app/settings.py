@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/3.1/ref/settings/
 """
 
 import os
+from datetime import timedelta
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -47,12 +48,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.QueryCountMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.ProfilingMiddleware',
+    'core.middleware.ReplicaPinningMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -91,6 +95,43 @@ DATABASES = {
     }
 }
 
+# Read replicas, comma separated hosts of streaming replicas of the default database.
+# Safe requests read from them through core.db_routers.ReplicaRouter.
+DATABASE_REPLICAS = []
+for index, host in enumerate(filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(','))):
+    alias = 'replica_%d' % index
+    DATABASES[alias] = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'HOST': host.strip(),
+        'NAME': os.environ.get('DB_REPLICA_NAME', os.environ.get('DB_NAME')),
+        'USER': os.environ.get('DB_REPLICA_USER', os.environ.get('DB_USER')),
+        'PASSWORD': os.environ.get('DB_REPLICA_PASS', os.environ.get('DB_PASS')),
+        'TEST': {
+            'MIRROR': 'default',
+        },
+    }
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['core.db_routers.ReplicaRouter']
+
+# Seconds a client keeps reading from the primary after it wrote
+DATABASE_REPLICA_PIN_SECONDS = int(os.environ.get('DB_REPLICA_PIN_SECONDS', 5))
+
+# Caches. The default cache is local to each process, for the caches whose staleness is
+# bounded by their timeout. The shared cache is seen by every process and worker, for
+# the state they must agree on, like the replica pins of core.db_routers. It is a table
+# of the primary database, created by `manage.py createcachetable`, unless pointed at a
+# memcached with SHARED_CACHE_BACKEND and SHARED_CACHE_LOCATION.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'shared': {
+        'BACKEND': os.environ.get('SHARED_CACHE_BACKEND', 'django.core.cache.backends.db.DatabaseCache'),
+        'LOCATION': os.environ.get('SHARED_CACHE_LOCATION', 'django_cache'),
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.1/ref/settings/#auth-password-validators
@@ -134,3 +175,131 @@ AUTH_USER_MODEL = 'core.User'
 
 # Corse 
 CORS_ORIGIN_ALLOW_ALL = True
+
+# Per-request instrumentation
+# The maximum number of queries each endpoint (resolved URL name) may run on the safe
+# methods, and on the other methods under (URL name, method) keys, checked by
+# core.testing.QueryBudgetMixin and logged by core.middleware.QueryCountMiddleware
+QUERY_BUDGETS = {
+    'admins:list': 2,
+    'admins:me': 4,
+    'admins:leaderboard': 6,
+    'crm:marketinggoal-list': 2,
+    'crm:marketinggoal-detail': 5,
+    'crm:marketinggoal-board': 10,
+    'crm:contract-list': 2,
+    'crm:contract-detail': 5,
+    'crm:contract-pos': 5,
+    'crm:contract-service': 5,
+    'crm:contract-paperroll': 4,
+    'crm:contract-payment': 4,
+    'crm:contract-mid': 4,
+    'crm:pci-worklist': 2,
+    'crm:contract-expiring': 2,
+    'crm:paper-roll-forecast': 2,
+    'crm:contract-mid-forecast': 2,
+    'crm:mid-forecast': 2,
+    ('crm:mid-forecast', 'POST'): 2,
+}
+
+# Prometheus metrics
+# Optional bearer token the scraper must send to /metrics
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+# Slow query log
+# Queries slower than the threshold are logged with their EXPLAIN plan by core.slow_queries
+SLOW_QUERY_THRESHOLD_MS = float(os.environ.get('SLOW_QUERY_THRESHOLD_MS', 500))
+SLOW_QUERY_EXPLAIN_ANALYZE = os.environ.get('SLOW_QUERY_EXPLAIN_ANALYZE') == '1'
+SLOW_QUERY_LOG_FILE = os.environ.get('SLOW_QUERY_LOG_FILE')
+
+# Background jobs (core.jobs)
+# How many jobs of each queue may run at once across all the workers,
+# queues not listed here use JOB_DEFAULT_CONCURRENCY
+JOB_QUEUES = {
+    'imports': int(os.environ.get('JOB_IMPORTS_CONCURRENCY', 2)),
+}
+JOB_DEFAULT_CONCURRENCY = int(os.environ.get('JOB_DEFAULT_CONCURRENCY', 4))
+# Seconds before the first retry of a failed job, doubled on every further attempt
+JOB_RETRY_BACKOFF = int(os.environ.get('JOB_RETRY_BACKOFF', 10))
+# Seconds after which a running job is considered abandoned by a dead worker
+JOB_TIMEOUT = int(os.environ.get('JOB_TIMEOUT', 3600))
+# Seconds between two checks of run_workers for the jobs of dead workers
+JOB_REQUEUE_INTERVAL = int(os.environ.get('JOB_REQUEUE_INTERVAL', 60))
+
+# How long the responses of create requests with an Idempotency-Key are replayed
+IDEMPOTENCY_KEY_TTL = timedelta(hours=int(os.environ.get('IDEMPOTENCY_KEY_TTL_HOURS', 24)))
+
+# Days the superseded changes and the tombstones stay in the sync change log (core.sync)
+CHANGE_RETENTION_DAYS = int(os.environ.get('CHANGE_RETENTION_DAYS', 90))
+# Rows deleted per transaction by the background deletion of costumers and contracts
+DELETION_BATCH_SIZE = int(os.environ.get('DELETION_BATCH_SIZE', 1000))
+
+# Server-sent events stream of the goal changes (crm.stream, served over ASGI only).
+# Seconds between keep-alive comments, seconds between polls of the change log where
+# LISTEN/NOTIFY is not available, and most events replayed to a resuming client.
+GOAL_STREAM_HEARTBEAT = int(os.environ.get('GOAL_STREAM_HEARTBEAT', 15))
+GOAL_STREAM_POLL_INTERVAL = float(os.environ.get('GOAL_STREAM_POLL_INTERVAL', 2))
+GOAL_STREAM_BACKLOG = int(os.environ.get('GOAL_STREAM_BACKLOG', 1000))
+
+# Seconds the goal pipeline board is cached, goal writes invalidate it before that
+GOAL_BOARD_CACHE_SECONDS = int(os.environ.get('GOAL_BOARD_CACHE_SECONDS', 60))
+
+# Lead list imports: largest file accepted, and rows validated and inserted per batch
+GOAL_IMPORT_MAX_BYTES = int(os.environ.get('GOAL_IMPORT_MAX_BYTES', 20 * 1024 * 1024))
+GOAL_IMPORT_BATCH_SIZE = int(os.environ.get('GOAL_IMPORT_BATCH_SIZE', 1000))
+
+# Contracts whose PCI-DSS date is this many days away or passed are on the PCI worklist
+PCI_DUE_DAYS = int(os.environ.get('PCI_DUE_DAYS', 30))
+
+# Contract renewals: default days ahead listed as expiring, and most contracts renewed at once
+CONTRACT_EXPIRING_DAYS = int(os.environ.get('CONTRACT_EXPIRING_DAYS', 60))
+CONTRACT_RENEWAL_MAX = int(os.environ.get('CONTRACT_RENEWAL_MAX', 500))
+
+# Paper roll forecast (crm.forecasting): days before a costumer runs out that its next
+# order is due, whether the scheduled forecast creates draft orders, and for the orders
+# due within how many days
+PAPER_ROLL_LEAD_DAYS = int(os.environ.get('PAPER_ROLL_LEAD_DAYS', 7))
+PAPER_ROLL_DRAFT_ORDERS = os.environ.get('PAPER_ROLL_DRAFT_ORDERS') == '1'
+PAPER_ROLL_DRAFT_DAYS = int(os.environ.get('PAPER_ROLL_DRAFT_DAYS', 14))
+
+# MID revenue forecast (crm.forecasting): full months of history fitted, fewest months
+# of history projected from it rather than from the card turnover, and contracts per batch
+MID_FORECAST_HISTORY_MONTHS = int(os.environ.get('MID_FORECAST_HISTORY_MONTHS', 36))
+MID_FORECAST_MIN_MONTHS = int(os.environ.get('MID_FORECAST_MIN_MONTHS', 3))
+MID_FORECAST_BATCH_SIZE = int(os.environ.get('MID_FORECAST_BATCH_SIZE', 2000))
+
+# Seconds the admin leaderboard of the current period and of past periods are cached
+LEADERBOARD_CACHE_SECONDS = int(os.environ.get('LEADERBOARD_CACHE_SECONDS', 300))
+LEADERBOARD_CLOSED_CACHE_SECONDS = int(os.environ.get('LEADERBOARD_CLOSED_CACHE_SECONDS', 24 * 3600))
+
+# On-demand request profiling for staff users
+PROFILE_DIR = os.environ.get('PROFILE_DIR', os.path.join(BASE_DIR, 'profiles'))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'json': {
+            '()': 'core.slow_queries.JSONFormatter',
+        },
+    },
+    'handlers': {
+        'slow_queries': {
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': SLOW_QUERY_LOG_FILE,
+            'maxBytes': 10 * 1024 * 1024,
+            'backupCount': 5,
+            'formatter': 'json',
+        } if SLOW_QUERY_LOG_FILE else {
+            'class': 'logging.StreamHandler',
+            'formatter': 'json',
+        },
+    },
+    'loggers': {
+        'core.slow_queries': {
+            'handlers': ['slow_queries'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
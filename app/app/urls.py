@@ -16,8 +16,14 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 
+from core import views as core_views
+
 urlpatterns = [
+    path('metrics', core_views.metrics_view, name='metrics'),
+    path('healthz', core_views.liveness_view, name='healthz'),
+    path('readyz', core_views.readiness_view, name='readyz'),
     path('admin/', admin.site.urls),
     path('api/admins/', include('admins.urls')),
-    path('api/crm/', include('crm.urls'))
+    path('api/crm/', include('crm.urls')),
+    path('api/core/', include('core.urls'))
 ]
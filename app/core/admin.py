@@ -1,8 +1,11 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.core.paginator import Paginator
+from django.db import connections, transaction
+from django.utils.functional import cached_property
 from django.utils.translation import gettext as _
 
-from core import models
+from core import models, sync
 
 class UserAdmin(BaseUserAdmin):
     ordering = ['id']
@@ -29,20 +32,140 @@ class UserAdmin(BaseUserAdmin):
             )
         })
     )
-    
+
+
+class ApproximateCountPaginator(Paginator):
+    """Paginator taking the row count of big unfiltered tables from the planner statistics.
+
+    COUNT(*) reads the whole table on PostgreSQL; pg_class.reltuples is the estimate
+    kept by ANALYZE, close enough for the page links of a changelist."""
+    threshold = 100000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor == 'postgresql' and not queryset.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                               [queryset.model._meta.db_table])
+                row = cursor.fetchone()
+            if row and row[0] >= self.threshold:
+                return int(row[0])
+        return super().count
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Admin of a table too big for full counts and select widgets over its relations"""
+    paginator = ApproximateCountPaginator
+    show_full_result_count = False
+    raw_id_fields = ('created_by',)
+
+
+class CostumerAdmin(LargeTableAdmin):
+    list_display = ('trading_name', 'legal_name', 'business_type', 'company_number', 'created_at')
+    list_filter = ('business_type', 'legal_entity')
+    search_fields = ('trading_name', 'legal_name', '=company_number')
+    date_hierarchy = 'created_at'
+    raw_id_fields = ('created_by', 'last_updated_by')
+
+
+class TradingAddressAdmin(LargeTableAdmin):
+    list_display = ('address', 'costumer')
+    list_select_related = ('costumer',)
+    autocomplete_fields = ('costumer',)
+    raw_id_fields = ()
+
+
+class ContractAdmin(LargeTableAdmin):
+    list_display = ('__str__', 'm_id', 'start_date', 'end_date', 'pci_due_date')
+    list_select_related = ('costumer',)
+    list_filter = ('acquire_name',)
+    search_fields = ('m_id', 'costumer__trading_name')
+    date_hierarchy = 'start_date'
+    autocomplete_fields = ('costumer', 'renewed_from')
+
+
+class PaperRollAdmin(LargeTableAdmin):
+    list_display = ('costumer', 'amount', 'price', 'ordered_date', 'is_draft')
+    list_select_related = ('costumer',)
+    list_filter = ('is_draft',)
+    date_hierarchy = 'ordered_date'
+    autocomplete_fields = ('costumer',)
+    actions = ['confirm_drafts']
+
+    def confirm_drafts(self, request, queryset):
+        """Turn the draft orders of the paper roll forecast into real orders"""
+        ids = list(queryset.filter(is_draft=True).values_list('id', flat=True))
+        with transaction.atomic():
+            models.PaperRoll.objects.filter(id__in=ids).update(is_draft=False)
+            sync.record_changes(models.PaperRoll, ids, 'U')
+        self.message_user(request, _('%d draft orders confirmed.') % len(ids))
+    confirm_drafts.short_description = _('Confirm the selected draft orders')
+
+
+class PaymentAdmin(LargeTableAdmin):
+    list_display = ('contract', 'date', 'direct_debit_cost')
+    list_select_related = ('contract__costumer',)
+    date_hierarchy = 'date'
+    autocomplete_fields = ('contract',)
+
+
+class MIDRevenueAdmin(LargeTableAdmin):
+    list_display = ('contract', 'date', 'income', 'profit')
+    list_select_related = ('contract__costumer',)
+    date_hierarchy = 'date'
+    autocomplete_fields = ('contract',)
+
+
+class ContractPOSAdmin(LargeTableAdmin):
+    list_display = ('contract', 'pos', 'price')
+    list_select_related = ('contract__costumer', 'pos')
+    autocomplete_fields = ('contract', 'pos')
+
+
+class ContractServiceAdmin(LargeTableAdmin):
+    list_display = ('contract', 'service', 'price')
+    list_select_related = ('contract__costumer', 'service')
+    autocomplete_fields = ('contract',)
+
+
+class POSAdmin(LargeTableAdmin):
+    list_display = ('serial_number', 'model', 'type', 'is_active')
+    list_select_related = ('model',)
+    search_fields = ('serial_number',)
+
+
+class MarketingGoalAdmin(LargeTableAdmin):
+    list_display = ('trading_name', 'business_field', 'status', 'created_at')
+    list_filter = ('status',)
+    search_fields = ('trading_name',)
+    date_hierarchy = 'created_at'
+    raw_id_fields = ('created_by', 'last_update')
+
+
+class ChangeAdmin(LargeTableAdmin):
+    list_display = ('seq', 'model', 'object_id', 'action', 'changed_at')
+    list_filter = ('model', 'action')
+    raw_id_fields = ()
+
 
 admin.site.register(models.User, UserAdmin)
 admin.site.register(models.Country)
 admin.site.register(models.VirtualService)
-admin.site.register(models.MarketingGoal)
+admin.site.register(models.MarketingGoal, MarketingGoalAdmin)
 admin.site.register(models.POSCompany)
 admin.site.register(models.PosModel)
-admin.site.register(models.POS)
-admin.site.register(models.Costumer)
-admin.site.register(models.TradingAddress)
-admin.site.register(models.Contract)
-admin.site.register(models.PaperRoll)
-admin.site.register(models.Payment)
-admin.site.register(models.MIDRevenue)
-admin.site.register(models.ContractPOS)
-admin.site.register(models.ContractService)
+admin.site.register(models.POS, POSAdmin)
+admin.site.register(models.Costumer, CostumerAdmin)
+admin.site.register(models.TradingAddress, TradingAddressAdmin)
+admin.site.register(models.Contract, ContractAdmin)
+admin.site.register(models.PaperRoll, PaperRollAdmin)
+admin.site.register(models.Payment, PaymentAdmin)
+admin.site.register(models.MIDRevenue, MIDRevenueAdmin)
+admin.site.register(models.ContractPOS, ContractPOSAdmin)
+admin.site.register(models.ContractService, ContractServiceAdmin)
+admin.site.register(models.Job)
+admin.site.register(models.IdempotencyKey)
+admin.site.register(models.Change, ChangeAdmin)
+admin.site.register(models.Checkpoint)
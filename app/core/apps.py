@@ -1,5 +1,13 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+from django.utils.module_loading import autodiscover_modules
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from core import slow_queries, sync
+        connection_created.connect(slow_queries.install, dispatch_uid='core.slow_queries')
+        sync.connect_signals()
+        autodiscover_modules('tasks')
@@ -0,0 +1,71 @@
+"""Conditional GET support for the API views.
+
+The ETag of a representation is derived from a few version columns (`version`,
+`updated_at`) read with one cheap query, so an If-None-Match or If-Modified-Since
+request is answered with 304 before the object is loaded or serialized."""
+import hashlib
+
+from django.db.models import Count, Max, Sum
+from django.http import Http404
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+def make_etag(view, values):
+    """Return a quoted ETag for the versions of what the view represents with the query parameters"""
+    seed = '%s:%s:%s' % (type(view).__name__, view.request.GET.urlencode(), values)
+    return quote_etag(hashlib.md5(seed.encode()).hexdigest())
+
+
+def conditional_response(request, response_func, etag, last_modified=None):
+    """Answer 304/412 when the client's copy is current, else build and tag the response"""
+    timestamp = int(last_modified.timestamp()) if last_modified is not None else None
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if response is None:
+        response = response_func()
+    if request.method in ('GET', 'HEAD') and response.status_code in (200, 304):
+        response['ETag'] = etag
+        if timestamp is not None:
+            response['Last-Modified'] = http_date(timestamp)
+        response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+class ConditionalRetrieveMixin:
+    """Add ETag and Last-Modified to retrieve, answering 304 from a single version query.
+
+    `version_fields` lists the columns (related ones included) whose values change
+    whenever the representation changes, `last_modified_field` the one holding the
+    modification time, if the model has one."""
+    version_fields = ('version',)
+    last_modified_field = None
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        fields = list(self.version_fields)
+        if self.last_modified_field and self.last_modified_field not in fields:
+            fields.append(self.last_modified_field)
+        row = (self.get_queryset().order_by()
+               .filter(**{self.lookup_field: kwargs[lookup_url_kwarg]})
+               .values(*fields).first())
+        if row is None:
+            raise Http404
+        last_modified = row[self.last_modified_field] if self.last_modified_field else None
+        etag = make_etag(self, sorted(row.items()))
+        return conditional_response(request, lambda: super(ConditionalRetrieveMixin, self).retrieve(
+            request, *args, **kwargs), etag, last_modified)
+
+
+class ConditionalListMixin:
+    """Add an ETag to list, derived from one aggregate query over the listed rows.
+
+    Override `list_version_aggregates` to include related rows shown in the list."""
+
+    def list_version_aggregates(self):
+        return {'count': Count('id'), 'last_id': Max('id'), 'versions': Sum('version')}
+
+    def list(self, request, *args, **kwargs):
+        versions = self.get_queryset().order_by().aggregate(**self.list_version_aggregates())
+        etag = make_etag(self, sorted(versions.items()))
+        return conditional_response(request, lambda: super(ConditionalListMixin, self).list(
+            request, *args, **kwargs), etag)
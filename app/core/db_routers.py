@@ -0,0 +1,67 @@
+import hashlib
+import random
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from core.instrumentation import get_current_request
+
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def client_key(request):
+    """Return a cache key identifying the client behind the request, if it can be identified"""
+    credentials = request.META.get('HTTP_AUTHORIZATION') or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    if not credentials:
+        return None
+    return 'db-pin:%s' % hashlib.sha1(credentials.encode()).hexdigest()
+
+
+def pin_to_primary(request):
+    """Send the reads of the client to the primary for a while after it wrote"""
+    key = client_key(request)
+    if key is not None:
+        caches['shared'].set(key, True, settings.DATABASE_REPLICA_PIN_SECONDS)
+    request._pinned_to_primary = True
+
+
+def is_pinned_to_primary(request):
+    """Check, once per request, whether the client wrote recently, through any process"""
+    pinned = getattr(request, '_pinned_to_primary', None)
+    if pinned is None:
+        key = client_key(request)
+        pinned = key is not None and bool(caches['shared'].get(key))
+        request._pinned_to_primary = pinned
+    return pinned
+
+
+class ReplicaRouter:
+    """Database router sending the reads of safe requests to the replicas.
+
+    Writes, reads inside transactions, reads outside of requests (commands, workers)
+    and reads of clients that wrote in the last DATABASE_REPLICA_PIN_SECONDS go to
+    the primary, as do the reads of the database cache, which holds the pins."""
+
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        if not replicas or model._meta.app_label == 'django_cache':
+            return None
+        request = get_current_request()
+        if request is None or request.method not in SAFE_METHODS:
+            return None
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block or is_pinned_to_primary(request):
+            return None
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        """The replicas hold the same rows as the primary"""
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        """The replicas receive the schema through replication"""
+        return db == DEFAULT_DB_ALIAS
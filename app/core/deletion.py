@@ -0,0 +1,109 @@
+"""Background deletion of big object graphs.
+
+Django's collector loads every row of a cascade into memory and deletes it all in one
+transaction. Here the object is hidden at once (`deletion_requested_at`) and a job
+deletes its graph from the leaves up, in batches of DELETION_BATCH_SIZE rows removed
+with set-based DELETE ... WHERE id IN statements, each batch its own transaction.
+A retried job resumes where the failed attempt stopped."""
+from django.conf import settings
+from django.db import models, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.reverse import reverse
+
+from core import jobs, sync
+
+
+class DeletionPlanError(Exception):
+    pass
+
+
+def deletion_plan(model, path='', seen=()):
+    """List the (model, lookup of the root, action) steps deleting a graph, leaves first.
+
+    The action is 'delete' for the rows cascaded to, or the name of the foreign key to
+    set to NULL. Relations protected or set to other values can not be handled."""
+    steps = []
+    seen = seen + (model,)
+    for relation in model._meta.get_fields(include_hidden=True):
+        if not (relation.one_to_many or relation.one_to_one) or not relation.auto_created or relation.concrete:
+            continue
+        on_delete = relation.on_delete
+        lookup = relation.field.name + ('__' + path if path else '')
+        if on_delete is models.CASCADE:
+            if relation.related_model in seen:
+                raise DeletionPlanError('%s cascades back to itself' % relation.related_model.__name__)
+            steps.extend(deletion_plan(relation.related_model, lookup, seen))
+            steps.append((relation.related_model, lookup, 'delete'))
+        elif on_delete is models.SET_NULL:
+            steps.append((relation.related_model, lookup, relation.field.name))
+        elif on_delete is not models.DO_NOTHING:
+            raise DeletionPlanError('%s.%s can not be handled in the background' % (
+                relation.related_model.__name__, relation.field.name))
+    return steps
+
+
+def delete_batch(model, queryset):
+    """Delete one batch of the rows matched, returning how many were deleted"""
+    with transaction.atomic():
+        if model in sync.PARENT_FIELDS:
+            rows = list(queryset.values_list('pk', sync.PARENT_FIELDS[model])[:settings.DELETION_BATCH_SIZE])
+            ids, parent_ids = [pk for pk, _ in rows], [parent_id for _, parent_id in rows]
+        else:
+            ids = list(queryset.values_list('pk', flat=True)[:settings.DELETION_BATCH_SIZE])
+            parent_ids = None
+        if ids:
+            if model in sync.SYNCED_MODELS:
+                sync.record_changes(model, ids, 'D', parent_ids)
+            model._base_manager.filter(pk__in=ids)._raw_delete(queryset.db)
+    return len(ids)
+
+
+def null_batch(model, queryset, field_name):
+    """Set a foreign key to NULL on one batch of the rows matched"""
+    with transaction.atomic():
+        ids = list(queryset.values_list('pk', flat=True)[:settings.DELETION_BATCH_SIZE])
+        if ids:
+            model._base_manager.filter(pk__in=ids).update(**{field_name: None})
+    return len(ids)
+
+
+def delete_graph(job, model, pk):
+    """Delete an object and everything cascading from it in batches, reporting the progress"""
+    steps = deletion_plan(model) + [(model, 'pk', 'delete')]
+    done = 0
+    for related_model, lookup, action in steps:
+        queryset = related_model._base_manager.filter(**{lookup: pk}).order_by()
+        while True:
+            if action == 'delete':
+                count = delete_batch(related_model, queryset)
+            else:
+                count = null_batch(related_model, queryset, action)
+            if not count:
+                break
+            done += count
+            jobs.report_progress(job, model=related_model._meta.model_name, rows=done)
+    return {'rows': done}
+
+
+def request_deletion(instance, created_by=None):
+    """Hide the object from the APIs and enqueue the job deleting it"""
+    from core.tasks import delete_graph as delete_graph_task
+    model = type(instance)
+    deletion_plan(model)
+    with transaction.atomic():
+        model.objects.filter(pk=instance.pk).update(deletion_requested_at=timezone.now())
+        if model in sync.SYNCED_MODELS:
+            sync.record_changes(model, [instance.pk], 'D')
+        return jobs.enqueue(delete_graph_task, model._meta.label, instance.pk, created_by=created_by)
+
+
+class AsyncDestroyMixin:
+    """Answer DELETE with 202 and a job deleting the object in the background"""
+
+    def destroy(self, request, *args, **kwargs):
+        job = request_deletion(self.get_object(), created_by=request.user)
+        location = reverse('core:job-detail', args=[job.id], request=request)
+        return Response({'job': job.id, 'status': location}, status=status.HTTP_202_ACCEPTED,
+                        headers={'Location': location})
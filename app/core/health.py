@@ -0,0 +1,16 @@
+"""Readiness checks shared by the wait_for_db command and the probe endpoints"""
+from django.db import connections
+from django.db.migrations.executor import MigrationExecutor
+
+
+def check_database(alias='default'):
+    """Make a round trip to the database, raising OperationalError if it is not reachable"""
+    with connections[alias].cursor() as cursor:
+        cursor.execute('SELECT 1')
+        cursor.fetchone()
+
+
+def pending_migrations(alias='default'):
+    """Return the migrations not applied yet to the database"""
+    executor = MigrationExecutor(connections[alias])
+    return executor.migration_plan(executor.loader.graph.leaf_nodes())
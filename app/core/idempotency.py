@@ -0,0 +1,64 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from core.models import IdempotencyKey
+
+
+HEADER = 'HTTP_IDEMPOTENCY_KEY'
+
+
+def fingerprint(request):
+    """Hash the method, path and body of a request to detect keys reused for another request"""
+    body = json.dumps(request.data, sort_keys=True, default=str)
+    return hashlib.sha256(('%s %s %s' % (request.method, request.path, body)).encode()).hexdigest()
+
+
+class IdempotentCreateMixin:
+    """Honor the Idempotency-Key header on create.
+
+    The first response is stored for IDEMPOTENCY_KEY_TTL and replayed on retries with
+    the same key. The key row is locked for the whole create, so a concurrent duplicate
+    waits for the first request and then gets its response instead of writing again."""
+
+    def create(self, request, *args, **kwargs):
+        key = request.META.get(HEADER)
+        if not key:
+            return super().create(request, *args, **kwargs)
+        if len(key) > 255:
+            return Response({'detail': 'Idempotency-Key is too long.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        request_fingerprint = fingerprint(request)
+        now = timezone.now()
+        with transaction.atomic():
+            record, created = IdempotencyKey.objects.select_for_update().get_or_create(
+                user=request.user, key=key,
+                defaults={'fingerprint': request_fingerprint, 'expires_at': now + settings.IDEMPOTENCY_KEY_TTL}
+            )
+            if not created and record.expires_at > now and record.response_status is not None:
+                if record.fingerprint != request_fingerprint:
+                    return Response({'detail': 'Idempotency-Key was already used for another request.'},
+                                    status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+                response = Response(record.response_body, status=record.response_status)
+                response['Idempotent-Replayed'] = 'true'
+                return response
+
+            response = super().create(request, *args, **kwargs)
+            record.fingerprint = request_fingerprint
+            record.expires_at = now + settings.IDEMPOTENCY_KEY_TTL
+            record.response_status = response.status_code
+            record.response_body = json.loads(JSONRenderer().render(response.data) or 'null')
+            record.save()
+        return response
+
+
+def purge_expired():
+    """Delete the stored responses whose TTL has passed"""
+    deleted, _ = IdempotencyKey.objects.filter(expires_at__lt=timezone.now()).delete()
+    return deleted
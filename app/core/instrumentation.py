@@ -0,0 +1,104 @@
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+
+_local = threading.local()
+
+
+class QueryRecorder:
+    """Database execute wrapper counting queries and the time spent running them"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+
+
+@contextmanager
+def record_queries():
+    """Record every query run on any database connection inside the block"""
+    recorder = QueryRecorder()
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(recorder))
+        yield recorder
+
+
+@contextmanager
+def current_request(request):
+    """Remember the request being handled by this thread while the block runs"""
+    previous = getattr(_local, 'request', None)
+    _local.request = request
+    try:
+        yield
+    finally:
+        _local.request = previous
+
+
+def get_current_request():
+    """Return the request handled by the current thread, if any"""
+    return getattr(_local, 'request', None)
+
+
+def get_view_name(request):
+    """Return the resolved URL name of the request, e.g. 'crm:contract-list'"""
+    match = getattr(request, 'resolver_match', None) if request is not None else None
+    if match is None:
+        return 'unresolved'
+    return match.view_name or 'unresolved'
+
+
+def get_query_budget(view_name, method):
+    """Return the query budget of an endpoint for a method, or None.
+
+    A plain URL name budgets the safe methods, a (URL name, method) pair budgets
+    the others, e.g. ('crm:contract-payment', 'POST')."""
+    budget = settings.QUERY_BUDGETS.get((view_name, method))
+    if budget is None and method in ('GET', 'HEAD', 'OPTIONS'):
+        budget = settings.QUERY_BUDGETS.get(view_name)
+    return budget
+
+
+class EndpointStats:
+    """In-process aggregate of the instrumentation per resolved URL name"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def record(self, view_name, queries, sql_time, python_time, response_size):
+        """Add the measurements of one request to the aggregate of its endpoint"""
+        with self._lock:
+            stats = self._stats.setdefault(view_name, {
+                'requests': 0, 'queries': 0, 'max_queries': 0,
+                'sql_time': 0.0, 'python_time': 0.0, 'response_size': 0
+            })
+            stats['requests'] += 1
+            stats['queries'] += queries
+            stats['max_queries'] = max(stats['max_queries'], queries)
+            stats['sql_time'] += sql_time
+            stats['python_time'] += python_time
+            stats['response_size'] += response_size or 0
+
+    def snapshot(self):
+        """Return a copy of the aggregate keyed by URL name"""
+        with self._lock:
+            return {name: dict(stats) for name, stats in self._stats.items()}
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+endpoint_stats = EndpointStats()
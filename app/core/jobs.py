@@ -0,0 +1,152 @@
+"""Database backed background jobs.
+
+Tasks are plain functions registered with the `task` decorator in a `tasks` module of
+an app; they receive the running Job first and may report its progress. `enqueue`
+stores a Job row, the workers started by `manage.py run_workers` claim queued jobs
+with SELECT ... FOR UPDATE SKIP LOCKED, run them and retry failures with exponential
+backoff. JOB_QUEUES limits how many jobs of each queue run at once."""
+import logging
+import os
+import socket
+import time
+import traceback
+import zlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.utils import timezone
+
+from core.models import Job
+
+
+logger = logging.getLogger(__name__)
+
+TASKS = {}
+
+
+def task(name=None, queue='default', max_attempts=3):
+    """Register a function as a task the workers can run"""
+    def register(func):
+        task_name = name or '%s.%s' % (func.__module__, func.__name__)
+        func.task_name = task_name
+        func.queue = queue
+        func.max_attempts = max_attempts
+        TASKS[task_name] = func
+        return func
+    return register
+
+
+def enqueue(func, *args, queue=None, priority=0, run_at=None, created_by=None, **kwargs):
+    """Store a job running the registered task with the given JSON serializable arguments"""
+    return Job.objects.create(
+        task=func.task_name,
+        queue=queue or func.queue,
+        max_attempts=func.max_attempts,
+        args=list(args),
+        kwargs=kwargs,
+        priority=priority,
+        run_at=run_at or timezone.now(),
+        created_by=created_by,
+    )
+
+
+def concurrency_limit(queue):
+    return settings.JOB_QUEUES.get(queue, settings.JOB_DEFAULT_CONCURRENCY)
+
+
+def lock_queue(queue):
+    """Serialize the claims of a queue until the transaction ends, so its limit holds"""
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_xact_lock(%s)', [zlib.crc32(('job-queue:' + queue).encode())])
+
+
+def claim(queues, worker):
+    """Lock and return the next due job of the queues that have a free slot, or None"""
+    now = timezone.now()
+    for queue in queues:
+        with transaction.atomic():
+            lock_queue(queue)
+            if Job.objects.filter(queue=queue, status='R').count() >= concurrency_limit(queue):
+                continue
+            job = (Job.objects.select_for_update(skip_locked=True)
+                   .filter(queue=queue, status='Q', run_at__lte=now)
+                   .order_by('-priority', 'run_at', 'id')
+                   .first())
+            if job is None:
+                continue
+            job.status = 'R'
+            job.attempts += 1
+            job.locked_by = worker
+            job.locked_at = now
+            job.save(update_fields=['status', 'attempts', 'locked_by', 'locked_at', 'updated_at'])
+            return job
+    return None
+
+
+def backoff(attempts):
+    """Seconds to wait before the next attempt of a job that failed this many times"""
+    return settings.JOB_RETRY_BACKOFF * 2 ** (attempts - 1)
+
+
+def run(job):
+    """Run a claimed job and record its result, its retry or its failure"""
+    func = TASKS.get(job.task)
+    try:
+        if func is None:
+            raise LookupError('Unknown task %s' % job.task)
+        result = func(job, *job.args, **job.kwargs)
+    except Exception:
+        job.last_error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            job.status = 'Q'
+            job.run_at = timezone.now() + timedelta(seconds=backoff(job.attempts))
+        else:
+            job.status = 'F'
+            job.finished_at = timezone.now()
+        logger.warning('Job %d (%s) failed on attempt %d', job.id, job.task, job.attempts)
+    else:
+        job.status = 'S'
+        job.result = result
+        job.finished_at = timezone.now()
+    job.locked_by = None
+    job.locked_at = None
+    job.save(update_fields=['status', 'result', 'last_error', 'run_at', 'finished_at',
+                            'locked_by', 'locked_at', 'updated_at'])
+    return job
+
+
+def report_progress(job, **progress):
+    """Store the progress of a running job for the clients polling its status"""
+    job.progress = progress
+    Job.objects.filter(pk=job.pk).update(progress=progress, updated_at=timezone.now())
+
+
+def requeue_stale(timeout):
+    """Queue again the running jobs whose worker died, judged by how long they have been locked"""
+    return Job.objects.filter(status='R', locked_at__lt=timezone.now() - timedelta(seconds=timeout)).update(
+        status='Q', locked_by=None, locked_at=None, run_at=timezone.now(), updated_at=timezone.now()
+    )
+
+
+def worker_name():
+    return '%s:%d' % (socket.gethostname(), os.getpid())
+
+
+def work(queues, burst=False, poll_interval=1.0, should_stop=lambda: False):
+    """Claim and run jobs until stopped, or until the queues are empty when bursting"""
+    worker = worker_name()
+    while not should_stop():
+        try:
+            job = claim(queues, worker)
+        except DatabaseError:
+            logger.exception('Worker %s could not claim a job', worker)
+            time.sleep(poll_interval)
+            continue
+        if job is None:
+            if burst:
+                return
+            time.sleep(poll_interval)
+            continue
+        run(job)
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core import jobs
+
+
+class Command(BaseCommand):
+    """Queueing a registered task, e.g. from cron for periodic tasks"""
+    help = 'Queue a job running the registered task.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('task', help='registered task name, e.g. core.purge_idempotency_keys')
+        parser.add_argument('--queue', default=None)
+
+    def handle(self, *args, **options):
+        func = jobs.TASKS.get(options['task'])
+        if func is None:
+            raise CommandError('Unknown task %s, known tasks: %s' % (options['task'], ', '.join(sorted(jobs.TASKS))))
+        job = jobs.enqueue(func, queue=options['queue'])
+        self.stdout.write(self.style.SUCCESS('Queued job %d' % job.id))
@@ -0,0 +1,84 @@
+import multiprocessing
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connections
+
+from core import jobs
+
+
+class Command(BaseCommand):
+    """Running the background job workers"""
+    help = 'Start N worker processes running the jobs of the given queues.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument('--queues', default='default,imports',
+                            help='comma separated queue names, in priority order')
+        parser.add_argument('--burst', action='store_true', help='stop once the queues are empty')
+        parser.add_argument('--poll-interval', type=float, default=1.0)
+
+    def handle(self, *args, **options):
+        """Requeue the jobs of dead workers, then run the workers until interrupted.
+
+        With several workers this process supervises them, requeueing the jobs of
+        dead workers every JOB_REQUEUE_INTERVAL seconds, of other hosts too."""
+        queues = [queue.strip() for queue in options['queues'].split(',') if queue.strip()]
+        self.requeue_stale()
+        self.stdout.write('Starting %d workers on %s' % (options['workers'], ', '.join(queues)))
+
+        if options['workers'] <= 1:
+            run_worker(queues, options['burst'], options['poll_interval'])
+        else:
+            connections.close_all()
+            processes = [
+                multiprocessing.Process(target=run_worker_process,
+                                        args=(queues, options['burst'], options['poll_interval']))
+                for _ in range(options['workers'])
+            ]
+            for process in processes:
+                process.start()
+            try:
+                self.supervise(processes)
+            except KeyboardInterrupt:
+                for process in processes:
+                    process.terminate()
+                for process in processes:
+                    process.join()
+        self.stdout.write(self.style.SUCCESS('Workers stopped'))
+
+    def requeue_stale(self):
+        requeued = jobs.requeue_stale(settings.JOB_TIMEOUT)
+        if requeued:
+            self.stdout.write('Requeued %d stale jobs' % requeued)
+
+    def supervise(self, processes):
+        """Wait for the workers to stop, requeueing the stale jobs every JOB_REQUEUE_INTERVAL"""
+        next_requeue = time.monotonic() + settings.JOB_REQUEUE_INTERVAL
+        while True:
+            alive = [process for process in processes if process.is_alive()]
+            if not alive:
+                return
+            alive[0].join(max(next_requeue - time.monotonic(), 0))
+            if time.monotonic() >= next_requeue:
+                try:
+                    self.requeue_stale()
+                except DatabaseError as error:
+                    self.stderr.write('Could not requeue the stale jobs: %s' % error)
+                    # reconnect on the next round
+                    connections.close_all()
+                next_requeue = time.monotonic() + settings.JOB_REQUEUE_INTERVAL
+
+
+def run_worker(queues, burst, poll_interval):
+    """Worker loop, finishing the current job when asked to stop"""
+    stopping = []
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopping.append(signum))
+    jobs.work(queues, burst=burst, poll_interval=poll_interval, should_stop=lambda: bool(stopping))
+
+
+def run_worker_process(queues, burst, poll_interval):
+    run_worker(queues, burst, poll_interval)
+    connections.close_all()
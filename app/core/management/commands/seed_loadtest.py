@@ -0,0 +1,126 @@
+import datetime
+import random
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from core import models
+from core.normalize import dedupe_key
+
+
+class Command(BaseCommand):
+    """Seeding a local database with realistic data for the load test suite.
+
+    The rows are bulk inserted, which needs a backend returning the new primary keys (PostgreSQL)."""
+    help = 'Seed the database with an admin, reference data, costumers, contracts and goals.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', default='loadtest')
+        parser.add_argument('--password', default='loadtest1234')
+        parser.add_argument('--costumers', type=int, default=200)
+        parser.add_argument('--contracts-per-costumer', type=int, default=2)
+        parser.add_argument('--goals', type=int, default=500)
+        parser.add_argument('--seed', type=int, default=0)
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        """Create the load test admin and bulk insert the data set"""
+        rng = random.Random(options['seed'])
+        admin = get_user_model().objects.filter(username=options['username']).first()
+        if admin is None:
+            admin = get_user_model().objects.create_superuser(options['username'], options['password'],
+                                                              email='loadtest@example.com')
+
+        country, _ = models.Country.objects.get_or_create(name='United Kingdom', defaults={
+            'code': '44', 'abreviation': 'UK', 'created_by': admin
+        })
+        company, _ = models.POSCompany.objects.get_or_create(name='Load Test POS', defaults={
+            'serial_number_length': 8, 'created_by': admin
+        })
+        pos_model, _ = models.PosModel.objects.get_or_create(name='LT-100', company=company, defaults={
+            'hardware_cost': 80, 'software_cost': 20, 'price': 150, 'created_by': admin
+        })
+        service, _ = models.VirtualService.objects.get_or_create(name='Load Test Pay', defaults={
+            'price': 10, 'cost': 4, 'created_by': admin
+        })
+
+        costumers = []
+        for index in range(options['costumers']):
+            name = 'Load Test Merchant %d' % index
+            costumers.append(models.Costumer(
+                trading_name=name, legal_name=name, business_bank_name=name,
+                business_type=rng.choice(models.Costumer.business_choices)[0],
+                legal_entity='PrLC', registered_address='%d High Street' % index,
+                registered_postal_code='LT%d 1AA' % (index % 90), business_postal_code='LT%d 1AA' % (index % 90),
+                country=country, company_number='%08d' % index, land_line='0200000%04d' % index,
+                business_email='merchant%d@example.com' % index, director_name='Director %d' % index,
+                director_phone='0700000%04d' % index, director_email='director%d@example.com' % index,
+                director_address='%d Low Street' % index, director_postal_code='LT1 2BB',
+                note='Seeded for load testing', sort_code='000000', issuing_bank='Load Test Bank',
+                account_number='%08d' % index, created_by=admin, last_updated_by=admin,
+                dedupe_key=dedupe_key('LT%d 1AA' % (index % 90), name)
+            ))
+        costumers = models.Costumer.objects.bulk_create(costumers)
+
+        today = timezone.localdate()
+        contracts = []
+        for costumer in costumers:
+            for _ in range(options['contracts_per_costumer']):
+                start = today - datetime.timedelta(days=rng.randint(0, 700))
+                contracts.append(models.Contract(
+                    costumer=costumer, face_to_face_saled=rng.randint(0, 100), atv=rng.randint(5, 80),
+                    annual_card_turnover=rng.randint(10000, 900000), annual_total_turnover=rng.randint(10000, 900000),
+                    interchange=0.3, authorizathion_fee=0.05, pci_dss=4.5,
+                    acquire_name=rng.choice(models.Contract.acquire_name_choices)[0],
+                    m_id=str(rng.randint(10 ** 7, 10 ** 8)), t_id=str(rng.randint(10 ** 5, 10 ** 6)),
+                    pci_due_date=start + datetime.timedelta(days=365), live_date=start,
+                    start_date=start, end_date=start + datetime.timedelta(days=3 * 365), created_by=admin
+                ))
+        contracts = models.Contract.objects.bulk_create(contracts)
+
+        first_serial = rng.randint(0, 10 ** 8)
+        poses = models.POS.objects.bulk_create([
+            models.POS(serial_number='%08d' % ((first_serial + index) % 10 ** 8), type='D',
+                       model=pos_model, created_by=admin)
+            for index in range(len(contracts))
+        ])
+        now = timezone.now()
+        models.ContractPOS.objects.bulk_create([
+            models.ContractPOS(contract=contract, pos=pos, price=150, hardware_cost=80, software_cost=20,
+                               created_by=admin)
+            for contract, pos in zip(contracts, poses)
+        ])
+        models.ContractService.objects.bulk_create([
+            models.ContractService(contract=contract, service=service, price=10, cost=4, created_by=admin)
+            for contract in contracts
+        ])
+        models.Payment.objects.bulk_create([
+            models.Payment(contract=contract, date=now - datetime.timedelta(days=30 * month),
+                           direct_debit_cost=12, created_by=admin)
+            for contract in contracts for month in range(3)
+        ])
+        models.MIDRevenue.objects.bulk_create([
+            models.MIDRevenue(contract=contract, income=rng.randint(20, 400), profit=rng.randint(5, 100),
+                              date=now - datetime.timedelta(days=30 * month), created_by=admin)
+            for contract in contracts for month in range(3)
+        ])
+        models.PaperRoll.objects.bulk_create([
+            models.PaperRoll(costumer=costumer, amount=rng.randint(5, 40), cost=1, price=1.5,
+                             direct_debit_cost=0.2, ordered_date=now - datetime.timedelta(days=rng.randint(0, 300)),
+                             created_by=admin)
+            for costumer in costumers
+        ])
+        models.MarketingGoal.objects.bulk_create([
+            models.MarketingGoal(trading_name='Load Test Lead %d' % index, business_field='Retail',
+                                 postal_code='LT%d 1AA' % (index % 90), status=rng.choice('ARWP'),
+                                 note='Seeded for load testing', created_by=admin, last_update=admin,
+                                 dedupe_key=dedupe_key('LT%d 1AA' % (index % 90), 'Load Test Lead %d' % index))
+            for index in range(options['goals'])
+        ])
+
+        self.stdout.write(self.style.SUCCESS(
+            'Seeded %d costumers, %d contracts and %d goals, log in as %s'
+            % (len(costumers), len(contracts), options['goals'], options['username'])
+        ))
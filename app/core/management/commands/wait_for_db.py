@@ -1,23 +1,56 @@
 import time
 
-from django.db import connections
+from django.db import DEFAULT_DB_ALIAS, connections
 from django.db.utils import OperationalError
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+
+from core import health, warmup
+
+
+class NotReady(Exception):
+    pass
 
 
 class Command(BaseCommand):
     """Pausing Django until the database is available"""
+    help = 'Wait until the database answers queries, optionally until it is migrated, then warm the caches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument('--timeout', type=float, default=60, help='seconds to wait before failing')
+        parser.add_argument('--max-delay', type=float, default=5, help='longest pause between two attempts')
+        parser.add_argument('--migrations', action='store_true', help='also wait until every migration is applied')
+        parser.add_argument('--warm-cache', action='store_true', help='warm the caches once the database is ready')
 
     def handle(self, *args, **options):
-        """Try to make a connection to database every second until it's available."""
+        """Query the database with exponential backoff until it is ready or the timeout passes."""
+        alias = options['database']
+        deadline = time.monotonic() + options['timeout']
+        delay = 0.5
         self.stdout.write('Waiting for database...')
-        db_conn = None
-        while not db_conn:
+        while True:
             try:
-                db_conn = connections['default']
-            except OperationalError:
-                self.stdout.write('Database Unavailable now, try again after 1 second...')
-                time.sleep(1)
-        
+                self.check_ready(alias, options['migrations'])
+                break
+            except (OperationalError, NotReady) as error:
+                if time.monotonic() + delay > deadline:
+                    raise CommandError('Database not ready after %s seconds: %s' % (options['timeout'], error))
+                self.stdout.write('Database Unavailable now (%s), try again after %.1f seconds...' % (
+                    str(error).strip(), delay))
+                if not connections[alias].in_atomic_block:
+                    # reconnect on the next attempt, unless that would end the caller's transaction
+                    connections[alias].close()
+                time.sleep(delay)
+                delay = min(delay * 2, options['max_delay'])
+
         self.stdout.write(self.style.SUCCESS('DataBase Available!'))
-            
\ No newline at end of file
+        if options['warm_cache']:
+            for name, count in warmup.warm().items():
+                self.stdout.write('Warmed %s: %d entries' % (name, count))
+
+    def check_ready(self, alias, migrations):
+        health.check_database(alias)
+        if migrations:
+            pending = health.pending_migrations(alias)
+            if pending:
+                raise NotReady('%d migrations are not applied' % len(pending))
@@ -0,0 +1,83 @@
+"""Prometheus metrics of the app.
+
+In a multi-process server (gunicorn, uwsgi) set the `prometheus_multiproc_dir`
+environment variable to an empty, writable directory before the workers start.
+Every worker then writes its samples to memory-mapped files in that directory and
+the /metrics endpoint aggregates them, whichever worker answers the scrape.
+The server should call `mark_process_dead(pid)` when a worker exits."""
+import os
+
+from django.db.models import Count
+from django.utils import timezone
+from prometheus_client import CollectorRegistry, Counter, Histogram, REGISTRY, generate_latest, multiprocess
+from prometheus_client.core import GaugeMetricFamily
+
+from core import models
+
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', 'Request latency by resolved URL name, method and status',
+    ['view', 'method', 'status']
+)
+DB_QUERIES = Histogram(
+    'db_queries_per_request', 'Database queries run by each request',
+    ['view'], buckets=(1, 2, 3, 5, 10, 20, 50, 100, float('inf'))
+)
+DB_QUERY_TIME = Histogram(
+    'db_query_duration_seconds_per_request', 'Time spent in the database by each request', ['view']
+)
+CACHE_LOOKUPS = Counter('cache_lookups_total', 'Cache lookups by cache name and result', ['cache', 'result'])
+AUTH_FAILURES = Counter('auth_failures_total', 'Failed logins through the token endpoint')
+
+
+def observe_request(view_name, method, status_code, duration, queries, sql_time):
+    """Record the measurements of one finished request"""
+    REQUEST_LATENCY.labels(view_name, method, str(status_code)).observe(duration)
+    DB_QUERIES.labels(view_name).observe(queries)
+    DB_QUERY_TIME.labels(view_name).observe(sql_time)
+
+
+def record_cache_lookup(cache_name, hit):
+    """Count a cache hit or miss, the hit ratio is derived from both"""
+    CACHE_LOOKUPS.labels(cache_name, 'hit' if hit else 'miss').inc()
+
+
+class BusinessCollector:
+    """Business gauges, computed from the database when the metrics are scraped"""
+
+    def collect(self):
+        today = timezone.localdate()
+        yield GaugeMetricFamily(
+            'crm_active_contracts', 'Contracts whose term includes today',
+            value=models.Contract.objects.filter(start_date__lte=today, end_date__gte=today).count()
+        )
+        yield GaugeMetricFamily(
+            'crm_active_pos', 'POSes marked as active',
+            value=models.POS.objects.filter(is_active=True).count()
+        )
+        goals = GaugeMetricFamily('crm_marketing_goals', 'Marketing goals by status', labels=['status'])
+        rows = models.MarketingGoal.objects.order_by().values('status').annotate(count=Count('id'))
+        for row in rows:
+            goals.add_metric([row['status']], row['count'])
+        yield goals
+
+
+def is_multiprocess():
+    return 'prometheus_multiproc_dir' in os.environ
+
+
+def render_metrics():
+    """Return the exposition of every metric of the app in the Prometheus text format"""
+    registry = CollectorRegistry()
+    if is_multiprocess():
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry.register(REGISTRY)
+    registry.register(BusinessCollector())
+    return generate_latest(registry)
+
+
+def mark_process_dead(pid):
+    """Drop the live samples of a dead worker, to be called from the server's exit hook"""
+    if is_multiprocess():
+        multiprocess.mark_process_dead(pid)
@@ -0,0 +1,117 @@
+import cProfile
+import logging
+import os
+import time
+import uuid
+
+from django.conf import settings
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+
+from core import metrics
+from core.db_routers import SAFE_METHODS, pin_to_primary
+from core.instrumentation import current_request, endpoint_stats, get_query_budget, get_view_name, record_queries
+
+
+logger = logging.getLogger(__name__)
+
+
+class QueryCountMiddleware:
+    """Measure query count, SQL time, Python time and response size of every request.
+
+    The measurements are aggregated per resolved URL name, fed to the Prometheus metrics,
+    attached to the response as `response.instrumentation` and, in debug, exposed as
+    response headers."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        with current_request(request), record_queries() as recorder:
+            response = self.get_response(request)
+        total_time = time.perf_counter() - start
+
+        view_name = get_view_name(request)
+        python_time = max(total_time - recorder.duration, 0.0)
+        response_size = None if response.streaming else len(response.content)
+        endpoint_stats.record(view_name, recorder.count, recorder.duration, python_time, response_size)
+        metrics.observe_request(view_name, request.method, response.status_code,
+                                total_time, recorder.count, recorder.duration)
+        response.instrumentation = {
+            'view_name': view_name,
+            'method': request.method,
+            'queries': recorder.count,
+            'sql_time': recorder.duration,
+            'python_time': python_time,
+            'response_size': response_size,
+        }
+
+        budget = get_query_budget(view_name, request.method)
+        if budget is not None and recorder.count > budget:
+            logger.warning('%s %s ran %d queries, its budget is %d',
+                           request.method, view_name, recorder.count, budget)
+
+        if settings.DEBUG:
+            response['X-Query-Count'] = str(recorder.count)
+            response['X-Query-Time-Ms'] = '%.2f' % (recorder.duration * 1000)
+            response['X-Python-Time-Ms'] = '%.2f' % (python_time * 1000)
+            if response_size is not None:
+                response['X-Response-Size'] = str(response_size)
+        return response
+
+
+class ProfilingMiddleware:
+    """Run requests of staff users under cProfile when they ask for it.
+
+    A request opts in with the `X-Profile` header or the `profile` query parameter.
+    The pstats dump is stored in PROFILE_DIR and its id returned in `X-Profile-Id`,
+    staff download it from the admins request-profile endpoint. Every other request
+    only pays for the opt-in check."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not (request.META.get('HTTP_X_PROFILE') or 'profile' in request.GET):
+            return self.get_response(request)
+        if not self.is_staff(request):
+            return self.get_response(request)
+
+        profiler = cProfile.Profile()
+        response = profiler.runcall(self.get_response, request)
+        profile_id = str(uuid.uuid4())
+        os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+        profiler.dump_stats(profile_path(profile_id))
+        response['X-Profile-Id'] = profile_id
+        return response
+
+    def is_staff(self, request):
+        """Check the session user, then the API token, without touching the request otherwise"""
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            return user.is_staff
+        try:
+            credentials = TokenAuthentication().authenticate(request)
+        except AuthenticationFailed:
+            return False
+        return credentials is not None and credentials[0].is_staff
+
+
+def profile_path(profile_id):
+    """Return the file of a stored request profile"""
+    return os.path.join(settings.PROFILE_DIR, '%s.prof' % profile_id)
+
+
+class ReplicaPinningMiddleware:
+    """Pin clients to the primary database for a short while after a successful write,
+    so they read their own writes even when the replicas lag behind."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if settings.DATABASE_REPLICAS and request.method not in SAFE_METHODS and response.status_code < 400:
+            pin_to_primary(request)
+        return response
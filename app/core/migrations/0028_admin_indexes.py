@@ -0,0 +1,71 @@
+# Generated by Django 3.1.14 on 2026-10-18 23:47
+
+from django.db import migrations, models
+
+
+# The admin searches with icontains, UPPER(column::text) LIKE UPPER('%term%'),
+# which only a trigram index on the same expression can serve.
+SEARCH_INDEXES = (
+    ('core_costumer_trading_name_trgm', 'core_costumer', 'trading_name'),
+    ('core_costumer_legal_name_trgm', 'core_costumer', 'legal_name'),
+    ('core_contract_m_id_trgm', 'core_contract', 'm_id'),
+    ('core_pos_serial_number_trgm', 'core_pos', 'serial_number'),
+    ('core_marketinggoal_trading_name_trgm', 'core_marketinggoal', 'trading_name'),
+)
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, table, column in SEARCH_INDEXES:
+        schema_editor.execute('CREATE INDEX IF NOT EXISTS %s ON %s USING gin ((UPPER(%s::text)) gin_trgm_ops)' % (
+            schema_editor.quote_name(name), schema_editor.quote_name(table), schema_editor.quote_name(column)))
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _, _ in SEARCH_INDEXES:
+        schema_editor.execute('DROP INDEX IF EXISTS %s' % schema_editor.quote_name(name))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0027_change'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='contract',
+            name='start_date',
+            field=models.DateField(db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='costumer',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='marketinggoal',
+            name='created_at',
+            field=models.DateField(auto_now_add=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='midrevenue',
+            name='date',
+            field=models.DateTimeField(db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='paperroll',
+            name='ordered_date',
+            field=models.DateTimeField(db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='payment',
+            name='date',
+            field=models.DateTimeField(db_index=True),
+        ),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.1.14 on 2026-10-18 23:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0029_deletion_requested_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='marketinggoal',
+            index=models.Index(fields=['status', '-updated_at'], name='core_goal_status_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 3.1.14 on 2026-10-18 23:55
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+from core.normalize import dedupe_key
+
+
+def fill_dedupe_keys(apps, schema_editor):
+    for model_name, postcode_field in (('MarketingGoal', 'postal_code'), ('Costumer', 'business_postal_code')):
+        model = apps.get_model('core', model_name)
+        batch = []
+        for row in model.objects.only('id', postcode_field, 'trading_name').iterator(chunk_size=2000):
+            row.dedupe_key = dedupe_key(getattr(row, postcode_field), row.trading_name)
+            batch.append(row)
+            if len(batch) == 2000:
+                model.objects.bulk_update(batch, ['dedupe_key'])
+                batch = []
+        model.objects.bulk_update(batch, ['dedupe_key'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0030_goal_status_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='costumer',
+            name='dedupe_key',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=140),
+        ),
+        migrations.AddField(
+            model_name='marketinggoal',
+            name='dedupe_key',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=140),
+        ),
+        migrations.CreateModel(
+            name='GoalImport',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file_name', models.CharField(max_length=255)),
+                ('content', models.BinaryField()),
+                ('summary', models.JSONField(blank=True, default=None, null=True)),
+                ('verdicts', models.JSONField(blank=True, default=list)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='goal_imports_created', to=settings.AUTH_USER_MODEL)),
+                ('job', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.job')),
+            ],
+        ),
+        migrations.RunPython(fill_dedupe_keys, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 3.1.14 on 2026-10-18 23:57
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0031_goal_import'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='marketinggoal',
+            name='costumer',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='marketing_goals', to='core.costumer'),
+        ),
+    ]
@@ -0,0 +1,87 @@
+from django.db import migrations
+
+
+# Full-text search columns kept up to date by triggers: names weigh most, then the
+# addresses, then the notes. The costumer vector includes its trading addresses,
+# whose writes touch the costumer row to rebuild it. PostgreSQL only, elsewhere
+# crm.search falls back to icontains.
+SEARCH_VECTORS = {
+    'core_costumer': (
+        ('trading_name', 'legal_name', 'registered_address', 'registered_postal_code', 'director_address', 'note'),
+        """setweight(to_tsvector('english', concat_ws(' ', NEW.trading_name, NEW.legal_name)), 'A') ||
+           setweight(to_tsvector('english', concat_ws(' ', NEW.registered_address, NEW.registered_postal_code,
+               NEW.director_address, (SELECT string_agg(address, ' ') FROM core_tradingaddress
+                                      WHERE costumer_id = NEW.id))), 'B') ||
+           setweight(to_tsvector('english', coalesce(NEW.note, '')), 'C')""",
+    ),
+    'core_marketinggoal': (
+        ('trading_name', 'legal_name', 'trading_address', 'postal_code', 'note'),
+        """setweight(to_tsvector('english', concat_ws(' ', NEW.trading_name, NEW.legal_name)), 'A') ||
+           setweight(to_tsvector('english', concat_ws(' ', NEW.trading_address, NEW.postal_code)), 'B') ||
+           setweight(to_tsvector('english', coalesce(NEW.note, '')), 'C')""",
+    ),
+    'core_pos': (
+        ('serial_number', 'note'),
+        """setweight(to_tsvector('english', NEW.serial_number), 'A') ||
+           setweight(to_tsvector('english', coalesce(NEW.note, '')), 'C')""",
+    ),
+}
+
+
+def create_search_vectors(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table, (columns, vector) in SEARCH_VECTORS.items():
+        schema_editor.execute('ALTER TABLE %s ADD COLUMN IF NOT EXISTS search_vector tsvector' % table)
+        schema_editor.execute("""
+            CREATE OR REPLACE FUNCTION %(table)s_search_vector() RETURNS trigger AS $$
+            BEGIN
+                NEW.search_vector := %(vector)s;
+                RETURN NEW;
+            END
+            $$ LANGUAGE plpgsql""" % {'table': table, 'vector': vector})
+        schema_editor.execute("""
+            CREATE TRIGGER %(table)s_search_vector BEFORE INSERT OR UPDATE OF %(columns)s, search_vector
+            ON %(table)s FOR EACH ROW EXECUTE PROCEDURE %(table)s_search_vector()""" % {
+            'table': table, 'columns': ', '.join(columns)})
+        schema_editor.execute('UPDATE %s SET search_vector = NULL' % table)
+        schema_editor.execute('CREATE INDEX IF NOT EXISTS %s_search_vector_gin ON %s USING gin (search_vector)' % (
+            table, table))
+
+    schema_editor.execute("""
+        CREATE OR REPLACE FUNCTION core_tradingaddress_touch_costumer() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP <> 'INSERT' THEN
+                UPDATE core_costumer SET search_vector = NULL WHERE id = OLD.costumer_id;
+            END IF;
+            IF TG_OP <> 'DELETE' THEN
+                UPDATE core_costumer SET search_vector = NULL WHERE id = NEW.costumer_id;
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql""")
+    schema_editor.execute("""
+        CREATE TRIGGER core_tradingaddress_touch_costumer AFTER INSERT OR UPDATE OR DELETE
+        ON core_tradingaddress FOR EACH ROW EXECUTE PROCEDURE core_tradingaddress_touch_costumer()""")
+
+
+def drop_search_vectors(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP TRIGGER IF EXISTS core_tradingaddress_touch_costumer ON core_tradingaddress')
+    schema_editor.execute('DROP FUNCTION IF EXISTS core_tradingaddress_touch_costumer()')
+    for table in SEARCH_VECTORS:
+        schema_editor.execute('DROP TRIGGER IF EXISTS %s_search_vector ON %s' % (table, table))
+        schema_editor.execute('DROP FUNCTION IF EXISTS %s_search_vector()' % table)
+        schema_editor.execute('ALTER TABLE %s DROP COLUMN IF EXISTS search_vector' % table)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0032_goal_costumer'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_vectors, drop_search_vectors),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 3.1.14 on 2026-10-19 00:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0033_search_vectors'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='contract',
+            name='end_date',
+            field=models.DateField(db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='contract',
+            name='live_date',
+            field=models.DateField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='contract',
+            name='pci_due_date',
+            field=models.DateField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='contract',
+            index=models.Index(fields=['acquire_name', 'start_date'], name='core_contract_acq_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contract',
+            index=models.Index(fields=['created_by', 'start_date'], name='core_contract_user_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contract',
+            index=models.Index(condition=models.Q(('m_id__isnull', True), ('m_id', ''), _connector='OR'), fields=['start_date'], name='core_contract_no_mid_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contract',
+            index=models.Index(condition=models.Q(('t_id__isnull', True), ('t_id', ''), _connector='OR'), fields=['start_date'], name='core_contract_no_tid_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='costumer',
+            index=models.Index(fields=['business_type', 'country'], name='core_costumer_type_country_idx'),
+        ),
+    ]
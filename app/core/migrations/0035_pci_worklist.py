@@ -0,0 +1,33 @@
+# Generated by Django 3.1.14 on 2026-10-19 00:02
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0034_contract_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Checkpoint',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=55, unique=True)),
+                ('seq', models.BigIntegerField(default=0)),
+                ('data', models.JSONField(blank=True, default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PCIWorklistItem',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pci_due_date', models.DateField(db_index=True)),
+                ('added_at', models.DateTimeField(auto_now_add=True)),
+                ('contract', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='pci_worklist_item', to='core.contract')),
+            ],
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 3.1.14 on 2026-10-19 00:04
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0035_pci_worklist'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contract',
+            name='renewed_from',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='renewals', to='core.contract'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 3.1.14 on 2026-10-19 00:06
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0036_contract_renewed_from'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='paperroll',
+            name='is_draft',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name='PaperRollForecast',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('orders', models.PositiveIntegerField()),
+                ('daily_rate', models.FloatField()),
+                ('last_ordered_date', models.DateTimeField()),
+                ('next_order_date', models.DateField(db_index=True)),
+                ('amount', models.PositiveIntegerField()),
+                ('computed_at', models.DateTimeField()),
+                ('costumer', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='paper_roll_forecast', to='core.costumer')),
+            ],
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 3.1.14 on 2026-10-19 00:08
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0037_paper_roll_forecast'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MIDRevenueForecast',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(db_index=True)),
+                ('income', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('profit', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('method', models.CharField(choices=[('T', 'Trend'), ('S', 'Trend and seasonality'), ('C', 'Card turnover')], max_length=1)),
+                ('computed_at', models.DateTimeField()),
+                ('contract', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='mid_revenue_forecasts', to='core.contract')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='midrevenueforecast',
+            constraint=models.UniqueConstraint(fields=('contract', 'month'), name='core_midforecast_contract_month_uniq'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 3.1.14 on 2026-10-19 00:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0038_mid_revenue_forecast'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='contract',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='contractpos',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.1.14 on 2026-10-19 00:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0040_change_txid'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='change',
+            name='parent_id',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
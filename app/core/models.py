@@ -2,6 +2,9 @@ from django.db import models
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 from django.conf import settings
 from django.core.exceptions import ValidationError
+from django.utils import timezone
+
+from core.normalize import dedupe_key
 
 
 def percent_validator(data):
@@ -9,6 +12,49 @@ def percent_validator(data):
         raise ValidationError('Invalid Shareholder')
 
 
+class VersionedQuerySet(models.QuerySet):
+    """QuerySet whose updates bump the version of the rows, as their saves do"""
+
+    def update(self, **kwargs):
+        kwargs.setdefault('version', models.F('version') + 1)
+        return super().update(**kwargs)
+
+
+class VersionedModel(models.Model):
+    """Abstract model whose version is bumped on every save and update, for cheap ETags.
+
+    The version is incremented by the database, so concurrent saves never share one."""
+    version = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = VersionedQuerySet.as_manager()
+
+    class Meta:
+        abstract = True
+        base_manager_name = 'objects'
+
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        self.version = 1 if adding else models.F('version') + 1
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'version' not in update_fields:
+            kwargs['update_fields'] = list(update_fields) + ['version']
+        super().save(*args, **kwargs)
+        if not adding:
+            self.refresh_from_db(fields=['version'])
+
+
+class DeletableQuerySet(models.QuerySet):
+    """QuerySet of the models deleted in the background by core.deletion"""
+
+    def visible(self):
+        """Exclude the rows waiting for their deletion to finish"""
+        return self.filter(deletion_requested_at__isnull=True)
+
+
+class VersionedDeletableQuerySet(DeletableQuerySet, VersionedQuerySet):
+    """QuerySet of the versioned models deleted in the background"""
+
+
 class UserManager(BaseUserManager):
     """The Manager Class for the cusomized djangp users."""
 
@@ -54,7 +100,7 @@ class User(AbstractBaseUser, PermissionsMixin):
     EMAIL_FIELD = 'email'
 
 
-class Country(models.Model):
+class Country(VersionedModel):
     """The Countries model for codes and coverage and abreviations"""
     name = models.CharField(max_length=50, unique=True)
     code = models.CharField(max_length=10, blank=True, null=True)
@@ -76,7 +122,7 @@ class Country(models.Model):
             super().save(*args, **kwargs)
 
 
-class VirtualService(models.Model):
+class VirtualService(VersionedModel):
     """The Model for virtual services, such as phone pay"""
     name = models.CharField(max_length=255, unique=True)
     price = models.DecimalField(max_digits=12, decimal_places=2, blank=True, null=True)
@@ -110,7 +156,7 @@ class MarketingGoal(models.Model):
     ]
     status = models.CharField(max_length=20, choices=status_choices, default="W")
     note = models.TextField(blank=True, null=True, default=None)
-    created_at = models.DateField(auto_now_add=True)
+    created_at = models.DateField(auto_now_add=True, db_index=True)
     created_by = models.ForeignKey(settings.AUTH_USER_MODEL,
                                    related_name="goals",
                                    on_delete=models.SET_NULL, blank=True, null=True)
@@ -118,12 +164,27 @@ class MarketingGoal(models.Model):
                                     related_name="goals_updated",
                                     on_delete=models.SET_NULL, blank=True, null=True)
     updated_at = models.DateTimeField(auto_now=True)
+    dedupe_key = models.CharField(max_length=140, db_index=True, editable=False, blank=True, default='')
+    costumer = models.ForeignKey('Costumer', on_delete=models.SET_NULL, blank=True, null=True,
+                                 related_name='marketing_goals')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', '-updated_at'], name='core_goal_status_updated_idx'),
+        ]
 
     def __str__(self):
         return self.trading_name
 
+    def save(self, *args, **kwargs):
+        self.dedupe_key = dedupe_key(self.postal_code, self.trading_name)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'dedupe_key' not in update_fields:
+            kwargs['update_fields'] = list(update_fields) + ['dedupe_key']
+        super().save(*args, **kwargs)
 
-class POSCompany(models.Model):
+
+class POSCompany(VersionedModel):
     """The model for POS companied"""
     name = models.CharField(max_length=110)
     serial_number_length = models.IntegerField()
@@ -134,7 +195,7 @@ class POSCompany(models.Model):
         return self.name
 
 
-class PosModel(models.Model):
+class PosModel(VersionedModel):
     """Models of the POS making companies"""
     name = models.CharField(max_length=110)
     company = models.ForeignKey('POSCompany', on_delete=models.CASCADE, related_name='pos_models')
@@ -148,7 +209,7 @@ class PosModel(models.Model):
         return self.name
 
 
-class POS(models.Model):
+class POS(VersionedModel):
     """Model for all the POSes"""
     serial_number = models.CharField(max_length=255)
     type_choices = [
@@ -253,12 +314,21 @@ class Costumer(models.Model):
                                             on_delete=models.SET_NULL, blank=True, null=True)
     shareholder = models.PositiveIntegerField(validators=[percent_validator,], blank=True, null=True)
 
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, 
                                    blank=True, null=True, related_name='costumers_created')
     updated_at = models.DateTimeField(auto_now=True)
     last_updated_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, 
                                    blank=True, null=True, related_name='costumers_last_updated')
+    deletion_requested_at = models.DateTimeField(blank=True, null=True, editable=False)
+    dedupe_key = models.CharField(max_length=140, db_index=True, editable=False, blank=True, default='')
+
+    objects = DeletableQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['business_type', 'country'], name='core_costumer_type_country_idx'),
+        ]
 
     def __str__(self):
         return str(self.trading_name) + ' ' + self.legal_name
@@ -275,6 +345,7 @@ class Costumer(models.Model):
             self.partner_address = None
             self.partner_nationality = None
             self.shareholder = None
+        self.dedupe_key = dedupe_key(self.business_postal_code, self.trading_name)
         super(Costumer, self).save(*args, **kwargs)
 
 
@@ -287,7 +358,7 @@ class TradingAddress(models.Model):
         return self.address
 
 
-class Contract(models.Model):
+class Contract(VersionedModel):
     """The model to store the contracts"""
     costumer = models.ForeignKey('Costumer', on_delete=models.CASCADE, related_name='contracts')
     face_to_face_saled = models.PositiveIntegerField(validators=[percent_validator,])
@@ -306,15 +377,31 @@ class Contract(models.Model):
     e_commerce_m_id = models.CharField(max_length=55, blank=True, null=True)
     amex_m_id = models.CharField(max_length=55, blank=True, null=True)
     t_id = models.CharField(max_length=55, blank=True, null=True)
-    pci_due_date = models.DateField(blank=True, null=True)
-    live_date = models.DateField(blank=True, null=True)
-    start_date = models.DateField()
-    end_date = models.DateField()
+    pci_due_date = models.DateField(blank=True, null=True, db_index=True)
+    live_date = models.DateField(blank=True, null=True, db_index=True)
+    start_date = models.DateField(db_index=True)
+    end_date = models.DateField(db_index=True)
     total_cost = models.DecimalField(max_digits=12, decimal_places=2, blank=True, null=True)
     total_price = models.DecimalField(max_digits=12, decimal_places=2, blank=True, null=True)
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, 
                                    blank=True, null=True, related_name='contracts_created')
+    deletion_requested_at = models.DateTimeField(blank=True, null=True, editable=False)
+    renewed_from = models.ForeignKey('self', on_delete=models.SET_NULL, blank=True, null=True,
+                                     related_name='renewals')
+
+    objects = VersionedDeletableQuerySet.as_manager()
+
+    class Meta(VersionedModel.Meta):
+        indexes = [
+            models.Index(fields=['acquire_name', 'start_date'], name='core_contract_acq_start_idx'),
+            models.Index(fields=['created_by', 'start_date'], name='core_contract_user_start_idx'),
+            # the contracts still waiting for their MID or TID are few
+            models.Index(fields=['start_date'], name='core_contract_no_mid_idx',
+                         condition=models.Q(m_id__isnull=True) | models.Q(m_id='')),
+            models.Index(fields=['start_date'], name='core_contract_no_tid_idx',
+                         condition=models.Q(t_id__isnull=True) | models.Q(t_id='')),
+        ]
     
     def __str__(self):
         return str(self.costumer) + ' ' + self.get_acquire_name_display()
@@ -327,7 +414,8 @@ class PaperRoll(models.Model):
     cost = models.DecimalField(max_digits=12, decimal_places=2)
     price = models.DecimalField(max_digits=12, decimal_places=2)
     direct_debit_cost = models.DecimalField(max_digits=12, decimal_places=2)
-    ordered_date = models.DateTimeField()
+    ordered_date = models.DateTimeField(db_index=True)
+    is_draft = models.BooleanField(default=False)
 
     created_at = models.DateTimeField(auto_now_add=True)
     created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, 
@@ -340,7 +428,7 @@ class PaperRoll(models.Model):
 class Payment(models.Model):
     """The model for Direct Debit Pays of the contract"""
     contract = models.ForeignKey('Contract', on_delete=models.CASCADE, related_name='payments')
-    date = models.DateTimeField()
+    date = models.DateTimeField(db_index=True)
     direct_debit_cost = models.DecimalField(max_digits=12, decimal_places=2)
 
     created_at = models.DateTimeField(auto_now_add=True)
@@ -353,7 +441,7 @@ class MIDRevenue(models.Model):
     contract = models.ForeignKey('Contract', on_delete=models.CASCADE, related_name='mid_revenues')
     income = models.DecimalField(max_digits=12, decimal_places=2)
     profit = models.DecimalField(max_digits=12, decimal_places=2)
-    date = models.DateTimeField()
+    date = models.DateTimeField(db_index=True)
 
     created_at = models.DateTimeField(auto_now_add=True)
     created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, 
@@ -368,7 +456,7 @@ class ContractPOS(models.Model):
     hardware_cost = models.DecimalField(max_digits=12, decimal_places=2)
     software_cost = models.DecimalField(max_digits=12, decimal_places=2)
 
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, 
                                    blank=True, null=True, related_name='contract_pos_created')
     
@@ -383,3 +471,171 @@ class ContractService(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, 
                                    blank=True, null=True, related_name='contract_service_created')
+
+
+class Job(models.Model):
+    """The model for background jobs run by the workers of core.jobs"""
+    queue = models.CharField(max_length=55, default='default')
+    task = models.CharField(max_length=255)
+    args = models.JSONField(default=list, blank=True)
+    kwargs = models.JSONField(default=dict, blank=True)
+    status_choices = [
+        ("Q", "Queued"),
+        ("R", "Running"),
+        ("S", "Succeeded"),
+        ("F", "Failed")
+    ]
+    status = models.CharField(max_length=1, choices=status_choices, default="Q")
+    priority = models.IntegerField(default=0)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=110, blank=True, null=True)
+    locked_at = models.DateTimeField(blank=True, null=True)
+    progress = models.JSONField(blank=True, null=True, default=None)
+    result = models.JSONField(blank=True, null=True, default=None)
+    last_error = models.TextField(blank=True, null=True, default=None)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL,
+                                   blank=True, null=True, related_name='jobs_created')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['queue', '-priority', 'run_at'], name='core_job_queued_idx',
+                         condition=models.Q(status='Q')),
+            models.Index(fields=['queue', 'status'], name='core_job_queue_status_idx'),
+        ]
+
+    def __str__(self):
+        return '%s %s' % (self.task, self.get_status_display())
+
+
+class IdempotencyKey(models.Model):
+    """The stored responses of create requests sent with an Idempotency-Key header"""
+    key = models.CharField(max_length=255)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='idempotency_keys')
+    fingerprint = models.CharField(max_length=64)
+    response_status = models.PositiveSmallIntegerField(blank=True, null=True)
+    response_body = models.JSONField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='core_idempotency_user_key_uniq'),
+        ]
+
+    def __str__(self):
+        return self.key
+
+
+class Change(models.Model):
+    """The change log of the synced models, read by the incremental sync feed.
+
+    `seq` is taken when the row is inserted, not when its transaction commits, so the
+    log is read in (txid, seq) order, up to the transactions that have all ended,
+    see core.sync."""
+    seq = models.BigAutoField(primary_key=True)
+    txid = models.BigIntegerField(default=0)
+    model = models.CharField(max_length=55)
+    object_id = models.BigIntegerField()
+    # the contract of a MID revenue, still known once the revenue is deleted
+    parent_id = models.BigIntegerField(blank=True, null=True)
+    action_choices = [
+        ("C", "Created"),
+        ("U", "Updated"),
+        ("D", "Deleted")
+    ]
+    action = models.CharField(max_length=1, choices=action_choices)
+    changed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['txid', 'seq'], name='core_change_txid_seq_idx'),
+            models.Index(fields=['model', 'object_id'], name='core_change_object_idx'),
+        ]
+
+    def __str__(self):
+        return '%d %s %s %d' % (self.seq, self.get_action_display(), self.model, self.object_id)
+
+
+class GoalImport(models.Model):
+    """A lead list uploaded to be imported as marketing goals"""
+    file_name = models.CharField(max_length=255)
+    content = models.BinaryField()
+    job = models.ForeignKey('Job', on_delete=models.SET_NULL, blank=True, null=True, related_name='+')
+    summary = models.JSONField(blank=True, null=True, default=None)
+    verdicts = models.JSONField(default=list, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL,
+                                   blank=True, null=True, related_name='goal_imports_created')
+
+    def __str__(self):
+        return self.file_name
+
+
+class Checkpoint(models.Model):
+    """How far an incremental job has read the change log, with the state it keeps between runs"""
+    name = models.CharField(max_length=55, unique=True)
+    txid = models.BigIntegerField(default=0)
+    seq = models.BigIntegerField(default=0)
+    data = models.JSONField(default=dict, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def cursor(self):
+        """The (txid, seq) of the last change read"""
+        return self.txid, self.seq
+
+    def __str__(self):
+        return '%s at %d-%d' % (self.name, self.txid, self.seq)
+
+
+class PCIWorklistItem(models.Model):
+    """A contract whose PCI-DSS compliance is due soon or overdue, kept by crm.pci"""
+    contract = models.OneToOneField('Contract', on_delete=models.CASCADE, related_name='pci_worklist_item')
+    pci_due_date = models.DateField(db_index=True)
+    added_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return '%s due %s' % (self.contract_id, self.pci_due_date)
+
+
+class PaperRollForecast(models.Model):
+    """The paper roll consumption of a costumer and its next order, projected by crm.forecasting"""
+    costumer = models.OneToOneField('Costumer', on_delete=models.CASCADE, related_name='paper_roll_forecast')
+    orders = models.PositiveIntegerField()
+    daily_rate = models.FloatField()
+    last_ordered_date = models.DateTimeField()
+    next_order_date = models.DateField(db_index=True)
+    amount = models.PositiveIntegerField()
+    computed_at = models.DateTimeField()
+
+    def __str__(self):
+        return '%s next order %s' % (self.costumer_id, self.next_order_date)
+
+
+class MIDRevenueForecast(models.Model):
+    """The projected MID income and profit of a contract for a month, computed by crm.forecasting"""
+    contract = models.ForeignKey('Contract', on_delete=models.CASCADE, related_name='mid_revenue_forecasts')
+    month = models.DateField(db_index=True)
+    income = models.DecimalField(max_digits=12, decimal_places=2)
+    profit = models.DecimalField(max_digits=12, decimal_places=2)
+    method_choices = [
+        ("T", "Trend"),
+        ("S", "Trend and seasonality"),
+        ("C", "Card turnover"),
+    ]
+    method = models.CharField(max_length=1, choices=method_choices)
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['contract', 'month'], name='core_midforecast_contract_month_uniq'),
+        ]
+
+    def __str__(self):
+        return '%s %s' % (self.contract_id, self.month)
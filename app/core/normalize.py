@@ -0,0 +1,33 @@
+"""Normalization of the business contact details, used to find duplicate businesses.
+
+Two records are taken for the same business when their dedupe keys, the normalized
+postcode and trading name, are equal. The key is stored and indexed on the goals and
+costumers, so matching a batch of leads is one indexed IN lookup per batch."""
+import re
+
+
+NAME_STOPWORDS = {'the', 'ltd', 'limited', 'plc', 'llp', 'llc', 'inc', 'co', 'company', 't/a'}
+
+
+def normalize_postcode(value):
+    """'sw1a 1aa' -> 'SW1A1AA'"""
+    return re.sub(r'[^0-9A-Z]', '', (value or '').upper())
+
+
+def normalize_phone(value):
+    """'+44 (0)20 7946 0000' -> '02079460000'"""
+    digits = re.sub(r'\D', '', value or '')
+    for prefix in ('0044', '44'):
+        if digits.startswith(prefix) and len(digits) > 10:
+            return '0' + digits[len(prefix):].lstrip('0')
+    return digits
+
+
+def normalize_name(value):
+    """'The Corner Café & Co. Ltd' -> 'corner café and'"""
+    words = re.sub(r'[^\w\s]', ' ', (value or '').lower().replace('&', ' and ')).split()
+    return ' '.join(word for word in words if word not in NAME_STOPWORDS)
+
+
+def dedupe_key(postcode, name):
+    return '%s|%s' % (normalize_postcode(postcode), normalize_name(name))
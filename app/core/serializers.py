@@ -0,0 +1,14 @@
+from rest_framework import serializers
+
+from core.models import Job
+
+
+class JobSerializer(serializers.ModelSerializer):
+    """The serializer to poll the status of background jobs"""
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+
+    class Meta:
+        model = Job
+        fields = ('id', 'queue', 'task', 'status', 'status_display', 'attempts', 'max_attempts', 'run_at',
+                  'progress', 'result', 'last_error', 'created_at', 'updated_at', 'finished_at')
+        read_only_fields = fields
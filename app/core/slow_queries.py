@@ -0,0 +1,160 @@
+"""Slow query log.
+
+Every database connection gets an execute wrapper timing its queries. Queries slower
+than SLOW_QUERY_THRESHOLD_MS are put on a bounded queue together with their view and
+stack; a background thread runs EXPLAIN on its own connection and writes one JSON
+line per query to the 'core.slow_queries' logger, so the request thread never waits
+for either. EXPLAIN ANALYZE executes the query again, so with SLOW_QUERY_EXPLAIN_ANALYZE
+set it is only used for plain SELECTs that lock no rows and call no function with
+effects (advisory locks, NOTIFY, sequences...), the others get a plain EXPLAIN."""
+import json
+import logging
+import queue
+import re
+import threading
+import time
+import traceback
+
+from django.conf import settings
+from django.db import connections
+
+from core.instrumentation import get_current_request, get_view_name
+
+
+logger = logging.getLogger(__name__)
+
+STACK_DEPTH = 5
+LOCKING_CLAUSE = re.compile(r'\bFOR\s+(NO\s+KEY\s+UPDATE|UPDATE|KEY\s+SHARE|SHARE)\b', re.IGNORECASE)
+# SELECT ... INTO creates a table, the functions lock, notify, take ids or wait when run again
+SIDE_EFFECTS = re.compile(
+    r'\bINTO\b|\b(pg_(try_)?advisory\w*|pg_notify|nextval|setval|txid_current|pg_sleep\w*|set_config'
+    r'|pg_(cancel|terminate)_backend|lo_\w+|dblink\w*)\s*\(', re.IGNORECASE)
+
+
+def project_stack():
+    """Return the innermost frames of the stack that belong to this project"""
+    base_dir = str(settings.BASE_DIR)
+    frames = [
+        frame for frame in traceback.extract_stack()
+        if frame.filename.startswith(base_dir) and 'site-packages' not in frame.filename
+        and frame.filename != __file__
+    ]
+    return ['%s:%d in %s' % (frame.filename[len(base_dir) + 1:], frame.lineno, frame.name)
+            for frame in frames[-STACK_DEPTH:]]
+
+
+def is_explainable(sql):
+    return sql.lstrip().upper().startswith(('SELECT', 'WITH'))
+
+
+def is_analyzable(sql):
+    """Whether running the query again for EXPLAIN ANALYZE is harmless: a plain SELECT
+    locking no rows and calling no function with effects, not a WITH that may hold a
+    data-modifying statement"""
+    return (sql.lstrip().upper().startswith('SELECT') and not LOCKING_CLAUSE.search(sql)
+            and not SIDE_EFFECTS.search(sql))
+
+
+class JSONFormatter(logging.Formatter):
+    """Format the slow query records as one JSON object per line"""
+
+    def format(self, record):
+        data = {'time': self.formatTime(record), 'level': record.levelname, 'message': record.getMessage()}
+        data.update(getattr(record, 'slow_query', {}))
+        return json.dumps(data, default=str)
+
+
+class SlowQueryLog:
+    """Execute wrapper handing slow queries to a background thread"""
+
+    def __init__(self, maxsize=1000):
+        self.queue = queue.Queue(maxsize)
+        self.dropped = 0
+        self._thread = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def __call__(self, execute, sql, params, many, context):
+        if getattr(self._local, 'explaining', False):
+            return execute(sql, params, many, context)
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            threshold = settings.SLOW_QUERY_THRESHOLD_MS
+            if threshold is not None and duration * 1000 >= threshold:
+                self.submit({
+                    'alias': context['connection'].alias,
+                    'sql': sql,
+                    'params': None if many else params,
+                    'many': many,
+                    'duration_ms': round(duration * 1000, 3),
+                    'view': get_view_name(get_current_request()),
+                    'stack': project_stack(),
+                })
+
+    def submit(self, record):
+        """Queue a slow query for the background thread, dropping it if the queue is full"""
+        self._start()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def _start(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='slow-query-log', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        self._local.explaining = True
+        while True:
+            record = self.queue.get()
+            try:
+                self.process(record)
+            except Exception:
+                logger.exception('Could not log a slow query')
+            finally:
+                self.queue.task_done()
+            if self.queue.empty():
+                connections.close_all()
+
+    def process(self, record):
+        """Add the query plan to the record and write it to the log"""
+        record = dict(record)
+        if not record['many'] and is_explainable(record['sql']):
+            record['plan'] = self.explain(record['alias'], record['sql'], record['params'])
+        if record['params'] is not None:
+            record['params'] = [str(param) for param in record['params']]
+        logger.warning('Slow query in %s took %.1f ms', record['view'], record['duration_ms'],
+                       extra={'slow_query': record})
+
+    def explain(self, alias, sql, params):
+        """Return the plan of the query as a list of lines"""
+        connection = connections[alias]
+        explaining = getattr(self._local, 'explaining', False)
+        self._local.explaining = True
+        try:
+            analyze = settings.SLOW_QUERY_EXPLAIN_ANALYZE and is_analyzable(sql)
+            options = {'analyze': True} if analyze else {}
+            prefix = connection.ops.explain_query_prefix(**options)
+            with connection.cursor() as cursor:
+                cursor.execute('%s %s' % (prefix, sql), params)
+                return [' '.join(str(column) for column in row) for row in cursor.fetchall()]
+        except Exception as error:
+            return ['EXPLAIN failed: %s' % error]
+        finally:
+            self._local.explaining = explaining
+
+
+slow_query_log = SlowQueryLog()
+
+
+def install(sender, connection, **kwargs):
+    """connection_created receiver adding the slow query wrapper to new connections"""
+    if slow_query_log not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, slow_query_log)
@@ -0,0 +1,194 @@
+"""Change log of the models synced to the offline clients.
+
+Saves and deletes of the synced models append a Change row in the same transaction.
+Bulk operations that skip the model signals (bulk_create, update, raw deletes) call
+`record_changes` instead.
+
+Sequence numbers are taken at insert time, so a transaction can commit the change 100
+after another committed 101, and a reader that went past 101 would never see 100. On
+PostgreSQL every change therefore records the id of its transaction, and the log is
+read in (txid, seq) order up to the oldest transaction still running: every change
+below it is committed or rolled back for good, every change to come is above it.
+When the reader's own transaction is that oldest one, its changes are read as well.
+Readers keep the (txid, seq) of the last change they read as their cursor. Other
+backends serialize the write transactions, their changes all have txid 0.
+
+The changes of the models in PARENT_FIELDS also record the id of their parent, so
+readers can tell which contract a revenue belonged to once it is deleted. A save
+moving the object to another parent records a change under each of them.
+
+Superseded changes and tombstones older than CHANGE_RETENTION_DAYS are pruned by
+`prune_changes`; cursors before the last pruned tombstone can no longer be followed.
+
+On PostgreSQL every recording also sends NOTIFY on the `changes_<model>` channel with
+the last sequence number, delivered when the transaction commits, so listeners like
+the goal event stream wake up instead of polling."""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, connections, transaction
+from django.db.models import Exists, OuterRef, Q
+from django.db.models.expressions import RawSQL
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.utils import timezone
+
+from core import models
+
+
+SYNCED_MODELS = (
+    models.MarketingGoal,
+    models.Costumer,
+    models.TradingAddress,
+    models.Contract,
+    models.PaperRoll,
+    models.Payment,
+    models.MIDRevenue,
+    models.ContractPOS,
+    models.ContractService,
+)
+PARENT_FIELDS = {
+    models.MIDRevenue: 'contract_id',
+}
+PRUNED_CHECKPOINT = 'change-log-pruned'
+
+
+def record_changes(model, object_ids, action, parent_ids=None):
+    """Append one change per object, 'C'reated, 'U'pdated or 'D'eleted, with the parent
+    ids of the models in PARENT_FIELDS"""
+    txid = RawSQL('txid_current()', []) if connection.vendor == 'postgresql' else 0
+    if parent_ids is None:
+        parent_ids = [None] * len(object_ids)
+    changes = models.Change.objects.bulk_create([
+        models.Change(model=model._meta.model_name, object_id=object_id, action=action, txid=txid,
+                      parent_id=parent_id)
+        for object_id, parent_id in zip(object_ids, parent_ids)
+    ])
+    if changes and connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)', [channel(model), str(changes[-1].seq)])
+    return changes
+
+
+def parse_cursor(value):
+    """Parse a cursor given as 'txid-seq', or as a bare sequence number by older clients.
+
+    Raises ValueError on anything else."""
+    txid, _, seq = value.rpartition('-')
+    cursor = int(txid or 0), int(seq)
+    if min(cursor) < 0:
+        raise ValueError('negative cursor')
+    return cursor
+
+
+def format_cursor(cursor):
+    return '%d-%d' % cursor
+
+
+def visible_changes(using=None):
+    """The changes of the transactions that have all ended, in (txid, seq) order.
+
+    The reader's own changes are included when no older transaction is running, so
+    a cursor taken past them can not skip a change committed later."""
+    changes = models.Change.objects.all()
+    if using is not None:
+        changes = changes.using(using)
+    if connections[changes.db].vendor == 'postgresql':
+        horizon = RawSQL('txid_snapshot_xmin(txid_current_snapshot())', [])
+        own = RawSQL('txid_current_if_assigned()', [])
+        changes = changes.filter(Q(txid__lt=horizon) | Q(txid=horizon) & Q(txid=own))
+    return changes.order_by('txid', 'seq')
+
+
+def after(cursor):
+    """Filter on the changes after a cursor"""
+    txid, seq = cursor
+    return Q(txid__gt=txid) | Q(txid=txid, seq__gt=seq)
+
+
+def changes_after(cursor, using=None):
+    """The visible changes after a cursor, in (txid, seq) order"""
+    return visible_changes(using).filter(after(cursor))
+
+
+def is_pruned(cursor, using=None):
+    """Whether tombstones were pruned after the cursor, so following it would miss deletions.
+
+    The cursor of a first read, (0, 0), is never: it has nothing to delete."""
+    if cursor == (0, 0):
+        return False
+    checkpoints = models.Checkpoint.objects.all() if using is None else models.Checkpoint.objects.using(using)
+    pruned = checkpoints.filter(name=PRUNED_CHECKPOINT).first()
+    return pruned is not None and cursor < pruned.cursor
+
+
+def prune_changes(batch_size=1000):
+    """Delete the changes older than CHANGE_RETENTION_DAYS that a newer change of the same
+    object supersedes, and the tombstones, returning how many were deleted.
+
+    A reader after any of them still reads the newer change; the cursor of the last
+    tombstone deleted is kept so the readers before it are told to start over."""
+    cutoff = timezone.now() - timedelta(days=settings.CHANGE_RETENTION_DAYS)
+    newer = models.Change.objects.filter(model=OuterRef('model'), object_id=OuterRef('object_id'),
+                                         seq__gt=OuterRef('seq'))
+    prunable = (visible_changes().filter(changed_at__lt=cutoff)
+                .annotate(superseded=Exists(newer)).filter(Q(superseded=True) | Q(action='D')))
+    deleted = 0
+    while True:
+        with transaction.atomic():
+            batch = list(prunable.values_list('seq', 'txid', 'action')[:batch_size])
+            if not batch:
+                return deleted
+            tombstones = [(txid, seq) for seq, txid, action in batch if action == 'D']
+            if tombstones:
+                checkpoint, _ = (models.Checkpoint.objects.select_for_update()
+                                 .get_or_create(name=PRUNED_CHECKPOINT))
+                checkpoint.txid, checkpoint.seq = max([checkpoint.cursor] + tombstones)
+                checkpoint.save()
+            models.Change.objects.filter(seq__in=[seq for seq, _, _ in batch]).delete()
+        deleted += len(batch)
+
+
+def channel(model):
+    """Name of the NOTIFY channel of the changes of a model"""
+    return 'changes_' + model._meta.model_name
+
+
+def parent_ids(instance):
+    """The parent of an object, and the one it is moved from if the save moves it"""
+    field = PARENT_FIELDS[instance.__class__]
+    ids = [getattr(instance, field)]
+    previous = getattr(instance, '_sync_previous_parent_id', None)
+    if previous is not None and previous != ids[0]:
+        ids.append(previous)
+    return ids
+
+
+def saving(sender, instance, raw=False, **kwargs):
+    """Remember the parent of an existing object before the save, in case it moves it"""
+    if not raw and instance.pk is not None:
+        instance._sync_previous_parent_id = (sender._base_manager.filter(pk=instance.pk)
+                                             .values_list(PARENT_FIELDS[sender], flat=True).first())
+
+
+def saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    action = 'C' if created else 'U'
+    if sender in PARENT_FIELDS:
+        parents = parent_ids(instance)
+        record_changes(sender, [instance.pk] * len(parents), action, parents)
+    else:
+        record_changes(sender, [instance.pk], action)
+
+
+def deleted(sender, instance, **kwargs):
+    parents = [getattr(instance, PARENT_FIELDS[sender])] if sender in PARENT_FIELDS else None
+    record_changes(sender, [instance.pk], 'D', parents)
+
+
+def connect_signals():
+    for model in SYNCED_MODELS:
+        post_save.connect(saved, sender=model, dispatch_uid='core.sync.saved')
+        post_delete.connect(deleted, sender=model, dispatch_uid='core.sync.deleted')
+    for model in PARENT_FIELDS:
+        pre_save.connect(saving, sender=model, dispatch_uid='core.sync.saving')
@@ -0,0 +1,21 @@
+from django.apps import apps
+
+from core import deletion, idempotency, jobs, sync
+
+
+@jobs.task(name='core.purge_idempotency_keys')
+def purge_idempotency_keys(job):
+    """Delete the expired idempotency keys, to be scheduled periodically"""
+    return {'deleted': idempotency.purge_expired()}
+
+
+@jobs.task(name='core.prune_changes')
+def prune_changes(job):
+    """Delete the old superseded changes and tombstones of the change log, to be scheduled daily"""
+    return {'deleted': sync.prune_changes()}
+
+
+@jobs.task(name='core.delete_graph', max_attempts=5)
+def delete_graph(job, model_label, pk):
+    """Delete an object hidden by core.deletion.request_deletion with all it cascades to"""
+    return deletion.delete_graph(job, apps.get_model(model_label), pk)
@@ -0,0 +1,24 @@
+from core.instrumentation import get_query_budget
+
+
+class QueryBudgetMixin:
+    """TestCase mixin to check that endpoints stay within their query budget.
+
+    The budgets are declared per URL name, and method for the writes, in
+    `settings.QUERY_BUDGETS`."""
+
+    def assertWithinQueryBudget(self, response, budget=None):
+        """Fail if the request behind the response ran more queries than allowed"""
+        instrumentation = getattr(response, 'instrumentation', None)
+        if instrumentation is None:
+            self.fail('The response was not instrumented, is QueryCountMiddleware installed?')
+        view_name = instrumentation['view_name']
+        if budget is None:
+            budget = get_query_budget(view_name, instrumentation['method'])
+        if budget is None:
+            self.fail('No query budget is declared for %s %s' % (instrumentation['method'], view_name))
+        queries = instrumentation['queries']
+        self.assertLessEqual(
+            queries, budget,
+            '%s ran %d queries, its budget is %d' % (view_name, queries, budget)
+        )
@@ -2,6 +2,10 @@ from django.test import TestCase, Client
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 
+from core.admin import ApproximateCountPaginator
+from core.models import Costumer, Payment
+from crm.tests.test_costumers_contracts import create_costumer, create_contract
+
 class AdminSiteTest(TestCase):
     """Testing Costum Django Admin"""
 
@@ -44,3 +48,41 @@ class AdminSiteTest(TestCase):
         response = self.client.get(url)
         self.assertEqual(response.status_code, 200)
 
+
+
+class LargeTableAdminTest(TestCase):
+    """Testing the admin of the big crm tables"""
+
+    def setUp(self):
+        self.client = Client()
+        self.admin_user = get_user_model().objects.create_superuser(
+            username='adminstrator',
+            email='admin@test.com',
+            password='testadmin1234'
+        )
+        self.client.force_login(self.admin_user)
+        self.costumer = create_costumer('Test', self.admin_user)
+        self.contract = create_contract(self.costumer, self.admin_user, '2020-12-12')
+        Payment.objects.create(contract=self.contract, date='2020-12-12T12:30:00Z', direct_debit_cost=12)
+
+    def test_changelists(self):
+        """Test that the changelists render with their searches and date hierarchies"""
+        for name in ('costumer', 'contract', 'payment', 'midrevenue', 'paperroll', 'contractpos',
+                     'contractservice', 'tradingaddress', 'pos', 'marketinggoal', 'change'):
+            response = self.client.get(reverse('admin:core_%s_changelist' % name))
+            self.assertEqual(response.status_code, 200, name)
+        response = self.client.get(reverse('admin:core_contract_changelist'), {'q': 'Test'})
+        self.assertContains(response, str(self.contract))
+
+    def test_change_form_autocomplete(self):
+        """Test that the change forms do not list every costumer or contract"""
+        response = self.client.get(reverse('admin:core_payment_change', args=[Payment.objects.get().id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'admin-autocomplete')
+        response = self.client.get(reverse('admin:core_contract_add'))
+        self.assertNotContains(response, '<option value="%d">' % self.costumer.id)
+
+    def test_paginator_exact_count(self):
+        """Test that the paginator counts exactly where no estimate applies"""
+        paginator = ApproximateCountPaginator(Costumer.objects.order_by('id'), 100)
+        self.assertEqual(paginator.count, 1)
@@ -1,22 +1,52 @@
+import os
+from io import StringIO
+from unittest import skipUnless
 from unittest.mock import patch
 from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
 from django.db.utils import OperationalError
 from django.test import TestCase
+from core import models
 
 class CommandTests(TestCase):
     """Test class for core management"""
 
     def test_wait_for_ready_db(self):
         """Test for call command while db is ready and available"""
-        with patch('django.db.utils.ConnectionHandler.__getitem__') as getitem:
-            getitem.return_value = True
-            call_command('wait_for_db')
-            self.assertEqual(getitem.call_count, 1)
+        with patch('core.health.check_database') as check_database:
+            call_command('wait_for_db', stdout=StringIO())
+            self.assertEqual(check_database.call_count, 1)
     
     @patch('time.sleep', return_value=True)
     def test_wait_for_db(self, timesleep):
         """Test the waiting for database using call command"""
-        with patch('django.db.utils.ConnectionHandler.__getitem__') as getitem:
-            getitem.side_effect = [OperationalError] * 5 + [True]
-            call_command('wait_for_db')
-            self.assertEqual(getitem.call_count, 6)
+        with patch('core.health.check_database') as check_database:
+            check_database.side_effect = [OperationalError] * 5 + [None]
+            call_command('wait_for_db', stdout=StringIO())
+            self.assertEqual(check_database.call_count, 6)
+        self.assertEqual([call.args[0] for call in timesleep.call_args_list], [0.5, 1, 2, 4, 5])
+
+    @patch('time.sleep', return_value=True)
+    def test_wait_for_db_timeout(self, timesleep):
+        """Test that the command fails once the database stays unavailable past the timeout"""
+        with patch('core.health.check_database', side_effect=OperationalError('refused')):
+            with self.assertRaises(CommandError):
+                call_command('wait_for_db', timeout=3, stdout=StringIO())
+        self.assertEqual(timesleep.call_count, 3)
+
+    def test_wait_for_migrations_and_warm_cache(self):
+        """Test that a migrated database is ready and the caches are warmed"""
+        out = StringIO()
+        call_command('wait_for_db', migrations=True, warm_cache=True, stdout=out)
+        self.assertIn('Warmed reference data', out.getvalue())
+        self.assertIn('Warmed tokens', out.getvalue())
+
+    @skipUnless(connection.features.can_return_rows_from_bulk_insert, 'Seeding needs bulk insert primary keys')
+    def test_seed_loadtest(self):
+        """Test seeding the database for the load tests"""
+        call_command('seed_loadtest', costumers=3, contracts_per_costumer=2, goals=5, stdout=open(os.devnull, 'w'))
+        self.assertEqual(models.Costumer.objects.count(), 3)
+        self.assertEqual(models.Contract.objects.count(), 6)
+        self.assertEqual(models.MIDRevenue.objects.count(), 18)
+        self.assertEqual(models.MarketingGoal.objects.count(), 5)
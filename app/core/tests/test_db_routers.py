@@ -0,0 +1,63 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import RequestFactory, TransactionTestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core import models
+from core.db_routers import ReplicaRouter, client_key
+from core.instrumentation import current_request
+
+
+@override_settings(DATABASE_REPLICAS=['replica_0', 'replica_1'], DATABASE_REPLICA_PIN_SECONDS=5)
+class ReplicaRouterTest(TransactionTestCase):
+    """Test the read replica database router, outside of a transaction like real requests"""
+
+    def setUp(self):
+        self.router = ReplicaRouter()
+        self.factory = RequestFactory()
+        caches['shared'].clear()
+
+    def test_safe_reads_use_replicas(self):
+        """Test that reads of safe requests go to a replica"""
+        request = self.factory.get('/api/crm/contracts/', HTTP_AUTHORIZATION='Token abc')
+        with current_request(request):
+            self.assertIn(self.router.db_for_read(models.Contract), ['replica_0', 'replica_1'])
+
+    def test_writes_use_primary(self):
+        """Test that writes and the reads of unsafe requests go to the primary"""
+        request = self.factory.post('/api/crm/contracts/', HTTP_AUTHORIZATION='Token abc')
+        with current_request(request):
+            self.assertIsNone(self.router.db_for_read(models.Contract))
+            self.assertEqual(self.router.db_for_write(models.Contract), 'default')
+
+    def test_cache_reads_use_primary(self):
+        """Test that the database cache holding the pins is read from the primary"""
+        request = self.factory.get('/api/crm/contracts/', HTTP_AUTHORIZATION='Token abc')
+        with current_request(request):
+            self.assertIsNone(self.router.db_for_read(caches['shared'].cache_model_class))
+
+    def test_outside_request_use_primary(self):
+        """Test that commands and workers read from the primary"""
+        self.assertIsNone(self.router.db_for_read(models.Contract))
+
+    def test_migrate_primary_only(self):
+        """Test that migrations only run on the primary"""
+        self.assertTrue(self.router.allow_migrate('default', 'core'))
+        self.assertFalse(self.router.allow_migrate('replica_0', 'core'))
+
+    def test_read_your_writes(self):
+        """Test that a client reads from the primary right after it wrote"""
+        admin = get_user_model().objects.create_user(username='testuser', email='test@admin.com',
+                                                     password='testpassword')
+        client = APIClient()
+        client.force_authenticate(admin)
+        client.credentials(HTTP_AUTHORIZATION='Token abc')
+        client.post(reverse('crm:marketinggoal-list'), {'trading_name': 'Goal', 'business_field': 'Test'})
+        request = self.factory.get('/api/crm/goals/', HTTP_AUTHORIZATION='Token abc')
+        self.assertTrue(caches['shared'].get(client_key(request)))
+        with current_request(request):
+            self.assertIsNone(self.router.db_for_read(models.MarketingGoal))
+        other = self.factory.get('/api/crm/goals/', HTTP_AUTHORIZATION='Token other')
+        with current_request(other):
+            self.assertIsNotNone(self.router.db_for_read(models.MarketingGoal))
@@ -0,0 +1,28 @@
+from unittest.mock import patch
+
+from django.db.utils import OperationalError
+from django.test import TestCase
+from django.urls import reverse
+
+
+class HealthProbeTest(TestCase):
+    """Test the liveness and readiness endpoints"""
+
+    def test_liveness(self):
+        """Test that the liveness probe answers without the database"""
+        with patch('core.health.check_database', side_effect=OperationalError):
+            response = self.client.get(reverse('healthz'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_ready(self):
+        """Test that a reachable and migrated database is ready"""
+        response = self.client.get(reverse('readyz'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['checks'], {'default': 'ok', 'migrations': 'ok'})
+
+    def test_not_ready(self):
+        """Test that an unreachable database makes the app unready"""
+        with patch('core.health.check_database', side_effect=OperationalError('refused')):
+            response = self.client.get(reverse('readyz'))
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()['checks']['default'], 'refused')
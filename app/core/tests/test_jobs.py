@@ -0,0 +1,125 @@
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import Mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import jobs
+from core.management.commands import run_workers
+from core.models import Job
+
+
+@jobs.task(name='tests.add')
+def add(job, a, b):
+    jobs.report_progress(job, done=1, total=1)
+    return a + b
+
+
+@jobs.task(name='tests.fail', max_attempts=2)
+def fail(job):
+    raise ValueError('Failed on purpose')
+
+
+def job_url(job_id):
+    return reverse('core:job-detail', args=[job_id])
+
+
+@override_settings(JOB_QUEUES={'limited': 1}, JOB_RETRY_BACKOFF=10)
+class JobTest(TestCase):
+    """Test the database backed job queue"""
+
+    def test_run_job(self):
+        """Test that a claimed job runs and stores its result and progress"""
+        job = jobs.enqueue(add, 1, b=2)
+        claimed = jobs.claim(['default'], 'test-worker')
+        self.assertEqual(claimed, job)
+        self.assertEqual(claimed.status, 'R')
+        jobs.run(claimed)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'S')
+        self.assertEqual(job.result, 3)
+        self.assertEqual(job.progress, {'done': 1, 'total': 1})
+        self.assertIsNone(jobs.claim(['default'], 'test-worker'))
+
+    def test_retry_with_backoff(self):
+        """Test that failed jobs are retried later, then marked as failed"""
+        job = jobs.enqueue(fail)
+        jobs.run(jobs.claim(['default'], 'test-worker'))
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'Q')
+        self.assertIn('Failed on purpose', job.last_error)
+        self.assertGreater(job.run_at, timezone.now() + timedelta(seconds=5))
+        self.assertIsNone(jobs.claim(['default'], 'test-worker'))
+
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        jobs.run(jobs.claim(['default'], 'test-worker'))
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'F')
+        self.assertEqual(job.attempts, 2)
+
+    def test_priority(self):
+        """Test that higher priority jobs are claimed first"""
+        jobs.enqueue(add, 1, 1)
+        urgent = jobs.enqueue(add, 2, 2, priority=10)
+        self.assertEqual(jobs.claim(['default'], 'test-worker'), urgent)
+
+    def test_concurrency_limit(self):
+        """Test that a queue never runs more jobs than its limit"""
+        jobs.enqueue(add, 1, 1, queue='limited')
+        jobs.enqueue(add, 2, 2, queue='limited')
+        first = jobs.claim(['limited'], 'worker-1')
+        self.assertIsNotNone(first)
+        self.assertIsNone(jobs.claim(['limited'], 'worker-2'))
+        jobs.run(first)
+        self.assertIsNotNone(jobs.claim(['limited'], 'worker-2'))
+
+    def test_requeue_stale(self):
+        """Test that jobs of dead workers are queued again"""
+        jobs.enqueue(add, 1, 1)
+        job = jobs.claim(['default'], 'dead-worker')
+        Job.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(hours=2))
+        self.assertEqual(jobs.requeue_stale(3600), 1)
+        self.assertEqual(jobs.claim(['default'], 'test-worker'), job)
+
+    def test_run_workers_burst(self):
+        """Test that the worker command runs the queued jobs and stops when bursting"""
+        job = jobs.enqueue(add, 2, 3)
+        call_command('run_workers', workers=1, burst=True, stdout=StringIO())
+        job.refresh_from_db()
+        self.assertEqual(job.result, 5)
+
+    @override_settings(JOB_REQUEUE_INTERVAL=0)
+    def test_supervisor_requeues_stale(self):
+        """Test that the worker supervisor queues the jobs of dead workers again while it waits"""
+        jobs.enqueue(add, 1, 1)
+        job = jobs.claim(['default'], 'dead-worker')
+        Job.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(hours=2))
+        worker = Mock()
+        worker.is_alive.side_effect = [True, False]
+        out = StringIO()
+        run_workers.Command(stdout=out).supervise([worker])
+        self.assertIn('Requeued 1 stale jobs', out.getvalue())
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'Q')
+
+    def test_status_api(self):
+        """Test that users poll their own jobs and staff every job"""
+        client = APIClient()
+        owner = get_user_model().objects.create_user(username='owner', email='owner@admin.com',
+                                                     password='testpassword')
+        other = get_user_model().objects.create_user(username='other', email='other@admin.com',
+                                                     password='testpassword')
+        job = jobs.enqueue(add, 1, 1, created_by=owner)
+        client.force_authenticate(owner)
+        response = client.get(job_url(job.id))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['status'], 'Q')
+        client.force_authenticate(other)
+        response = client.get(job_url(job.id))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,58 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from prometheus_client import REGISTRY
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import POSCompany, PosModel, POS
+
+
+METRICS_URL = reverse('metrics')
+TOKEN_URL = reverse('admins:token')
+
+
+class MetricsTest(TestCase):
+    """Test the Prometheus metrics endpoint"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = get_user_model().objects.create_user(username='testuser',
+                                                          email='test@admin.com',
+                                                          password='testpassword')
+
+    def test_request_metrics(self):
+        """Test that requests are exposed by URL name and status"""
+        self.client.force_authenticate(self.admin)
+        self.client.get(reverse('crm:country-list'))
+        response = self.client.get(METRICS_URL)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        content = response.content.decode()
+        self.assertIn('http_request_duration_seconds_count{method="GET",status="200",view="crm:country-list"}',
+                      content)
+        self.assertIn('db_queries_per_request_count{view="crm:country-list"}', content)
+
+    def test_auth_failures(self):
+        """Test that failed logins are counted"""
+        before = REGISTRY.get_sample_value('auth_failures_total') or 0
+        response = self.client.post(TOKEN_URL, {'username': 'testuser', 'password': 'wrong'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(REGISTRY.get_sample_value('auth_failures_total'), before + 1)
+
+    def test_business_gauges(self):
+        """Test that the active POS gauge is computed from the database"""
+        company = POSCompany.objects.create(name='Test', serial_number_length=5, created_by=self.admin)
+        model = PosModel.objects.create(name='Test', company=company, created_by=self.admin)
+        POS.objects.create(serial_number='12345', type='D', model=model, created_by=self.admin)
+        POS.objects.create(serial_number='54321', type='D', model=model, created_by=self.admin, is_active=False)
+        content = self.client.get(METRICS_URL).content.decode()
+        self.assertIn('crm_active_pos 1.0', content)
+        self.assertIn('crm_active_contracts 0.0', content)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_metrics_token(self):
+        """Test that the scraper has to send the token when one is configured"""
+        response = self.client.get(METRICS_URL)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        response = self.client.get(METRICS_URL, HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
@@ -0,0 +1,122 @@
+import os
+import shutil
+import tempfile
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.instrumentation import endpoint_stats, get_query_budget
+from core.testing import QueryBudgetMixin
+
+
+GOAL_URL = reverse('crm:marketinggoal-list')
+
+
+class QueryCountMiddlewareTest(QueryBudgetMixin, TestCase):
+    """Test the per-request query and latency instrumentation"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = get_user_model().objects.create_user(username='testuser',
+                                                          email='test@admin.com',
+                                                          password='testpassword')
+        self.client.force_authenticate(self.admin)
+        endpoint_stats.reset()
+
+    @override_settings(DEBUG=True)
+    def test_debug_headers(self):
+        """Test that the measurements are exposed as headers in debug"""
+        response = self.client.get(GOAL_URL)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['X-Query-Count'], str(response.instrumentation['queries']))
+        self.assertIn('X-Query-Time-Ms', response)
+        self.assertIn('X-Python-Time-Ms', response)
+        self.assertEqual(response['X-Response-Size'], str(len(response.content)))
+
+    def test_no_headers_without_debug(self):
+        """Test that the headers are hidden when debug is off"""
+        response = self.client.get(GOAL_URL)
+        self.assertNotIn('X-Query-Count', response)
+
+    def test_stats_per_url_name(self):
+        """Test that the measurements are aggregated per resolved URL name"""
+        self.client.get(GOAL_URL)
+        self.client.get(GOAL_URL)
+        stats = endpoint_stats.snapshot()['crm:marketinggoal-list']
+        self.assertEqual(stats['requests'], 2)
+        self.assertEqual(stats['queries'], 2)
+
+    def test_query_budget(self):
+        """Test that the budget helper fails when an endpoint runs too many queries"""
+        response = self.client.get(GOAL_URL)
+        self.assertWithinQueryBudget(response)
+        with self.assertRaises(AssertionError):
+            self.assertWithinQueryBudget(response, budget=0)
+
+    @override_settings(QUERY_BUDGETS={'crm:contract-mid': 4, ('crm:contract-mid', 'POST'): 10})
+    def test_query_budget_per_method(self):
+        """Test that a plain URL name budgets the reads and a (URL name, method) pair the writes"""
+        self.assertEqual(get_query_budget('crm:contract-mid', 'GET'), 4)
+        self.assertEqual(get_query_budget('crm:contract-mid', 'POST'), 10)
+        self.assertIsNone(get_query_budget('crm:contract-mid', 'DELETE'))
+
+
+class ProfilingMiddlewareTest(TestCase):
+    """Test the on-demand profiling of staff requests"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.profile_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.profile_dir)
+        self.staff = get_user_model().objects.create_user(username='staffuser',
+                                                          email='staff@admin.com',
+                                                          password='testpassword',
+                                                          is_staff=True)
+        self.admin = get_user_model().objects.create_user(username='testuser',
+                                                          email='test@admin.com',
+                                                          password='testpassword')
+
+    def token_login(self, user):
+        token = Token.objects.create(user=user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+
+    def test_staff_profile(self):
+        """Test that staff requests asking for it are profiled and downloadable"""
+        self.token_login(self.staff)
+        with override_settings(PROFILE_DIR=self.profile_dir):
+            response = self.client.get(GOAL_URL, {'profile': '1'})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            profile_id = response['X-Profile-Id']
+            url = reverse('admins:request-profile', args=[profile_id])
+            response = self.client.get(url, {'output': 'text'})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertIn(b'function calls', response.content)
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response['Content-Disposition'], 'attachment; filename="%s.prof"' % profile_id)
+
+    def test_not_staff(self):
+        """Test that other users are never profiled"""
+        self.token_login(self.admin)
+        with override_settings(PROFILE_DIR=self.profile_dir):
+            response = self.client.get(GOAL_URL, HTTP_X_PROFILE='1')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('X-Profile-Id', response)
+        self.assertEqual(os.listdir(self.profile_dir), [])
+
+    def test_not_requested(self):
+        """Test that staff requests are not profiled unless asked"""
+        self.token_login(self.staff)
+        response = self.client.get(GOAL_URL)
+        self.assertNotIn('X-Profile-Id', response)
+
+    def test_download_staff_only(self):
+        """Test that only staff can download profiles"""
+        self.token_login(self.admin)
+        response = self.client.get(reverse('admins:request-profile', args=[uuid.uuid4()]))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
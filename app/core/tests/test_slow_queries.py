@@ -0,0 +1,66 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from core.slow_queries import is_analyzable, slow_query_log
+
+
+class SlowQueryLogTest(TestCase):
+    """Test the slow query log"""
+
+    def test_wrapper_installed(self):
+        """Test that new connections get the slow query wrapper"""
+        connection.ensure_connection()
+        self.assertIn(slow_query_log, connection.execute_wrappers)
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=0)
+    def test_slow_query_queued(self):
+        """Test that queries over the threshold are handed over with their origin"""
+        with patch.object(slow_query_log, 'submit') as submit:
+            get_user_model().objects.filter(username='testuser').exists()
+        record = submit.call_args[0][0]
+        self.assertIn('SELECT', record['sql'])
+        self.assertEqual(record['params'], ('testuser',))
+        self.assertEqual(record['view'], 'unresolved')
+        self.assertTrue(any('test_slow_queries.py' in frame for frame in record['stack']))
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=None)
+    def test_disabled(self):
+        """Test that nothing is queued without a threshold"""
+        with patch.object(slow_query_log, 'submit') as submit:
+            get_user_model().objects.exists()
+        submit.assert_not_called()
+
+    def test_process_logs_plan(self):
+        """Test that the logged record includes the EXPLAIN plan"""
+        record = {
+            'alias': 'default',
+            'sql': 'SELECT id FROM core_user WHERE username = %s',
+            'params': ('testuser',),
+            'many': False,
+            'duration_ms': 600.0,
+            'view': 'crm:contract-list',
+            'stack': [],
+        }
+        with self.assertLogs('core.slow_queries', level='WARNING') as logs:
+            slow_query_log.process(record)
+        logged = logs.records[0].slow_query
+        self.assertEqual(logged['view'], 'crm:contract-list')
+        self.assertEqual(logged['params'], ['testuser'])
+        self.assertTrue(logged['plan'])
+        self.assertFalse(logged['plan'][0].startswith('EXPLAIN failed'))
+
+    def test_analyze_only_plain_selects(self):
+        """Test that EXPLAIN ANALYZE is kept from the queries with effects when run again"""
+        self.assertTrue(is_analyzable('SELECT id FROM core_user WHERE username = %s'))
+        self.assertFalse(is_analyzable('SELECT id FROM core_job WHERE status = %s FOR UPDATE SKIP LOCKED'))
+        self.assertFalse(is_analyzable('SELECT id FROM core_contract for no key update'))
+        self.assertFalse(is_analyzable('WITH gone AS (DELETE FROM core_change RETURNING seq) SELECT 1 FROM gone'))
+        self.assertFalse(is_analyzable('SELECT pg_advisory_xact_lock(%s)'))
+        self.assertFalse(is_analyzable("SELECT PG_NOTIFY('changes_contract', '12')"))
+        self.assertFalse(is_analyzable("SELECT nextval('core_change_seq_seq')"))
+        self.assertFalse(is_analyzable("SELECT setval ('core_change_seq_seq', 1)"))
+        self.assertFalse(is_analyzable('SELECT * INTO backup FROM core_contract'))
+        self.assertTrue(is_analyzable('SELECT "core_contract"."into_date" FROM core_contract'))
@@ -0,0 +1,8 @@
+from django.urls import path
+from core import views
+
+app_name = 'core'
+
+urlpatterns = [
+    path('jobs/<int:pk>/', views.JobDetailView.as_view(), name='job-detail'),
+]
@@ -0,0 +1,64 @@
+from django.conf import settings
+from django.db import DatabaseError
+from django.http import HttpResponse, JsonResponse
+from django.views.decorators.http import require_GET
+from prometheus_client import CONTENT_TYPE_LATEST
+from rest_framework import generics
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.permissions import IsAuthenticated
+
+from core import health, metrics
+from core.models import Job
+from core.serializers import JobSerializer
+
+
+@require_GET
+def metrics_view(request):
+    """Expose the app metrics in the Prometheus text format.
+
+    When METRICS_TOKEN is set the scraper has to send it as a bearer token."""
+    token = settings.METRICS_TOKEN
+    if token and request.META.get('HTTP_AUTHORIZATION') != 'Bearer ' + token:
+        return HttpResponse(status=401)
+    return HttpResponse(metrics.render_metrics(), content_type=CONTENT_TYPE_LATEST)
+
+
+@require_GET
+def liveness_view(request):
+    """Tell the orchestrator the process serves requests, without touching the database"""
+    return JsonResponse({'status': 'ok'})
+
+
+_migrated = False
+
+
+@require_GET
+def readiness_view(request):
+    """Tell the orchestrator whether the databases answer and are migrated"""
+    global _migrated
+    checks = {}
+    for alias in settings.DATABASES:
+        try:
+            health.check_database(alias)
+            checks[alias] = 'ok'
+        except DatabaseError as error:
+            checks[alias] = str(error).strip()
+    if not _migrated and checks['default'] == 'ok':
+        # the migrations never get unapplied, so they are only looked up until they are all in
+        _migrated = not health.pending_migrations()
+    checks['migrations'] = 'ok' if _migrated else 'pending'
+    ready = all(value == 'ok' for value in checks.values())
+    return JsonResponse({'status': 'ok' if ready else 'unavailable', 'checks': checks},
+                        status=200 if ready else 503)
+
+
+class JobDetailView(generics.RetrieveAPIView):
+    """To poll the status of a background job, staff see every job and others their own"""
+    serializer_class = JobSerializer
+    authentication_classes = (TokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+
+    def get_queryset(self):
+        if self.request.user.is_staff:
+            return Job.objects.all()
+        return Job.objects.filter(created_by=self.request.user)
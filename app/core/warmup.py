@@ -0,0 +1,46 @@
+"""Cache warmers run by `manage.py wait_for_db --warm-cache` before a container serves.
+
+A warmer is a function registered with the `warmer` decorator returning how many
+entries it loaded. The built in ones read the reference data and the token lookups
+every request makes, so their pages are in the PostgreSQL buffer cache, which is
+shared by all the app processes, instead of being read from disk by the first users.
+They stream the rows, a table of tokens is never held in memory."""
+from rest_framework.authtoken.models import Token
+
+from core import models
+
+
+WARMERS = {}
+
+
+def warmer(name):
+    """Register a function warming a cache"""
+    def register(func):
+        WARMERS[name] = func
+        return func
+    return register
+
+
+def warm():
+    """Run every warmer, returning the entries each one loaded"""
+    return {name: func() for name, func in WARMERS.items()}
+
+
+def read_rows(queryset):
+    """Read every row of the queryset without keeping them, returning how many there were"""
+    return sum(1 for _ in queryset.iterator())
+
+
+@warmer('reference data')
+def warm_reference_data():
+    return sum(read_rows(queryset) for queryset in (
+        models.Country.objects.all(),
+        models.VirtualService.objects.all(),
+        models.POSCompany.objects.all(),
+        models.PosModel.objects.all(),
+    ))
+
+
+@warmer('tokens')
+def warm_tokens():
+    return read_rows(Token.objects.select_related('user').only('key', 'user__is_active'))
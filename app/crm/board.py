@@ -0,0 +1,60 @@
+"""The goal pipeline board, counts and first pages of the goals by status.
+
+The board is built with grouped queries and cached under the count and latest
+`updated_at` of the goals of each status, read from the database on every request
+with one grouped query. Any goal write changes them, in whichever process it was
+made, so a write invalidates every cached page size at once. The cache entries also
+expire after GOAL_BOARD_CACHE_SECONDS."""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max
+
+from core import metrics
+from core.models import MarketingGoal
+from crm.serializers import GoalSerializer
+
+
+def user_counts(goals, field):
+    rows = (goals.order_by().values(field, field + '__username')
+            .annotate(count=Count('id')).order_by('-count', field))
+    return [{'id': row[field], 'username': row[field + '__username'], 'count': row['count']} for row in rows]
+
+
+def status_versions():
+    """The (status, count, latest updated_at) of the goals, which any goal write changes"""
+    return list(MarketingGoal.objects.order_by('status').values_list('status')
+                .annotate(count=Count('id'), updated_at=Max('updated_at')))
+
+
+def build(versions, page_size):
+    goals = MarketingGoal.objects.all()
+    counts = {status: count for status, count, _ in versions}
+    columns = []
+    for status, label in MarketingGoal.status_choices:
+        page = goals.filter(status=status).order_by('-updated_at', '-id')[:page_size] if counts.get(status) else []
+        columns.append({
+            'status': status,
+            'label': label,
+            'count': counts.get(status, 0),
+            'goals': GoalSerializer(page, many=True).data,
+        })
+    return {
+        'columns': columns,
+        'created_by': user_counts(goals, 'created_by'),
+        'last_update': user_counts(goals, 'last_update'),
+    }
+
+
+def get_board(page_size):
+    """Return the board with the given number of goals per column, from the cache if fresh"""
+    versions = status_versions()
+    generation = hashlib.sha1(repr(versions).encode()).hexdigest()
+    key = 'goal-board:%s:%d' % (generation, page_size)
+    board = cache.get(key)
+    metrics.record_cache_lookup('goal_board', board is not None)
+    if board is None:
+        board = build(versions, page_size)
+        cache.set(key, board, settings.GOAL_BOARD_CACHE_SECONDS)
+    return board
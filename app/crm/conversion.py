@@ -0,0 +1,82 @@
+"""Conversion of an accepted marketing goal into a costumer.
+
+The costumer takes what the goal already knows, the request only adds the rest
+(bank and director details). Costumers with the same dedupe key, found through its
+index, are reported instead of creating a duplicate, unless the conversion is forced
+or the goal is linked to one of them."""
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
+from rest_framework import exceptions
+
+from core import models
+from core.normalize import dedupe_key
+from crm.serializers import CostumerSerializer
+
+
+class ConversionConflict(Exception):
+    """The goal can not be converted, `data` tells why"""
+
+    def __init__(self, detail, **data):
+        super().__init__(detail)
+        self.data = dict(data, detail=detail)
+
+
+def costumer_data(goal, data):
+    """The costumer fields known from the goal, overridden by the request"""
+    known = {
+        'trading_name': goal.trading_name,
+        'legal_name': goal.legal_name,
+        'business_bank_name': goal.legal_name,
+        'registered_address': goal.trading_address,
+        'registered_postal_code': goal.postal_code,
+        'business_postal_code': goal.postal_code,
+        'land_line': goal.land_line,
+        'business_email': goal.email,
+        'website': goal.website,
+        'director_name': goal.decision_maker,
+        'director_phone': goal.mobile,
+    }
+    known = {field: value for field, value in known.items() if value}
+    known.update(data)
+    return known
+
+
+def convert(goal_id, data, user, force=False):
+    """Create the costumer of an accepted goal with its trading address, or link an existing one.
+
+    Returns the costumer and whether it was created."""
+    with transaction.atomic():
+        goal = models.MarketingGoal.objects.select_for_update().get(pk=goal_id)
+        if goal.status != 'A':
+            raise ConversionConflict('Only accepted goals can be converted.')
+        if goal.costumer_id is not None:
+            raise ConversionConflict('The goal is already converted.', costumer=goal.costumer_id)
+
+        data = dict(data)
+        existing_id = data.pop('costumer', None)
+        if existing_id is not None:
+            costumer = models.Costumer.objects.visible().filter(pk=existing_id).first()
+            if costumer is None:
+                raise exceptions.ValidationError({'costumer': 'Costumer not found.'})
+            created = False
+        else:
+            serializer = CostumerSerializer(data=costumer_data(goal, data))
+            serializer.is_valid(raise_exception=True)
+            key = dedupe_key(serializer.validated_data.get('business_postal_code'),
+                             serializer.validated_data.get('trading_name'))
+            matches = list(models.Costumer.objects.visible().filter(dedupe_key=key).values_list('id', flat=True))
+            if matches and not force:
+                raise ConversionConflict('Matching costumers exist, link one or force the conversion.',
+                                         matches=matches)
+            try:
+                costumer = serializer.save(created_by=user, last_updated_by=user)
+            except DjangoValidationError as error:
+                raise exceptions.ValidationError(error.message_dict)
+            if goal.trading_address:
+                models.TradingAddress.objects.create(address=goal.trading_address, costumer=costumer)
+            created = True
+
+        goal.costumer = costumer
+        goal.last_update = user
+        goal.save(update_fields=['costumer', 'last_update', 'updated_at'])
+    return costumer, created
@@ -0,0 +1,84 @@
+"""Query parameter filters of the API lists.
+
+Each filter maps its parameters to a lookup, so the combinations staff use most
+(acquirer or creator by start date, the contracts missing a MID or TID) match the
+composite and partial indexes declared on the models."""
+from django.db.models import Q
+from django.utils.dateparse import parse_date
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+from core.models import Contract, Costumer
+
+
+def parse_boolean(name, value):
+    if value.lower() in ('1', 'true', 'yes'):
+        return True
+    if value.lower() in ('0', 'false', 'no'):
+        return False
+    raise ValidationError({name: 'Must be true or false.'})
+
+
+def parse_choices(name, value, choices):
+    values = [item.strip() for item in value.split(',') if item.strip()]
+    unknown = set(values) - set(dict(choices))
+    if unknown:
+        raise ValidationError({name: 'Unknown values: %s.' % ', '.join(sorted(unknown))})
+    return values
+
+
+def parse_id(name, value):
+    try:
+        return int(value)
+    except ValueError:
+        raise ValidationError({name: 'A whole number is required.'})
+
+
+def parse_date_param(name, value):
+    try:
+        date = parse_date(value)
+    except ValueError:
+        date = None
+    if date is None:
+        raise ValidationError({name: 'A date as YYYY-MM-DD is required.'})
+    return date
+
+
+class ContractFilter(BaseFilterBackend):
+    """Filter the contract list and the other list actions of the contracts.
+
+    `<date>__gte` and `<date>__lte` bound start_date, end_date, live_date and
+    pci_due_date; `acquire_name` and `business_type` take comma separated choices;
+    `country` and `created_by` an id; `has_m_id`, `has_t_id`, `has_e_commerce_m_id`
+    and `has_amex_m_id` true or false, blank ids counting as missing."""
+    date_fields = ('start_date', 'end_date', 'live_date', 'pci_due_date')
+    id_fields = ('m_id', 't_id', 'e_commerce_m_id', 'amex_m_id')
+
+    def filter_queryset(self, request, queryset, view):
+        if getattr(view, 'detail', True):
+            return queryset
+        params = request.query_params
+        filters = {}
+        for field in self.date_fields:
+            for lookup in ('gte', 'lte'):
+                name = '%s__%s' % (field, lookup)
+                if params.get(name):
+                    filters[name] = parse_date_param(name, params[name])
+        if params.get('acquire_name'):
+            filters['acquire_name__in'] = parse_choices('acquire_name', params['acquire_name'],
+                                                        Contract.acquire_name_choices)
+        if params.get('business_type'):
+            filters['costumer__business_type__in'] = parse_choices('business_type', params['business_type'],
+                                                                   Costumer.business_choices)
+        if params.get('country'):
+            filters['costumer__country'] = parse_id('country', params['country'])
+        if params.get('created_by'):
+            filters['created_by'] = parse_id('created_by', params['created_by'])
+        queryset = queryset.filter(**filters)
+
+        for field in self.id_fields:
+            name = 'has_' + field
+            if params.get(name):
+                missing = Q(**{field + '__isnull': True}) | Q(**{field: ''})
+                queryset = queryset.exclude(missing) if parse_boolean(name, params[name]) else queryset.filter(missing)
+        return queryset
@@ -0,0 +1,308 @@
+"""Forecasts computed for the whole portfolio at once with NumPy.
+
+The history is read in one ordered pass over the table into arrays, and the
+per-costumer or per-contract figures are computed with array operations across all
+of them instead of a query and a Python loop each.
+
+Paper rolls: a costumer uses up every order before its next one, so the rolls of all
+the orders but the last, over the days from the first order to the last, give its
+daily consumption. The last order runs out after its amount at that rate, and the
+next order is due PAPER_ROLL_LEAD_DAYS before that. Costumers whose orders span less
+than a day have no forecast, a rate over hours would be inflated.
+
+MID revenues: the monthly income and profit of each contract over the last
+MID_FORECAST_HISTORY_MONTHS full months are fitted with a least squares trend, plus
+a calendar month offset once there are two years of history. Contracts with less than
+MID_FORECAST_MIN_MONTHS of history are projected from their annual card turnover at
+the portfolio's income and profit rates. Runs after the first recompute only the
+contracts with revenue or contract changes in the change log since the previous
+run, except on the first run of a month, when the history window moves for all. The
+revenue changes carry their contract, so deleted revenue and revenue moved to another
+contract refresh the contracts they left."""
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from core import jobs, sync
+from core.models import (Checkpoint, Contract, Costumer, MIDRevenue, MIDRevenueForecast, PaperRoll,
+                         PaperRollForecast)
+
+
+SECONDS_PER_DAY = 86400
+MIN_SPAN_DAYS = 1
+MID_CHECKPOINT = 'mid-revenue-forecast'
+MID_FORECAST_MONTHS = 12
+
+
+def to_datetime(day):
+    return datetime.fromtimestamp(day * SECONDS_PER_DAY, tz=timezone.utc)
+
+
+def group_bounds(keys):
+    """The start and end indices of the runs of equal keys of a sorted array"""
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    ends = np.r_[starts[1:], len(keys)]
+    return starts, ends
+
+
+def read_paper_roll_orders():
+    """The confirmed orders of the visible costumers as arrays sorted by costumer and date"""
+    rows = (PaperRoll.objects.filter(is_draft=False, costumer__in=Costumer.objects.visible())
+            .order_by('costumer_id', 'ordered_date', 'id')
+            .values_list('costumer_id', 'ordered_date', 'amount', 'id').iterator())
+    costumers, days, amounts, ids = [], [], [], []
+    for costumer_id, ordered_date, amount, pk in rows:
+        costumers.append(costumer_id)
+        days.append(ordered_date.timestamp() / SECONDS_PER_DAY)
+        amounts.append(amount)
+        ids.append(pk)
+    return (np.array(costumers, dtype=np.int64), np.array(days, dtype=np.float64),
+            np.array(amounts, dtype=np.float64), np.array(ids, dtype=np.int64))
+
+
+def paper_roll_rates(costumers, days, amounts):
+    """Per costumer with a rate: its id, order count, daily rate, last order index and run out day"""
+    if not len(costumers):
+        empty = np.array([], dtype=np.int64)
+        return empty, empty, np.array([]), empty, np.array([])
+    starts, ends = group_bounds(costumers)
+    last = ends - 1
+    span = days[last] - days[starts]
+    consumed = np.add.reduceat(amounts, starts) - amounts[last]
+    usable = (span >= MIN_SPAN_DAYS) & (consumed > 0)
+    rate = np.divide(consumed, span, out=np.zeros_like(span), where=usable)
+    last = last[usable]
+    rate = rate[usable]
+    run_out = days[last] + amounts[last] / rate
+    return costumers[last], (ends - starts)[usable], rate, last, run_out
+
+
+def forecast_paper_rolls(create_drafts=None):
+    """Recompute the paper roll forecasts, creating draft orders for the ones due soon if asked.
+
+    Drafts are created for the orders due within PAPER_ROLL_DRAFT_DAYS of costumers
+    without a draft already, repeating their last order."""
+    if create_drafts is None:
+        create_drafts = settings.PAPER_ROLL_DRAFT_ORDERS
+    now = timezone.now()
+    costumers, days, amounts, ids = read_paper_roll_orders()
+    costumer_ids, counts, rates, last, run_out = paper_roll_rates(costumers, days, amounts)
+    next_order = run_out - settings.PAPER_ROLL_LEAD_DAYS
+
+    forecasts = [
+        PaperRollForecast(costumer_id=int(costumer_id), orders=int(count), daily_rate=float(rate),
+                          last_ordered_date=to_datetime(days[index]),
+                          next_order_date=timezone.localdate(to_datetime(day)), amount=int(amounts[index]),
+                          computed_at=now)
+        for costumer_id, count, rate, index, day in zip(costumer_ids, counts, rates, last, next_order)
+    ]
+    drafts = []
+    with transaction.atomic():
+        PaperRollForecast.objects.all().delete()
+        PaperRollForecast.objects.bulk_create(forecasts, batch_size=1000)
+        if create_drafts:
+            drafts = create_draft_orders(forecasts, ids[last], now)
+    return {'costumers': len(forecasts), 'orders': len(days), 'drafts': len(drafts)}
+
+
+def create_draft_orders(forecasts, last_order_ids, now):
+    """Create the draft orders of the forecasts due soon, copying the last order of each costumer"""
+    due = timezone.localdate(now) + timedelta(days=settings.PAPER_ROLL_DRAFT_DAYS)
+    drafted = set(PaperRoll.objects.filter(is_draft=True).values_list('costumer_id', flat=True))
+    due_orders = {int(order_id): forecast for forecast, order_id in zip(forecasts, last_order_ids)
+                  if forecast.next_order_date <= due and forecast.costumer_id not in drafted}
+    drafts = []
+    for order in PaperRoll.objects.filter(pk__in=due_orders):
+        forecast = due_orders[order.pk]
+        ordered_date = max(now, timezone.make_aware(datetime.combine(forecast.next_order_date, time.min)))
+        drafts.append(PaperRoll(costumer_id=order.costumer_id, amount=order.amount, cost=order.cost,
+                                price=order.price, direct_debit_cost=order.direct_debit_cost,
+                                ordered_date=ordered_date, is_draft=True))
+    drafts = PaperRoll.objects.bulk_create(drafts, batch_size=1000)
+    if drafts and drafts[0].pk is None:
+        # the backend does not return the ids of bulk inserts
+        drafts = list(PaperRoll.objects.filter(is_draft=True, created_at__gte=now,
+                                               costumer__in=[draft.costumer_id for draft in drafts]))
+    sync.record_changes(PaperRoll, [draft.pk for draft in drafts], 'C')
+    return drafts
+
+
+def month_index(value):
+    return value.year * 12 + value.month - 1
+
+
+def month_start(index):
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def month_datetime(index):
+    """The local midnight starting a month, to compare with datetimes"""
+    return timezone.make_aware(datetime.combine(month_start(index), time.min))
+
+
+def fit_trends(values, observed):
+    """Least squares lines through the observed months of each row, as (intercepts, slopes)"""
+    t = np.arange(values.shape[1], dtype=np.float64)
+    weights = observed.astype(np.float64)
+    n = weights.sum(axis=1)
+    sum_t = weights @ t
+    sum_tt = weights @ (t * t)
+    sum_y = (weights * values).sum(axis=1)
+    sum_ty = (weights * values) @ t
+    denominator = n * sum_tt - sum_t ** 2
+    slopes = np.divide(n * sum_ty - sum_t * sum_y, denominator, out=np.zeros_like(sum_y), where=denominator > 0)
+    intercepts = np.divide(sum_y - slopes * sum_t, n, out=np.zeros_like(sum_y), where=n > 0)
+    return intercepts, slopes
+
+
+def seasonal_offsets(values, observed, intercepts, slopes, calendar, seasonal):
+    """The mean residual of each calendar month per row, centred, for the seasonal rows only"""
+    t = np.arange(values.shape[1], dtype=np.float64)
+    residuals = (values - (intercepts[:, None] + slopes[:, None] * t)) * observed
+    months = (calendar[:, None] == np.arange(12)).astype(np.float64)
+    counts = observed.astype(np.float64) @ months
+    offsets = np.divide(residuals @ months, counts, out=np.zeros((len(values), 12)), where=counts > 0)
+    offsets -= offsets.mean(axis=1, keepdims=True)
+    offsets[~seasonal] = 0
+    return offsets
+
+
+def project(values, observed, calendar, future_calendar, seasonal):
+    """Fit every row and project it over the future months"""
+    intercepts, slopes = fit_trends(values, observed)
+    offsets = seasonal_offsets(values, observed, intercepts, slopes, calendar, seasonal)
+    t = np.arange(values.shape[1], values.shape[1] + len(future_calendar), dtype=np.float64)
+    return intercepts[:, None] + slopes[:, None] * t + offsets[:, future_calendar]
+
+
+def portfolio_rates(current_month):
+    """The income per card turnover and profit per income of the contracts with revenue over the last year"""
+    revenues = MIDRevenue.objects.filter(date__gte=month_datetime(current_month - 12),
+                                         date__lt=month_datetime(current_month))
+    totals = revenues.aggregate(income=Sum('income'), profit=Sum('profit'))
+    turnover = (Contract.objects.filter(pk__in=revenues.values('contract_id'))
+                .aggregate(turnover=Sum('annual_card_turnover'))['turnover'])
+    income = float(totals['income'] or 0)
+    income_rate = income / float(turnover) if turnover else 0.0
+    profit_rate = float(totals['profit'] or 0) / income if income else 0.0
+    return income_rate, profit_rate
+
+
+def read_mid_revenues(contract_ids, first_month, current_month):
+    """The monthly income and profit of the contracts as (row, month) indexed arrays"""
+    rows = (MIDRevenue.objects.filter(contract__in=contract_ids, date__gte=month_datetime(first_month),
+                                      date__lt=month_datetime(current_month))
+            .annotate(month=TruncMonth('date')).order_by().values('contract_id', 'month')
+            .annotate(income=Sum('income'), profit=Sum('profit'))
+            .values_list('contract_id', 'month', 'income', 'profit'))
+    positions = {contract_id: position for position, contract_id in enumerate(contract_ids)}
+    contracts, months, incomes, profits = [], [], [], []
+    for contract_id, month, income, profit in rows:
+        contracts.append(positions[contract_id])
+        months.append(month_index(month))
+        incomes.append(float(income))
+        profits.append(float(profit))
+    return (np.array(contracts, dtype=np.int64), np.array(months, dtype=np.int64),
+            np.array(incomes, dtype=np.float64), np.array(profits, dtype=np.float64))
+
+
+def forecast_mid_revenue_batch(contract_ids, first_month, current_month, rates, now):
+    """Replace the MID revenue forecasts of a batch of contracts"""
+    history = current_month - first_month
+    rows, months, incomes, profits = read_mid_revenues(contract_ids, first_month, current_month)
+    columns = months - first_month
+    income = np.zeros((len(contract_ids), history))
+    profit = np.zeros((len(contract_ids), history))
+    np.add.at(income, (rows, columns), incomes)
+    np.add.at(profit, (rows, columns), profits)
+    # the months since the first revenue of a contract count, even those without revenue
+    first = np.full(len(contract_ids), history)
+    np.minimum.at(first, rows, columns)
+    observed = np.arange(history)[None, :] >= first[:, None]
+    months_observed = observed.sum(axis=1)
+
+    calendar = (first_month + np.arange(history)) % 12
+    future_calendar = (current_month + np.arange(MID_FORECAST_MONTHS)) % 12
+    seasonal = months_observed >= 24
+    projected_income = np.maximum(project(income, observed, calendar, future_calendar, seasonal), 0)
+    projected_profit = project(profit, observed, calendar, future_calendar, seasonal)
+
+    turnover = dict(Contract.objects.filter(pk__in=contract_ids).values_list('id', 'annual_card_turnover'))
+    monthly_turnover = np.array([float(turnover[pk]) for pk in contract_ids]) / 12
+    from_turnover = months_observed < settings.MID_FORECAST_MIN_MONTHS
+    income_rate, profit_rate = rates
+    projected_income[from_turnover] = (monthly_turnover[from_turnover] * income_rate)[:, None]
+    projected_profit[from_turnover] = projected_income[from_turnover] * profit_rate
+    methods = np.where(from_turnover, 'C', np.where(seasonal, 'S', 'T'))
+
+    forecasts = [
+        MIDRevenueForecast(contract_id=contract_id, month=month_start(current_month + k),
+                           income=Decimal('%.2f' % projected_income[row, k]),
+                           profit=Decimal('%.2f' % projected_profit[row, k]), method=methods[row], computed_at=now)
+        for row, contract_id in enumerate(contract_ids) for k in range(MID_FORECAST_MONTHS)
+    ]
+    with transaction.atomic():
+        MIDRevenueForecast.objects.filter(contract__in=contract_ids).delete()
+        MIDRevenueForecast.objects.bulk_create(forecasts, batch_size=1000)
+
+
+def up_to(cursor):
+    txid, seq = cursor
+    return Q(txid__lt=txid) | Q(txid=txid, seq__lte=seq)
+
+
+def changed_contracts(since, until):
+    """The contracts with revenue or contract changes in the change log between two cursors"""
+    changes = (sync.changes_after(since).filter(up_to(until))
+               .filter(model__in=[Contract._meta.model_name, MIDRevenue._meta.model_name])
+               .values_list('model', 'object_id', 'parent_id'))
+    contract_ids, unknown = set(), set()
+    for model_name, object_id, parent_id in changes:
+        if model_name == Contract._meta.model_name:
+            contract_ids.add(object_id)
+        elif parent_id is not None:
+            contract_ids.add(parent_id)
+        else:
+            # recorded before the changes carried their contract
+            unknown.add(object_id)
+    contract_ids.update(MIDRevenue.objects.filter(pk__in=unknown).values_list('contract_id', flat=True))
+    return contract_ids
+
+
+def forecast_mid_revenues(full=False, job=None):
+    """Recompute the MID revenue forecasts of the contracts that changed, or of all with `full`.
+
+    Each batch of MID_FORECAST_BATCH_SIZE contracts is replaced in its own transaction,
+    the checkpoint moves once they are all done."""
+    now = timezone.now()
+    current_month = month_index(timezone.localdate(now))
+    first_month = current_month - settings.MID_FORECAST_HISTORY_MONTHS
+    checkpoint, _ = Checkpoint.objects.get_or_create(name=MID_CHECKPOINT)
+    last_cursor = sync.visible_changes().values_list('txid', 'seq').last() or (0, 0)
+    full = full or checkpoint.data.get('month') != current_month
+    contracts = Contract.objects.visible().filter(costumer__deletion_requested_at__isnull=True)
+    if full:
+        contract_ids = list(contracts.order_by('id').values_list('id', flat=True))
+        MIDRevenueForecast.objects.exclude(contract__in=contracts).delete()
+    else:
+        changed = changed_contracts(checkpoint.cursor, last_cursor)
+        contract_ids = list(contracts.filter(pk__in=changed).order_by('id').values_list('id', flat=True))
+        MIDRevenueForecast.objects.filter(contract__in=changed - set(contract_ids)).delete()
+
+    rates = portfolio_rates(current_month)
+    batch_size = settings.MID_FORECAST_BATCH_SIZE
+    for start in range(0, len(contract_ids), batch_size):
+        forecast_mid_revenue_batch(contract_ids[start:start + batch_size], first_month, current_month, rates, now)
+        if job is not None:
+            jobs.report_progress(job, contracts=min(start + batch_size, len(contract_ids)))
+
+    # a run that went further meanwhile keeps its checkpoint
+    Checkpoint.objects.filter(up_to(last_cursor), name=MID_CHECKPOINT).update(
+        txid=last_cursor[0], seq=last_cursor[1], data={'month': current_month}, updated_at=now)
+    return {'contracts': len(contract_ids), 'full': full}
@@ -0,0 +1,194 @@
+"""Import of purchased lead lists, CSV or XLSX, as marketing goals.
+
+The rows are streamed from the file and handled in batches of GOAL_IMPORT_BATCH_SIZE:
+each row is normalized and validated, its dedupe key (core.normalize) is looked up
+among the goals and costumers with one indexed IN query per batch, and the new goals
+are inserted with one bulk insert. Every row gets a verdict: created, duplicate (of
+a goal, a costumer or an earlier row of the file) or invalid.
+
+CSV files are read as UTF-8, or as the Windows-1252 or Latin-1 the spreadsheet
+exports of many vendors use when they are not. The batches imported are committed as
+they go, so an import failing midway still stores the verdicts of the rows done.
+
+Imports run side by side on the imports queue, so on PostgreSQL each batch holds an
+advisory lock from its duplicate lookup to its commit: two files with the same lead
+can not both find it new."""
+import csv
+import io
+import zlib
+from itertools import islice
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+
+from core import jobs, sync
+from core.models import Costumer, MarketingGoal
+from core.normalize import dedupe_key, normalize_phone
+
+
+FIELDS = ('trading_name', 'legal_name', 'business_field', 'land_line', 'trading_address', 'postal_code',
+          'decision_maker', 'mobile', 'email', 'website', 'note')
+
+# Other column headers the lead vendors use for the goal fields
+ALIASES = {
+    'name': 'trading_name', 'business_name': 'trading_name', 'company_name': 'legal_name',
+    'industry': 'business_field', 'sector': 'business_field', 'category': 'business_field',
+    'phone': 'land_line', 'telephone': 'land_line', 'landline': 'land_line', 'mobile_phone': 'mobile',
+    'address': 'trading_address', 'postcode': 'postal_code', 'post_code': 'postal_code', 'zip': 'postal_code',
+    'contact': 'decision_maker', 'contact_name': 'decision_maker', 'web': 'website', 'notes': 'note',
+}
+
+# Tried in turn on CSV files, Latin-1 decodes any byte
+CSV_ENCODINGS = ('utf-8-sig', 'cp1252', 'latin-1')
+
+IMPORT_LOCK = zlib.crc32(b'lead-import')
+
+
+def column_field(header):
+    name = '_'.join(str(header or '').strip().lower().replace('-', ' ').split())
+    name = ALIASES.get(name, name)
+    return name if name in FIELDS else None
+
+
+def decode_csv(content):
+    for encoding in CSV_ENCODINGS:
+        try:
+            return content.decode(encoding)
+        except UnicodeDecodeError:
+            pass
+
+
+def read_csv(content):
+    reader = csv.reader(io.StringIO(decode_csv(content), newline=''))
+    header = next(reader, [])
+    for values in reader:
+        if any(values):
+            yield dict(zip(header, values))
+
+
+def read_xlsx(content):
+    try:
+        import openpyxl
+    except ImportError:
+        raise ValidationError('XLSX files need openpyxl to be installed.')
+    workbook = openpyxl.load_workbook(io.BytesIO(content), read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, ())
+        for values in rows:
+            if any(value is not None for value in values):
+                yield dict(zip(header, values))
+    finally:
+        workbook.close()
+
+
+def read_rows(file_name, content):
+    """Stream the rows of the file as {header: value} dicts"""
+    if file_name.lower().endswith('.xlsx'):
+        return read_xlsx(content)
+    return read_csv(content)
+
+
+def normalize_row(row):
+    """Map the columns of a row to goal fields, trimming the values and formatting the phones"""
+    fields = {}
+    for header, value in row.items():
+        field = column_field(header)
+        if field is None or value is None:
+            continue
+        if isinstance(value, float) and value.is_integer():
+            value = int(value)
+        value = ' '.join(str(value).split())
+        if field in ('land_line', 'mobile'):
+            value = normalize_phone(value)
+        elif field == 'postal_code':
+            value = value.upper()
+        if value:
+            fields[field] = value
+    return fields
+
+
+def lock_imports():
+    """Serialize the duplicate lookups and inserts of the imports until the transaction ends"""
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_xact_lock(%s)', [IMPORT_LOCK])
+
+
+def import_batch(rows, user, seen):
+    """Import a batch of (row number, row), returning the verdict of every row"""
+    verdicts = {}
+    prepared = []
+    for number, row in rows:
+        goal = MarketingGoal(created_by=user, last_update=user, **normalize_row(row))
+        try:
+            goal.clean_fields(exclude=['created_by', 'last_update'])
+        except ValidationError as error:
+            verdicts[number] = {'row': number, 'verdict': 'invalid', 'errors': error.message_dict}
+            continue
+        goal.dedupe_key = dedupe_key(goal.postal_code, goal.trading_name)
+        prepared.append((number, goal))
+
+    keys = {goal.dedupe_key for _, goal in prepared}
+    new = []
+    with transaction.atomic():
+        lock_imports()
+        goal_matches = dict(MarketingGoal.objects.filter(dedupe_key__in=keys).values_list('dedupe_key', 'id'))
+        costumer_matches = dict(Costumer.objects.filter(dedupe_key__in=keys).values_list('dedupe_key', 'id'))
+        for number, goal in prepared:
+            key = goal.dedupe_key
+            if key in goal_matches:
+                verdicts[number] = {'row': number, 'verdict': 'duplicate', 'goal': goal_matches[key]}
+            elif key in costumer_matches:
+                verdicts[number] = {'row': number, 'verdict': 'duplicate', 'costumer': costumer_matches[key]}
+            elif key in seen:
+                verdicts[number] = {'row': number, 'verdict': 'duplicate', 'duplicate_of_row': seen[key]}
+            else:
+                seen[key] = number
+                new.append((number, goal))
+
+        created = MarketingGoal.objects.bulk_create([goal for _, goal in new])
+        if any(goal.pk is None for goal in created):
+            # the backend does not return the ids of bulk inserts, the new keys are unique
+            ids = dict(MarketingGoal.objects.filter(dedupe_key__in=[goal.dedupe_key for goal in created])
+                       .values_list('dedupe_key', 'id'))
+            for goal in created:
+                goal.pk = ids[goal.dedupe_key]
+        sync.record_changes(MarketingGoal, [goal.pk for goal in created], 'C')
+    for number, goal in new:
+        verdicts[number] = {'row': number, 'verdict': 'created', 'goal': goal.pk}
+    return [verdicts[number] for number, _ in rows]
+
+
+def run_import(goal_import, job=None):
+    """Import the rows of an uploaded lead list, storing the verdicts and a summary on it"""
+    rows = enumerate(read_rows(goal_import.file_name, bytes(goal_import.content)), start=2)
+    verdicts = []
+    seen = {}
+    try:
+        while True:
+            batch = list(islice(rows, settings.GOAL_IMPORT_BATCH_SIZE))
+            if not batch:
+                break
+            verdicts.extend(import_batch(batch, goal_import.created_by, seen))
+            if job is not None:
+                jobs.report_progress(job, rows=len(verdicts))
+    except Exception as error:
+        store_result(goal_import, verdicts, error)
+        raise
+    return store_result(goal_import, verdicts)
+
+
+def store_result(goal_import, verdicts, error=None):
+    """Store the verdicts and summary of the import, with the error that stopped it if any"""
+    summary = {'rows': len(verdicts)}
+    for verdict in verdicts:
+        summary[verdict['verdict']] = summary.get(verdict['verdict'], 0) + 1
+    if error is not None:
+        summary['failed'] = str(error) or error.__class__.__name__
+    goal_import.summary = summary
+    goal_import.verdicts = verdicts
+    goal_import.content = b''
+    goal_import.save(update_fields=['summary', 'verdicts', 'content'])
+    return summary
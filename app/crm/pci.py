@@ -0,0 +1,65 @@
+"""The PCI-DSS worklist, the contracts whose compliance is due within PCI_DUE_DAYS or overdue.
+
+The worklist is kept up to date incrementally by a scheduled job. Each run
+re-examines only the contracts changed since the previous one, read from the change
+log after the run's checkpoint (see core.sync). The log is read up to the
+transactions that have all ended, so a change still being committed is picked up by
+the next run.
+
+Each run also adds the contracts the advancing horizon now reaches, with an index
+range scan on `pci_due_date` between the previous horizon and the new one. The first
+run scans everything due up to the horizon."""
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from core import sync
+from core.models import Checkpoint, Contract, PCIWorklistItem
+
+
+CHECKPOINT = 'pci-worklist'
+
+
+def visible_contracts():
+    return Contract.objects.visible().filter(costumer__deletion_requested_at__isnull=True)
+
+
+def scan(today=None):
+    """Bring the worklist up to date, returning how many items were added, updated and removed"""
+    today = today or timezone.localdate()
+    horizon = today + timedelta(days=settings.PCI_DUE_DAYS)
+    with transaction.atomic():
+        checkpoint, _ = Checkpoint.objects.select_for_update().get_or_create(name=CHECKPOINT)
+        previous_horizon = checkpoint.data.get('horizon')
+
+        changes = list(sync.changes_after(checkpoint.cursor).filter(model=Contract._meta.model_name)
+                       .values_list('txid', 'seq', 'object_id'))
+        changed = {object_id for _, _, object_id in changes}
+        due = dict(visible_contracts().filter(pk__in=changed, pci_due_date__lte=horizon)
+                   .values_list('pk', 'pci_due_date'))
+        reached = visible_contracts().filter(pci_due_date__lte=horizon)
+        if previous_horizon is not None:
+            reached = reached.filter(pci_due_date__gt=date.fromisoformat(previous_horizon))
+        due.update(reached.values_list('pk', 'pci_due_date'))
+
+        items = PCIWorklistItem.objects.in_bulk(set(due) | changed, field_name='contract_id')
+        removed = [contract_id for contract_id in changed if contract_id in items and contract_id not in due]
+        updated = []
+        for contract_id, item in items.items():
+            if contract_id in due and item.pci_due_date != due[contract_id]:
+                item.pci_due_date = due[contract_id]
+                updated.append(item)
+        added = [PCIWorklistItem(contract_id=contract_id, pci_due_date=due_date)
+                 for contract_id, due_date in due.items() if contract_id not in items]
+
+        PCIWorklistItem.objects.filter(contract_id__in=removed).delete()
+        PCIWorklistItem.objects.bulk_update(updated, ['pci_due_date'])
+        PCIWorklistItem.objects.bulk_create(added)
+
+        if changes:
+            checkpoint.txid, checkpoint.seq = changes[-1][:2]
+        checkpoint.data = {'horizon': max(horizon.isoformat(), previous_horizon or '')}
+        checkpoint.save()
+    return {'added': len(added), 'updated': len(updated), 'removed': len(removed)}
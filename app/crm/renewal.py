@@ -0,0 +1,110 @@
+"""Bulk renewal of contracts.
+
+A renewal is a copy of the contract with new dates, pointing back to it with
+`renewed_from`, along with copies of its POS and virtual service lines. However
+many contracts are renewed, the copies are made in one transaction by three
+INSERT ... SELECT statements, one per table, so no row goes through Python."""
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from core import sync
+from core.models import Contract, ContractPOS, ContractService
+
+
+def next_dates(contract):
+    """The dates of a renewal for the same length, starting the day after the contract ends"""
+    start_date = contract.end_date + timedelta(days=1)
+    return start_date, start_date + (contract.end_date - contract.start_date)
+
+
+def date_case(column, values):
+    """A CASE expression picking a value by contract id, with its parameters"""
+    sql = 'CASE %s %s END' % (column, ' '.join(['WHEN %s THEN %s'] * len(values)))
+    return sql, [param for pk, value in values.items() for param in (pk, connection.ops.adapt_datefield_value(value))]
+
+
+def insert_renewals(dates, user, now):
+    """Copy the contracts with the new (start_date, end_date) of each contract id"""
+    table = connection.ops.quote_name(Contract._meta.db_table)
+    source_id = 'c.%s' % connection.ops.quote_name(Contract._meta.pk.column)
+    values = {
+        'id': None,
+        'version': ('%s', [1]),
+        'start_date': date_case(source_id, {pk: start_date for pk, (start_date, _) in dates.items()}),
+        'end_date': date_case(source_id, {pk: end_date for pk, (_, end_date) in dates.items()}),
+        'created_at': ('%s', [connection.ops.adapt_datetimefield_value(now)]),
+        'created_by': ('%s', [user.pk]),
+        'deletion_requested_at': ('NULL', []),
+        'renewed_from': (source_id, []),
+    }
+    columns, selected, params = [], [], []
+    for field in Contract._meta.concrete_fields:
+        value = values.get(field.name, ('c.%s' % connection.ops.quote_name(field.column), []))
+        if value is None:
+            continue
+        columns.append(connection.ops.quote_name(field.column))
+        selected.append(value[0])
+        params.extend(value[1])
+    ids = ', '.join(['%s'] * len(dates))
+    with connection.cursor() as cursor:
+        cursor.execute('INSERT INTO %s (%s) SELECT %s FROM %s c WHERE %s IN (%s)' % (
+            table, ', '.join(columns), ', '.join(selected), table, source_id, ids), params + list(dates))
+
+
+def copy_lines(model, fields, contract_ids, user, now):
+    """Copy the lines of the contracts to their renewals"""
+    quote = connection.ops.quote_name
+
+    def column(name):
+        return quote(model._meta.get_field(name).column)
+
+    columns = [column(name) for name in fields]
+    ids = ', '.join(['%s'] * len(contract_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'INSERT INTO %(table)s (%(contract)s, %(columns)s, %(created_at)s, %(created_by)s) '
+            'SELECT r.%(id)s, %(selected)s, %%s, %%s FROM %(table)s l '
+            'JOIN %(contracts)s r ON r.%(renewed_from)s = l.%(contract)s '
+            'WHERE l.%(contract)s IN (%(ids)s)' % {
+                'table': quote(model._meta.db_table), 'contract': column('contract'),
+                'columns': ', '.join(columns), 'selected': ', '.join('l.' + name for name in columns),
+                'created_at': column('created_at'), 'created_by': column('created_by'),
+                'contracts': quote(Contract._meta.db_table), 'id': quote(Contract._meta.pk.column),
+                'renewed_from': quote(Contract._meta.get_field('renewed_from').column), 'ids': ids,
+            }, [connection.ops.adapt_datetimefield_value(now), user.pk] + list(contract_ids))
+
+
+def renew(contract_ids, user, start_date=None, end_date=None):
+    """Renew the contracts, returning {contract id: renewal id}.
+
+    The renewals run from `start_date` to `end_date` when they are given, otherwise
+    each for the length of its contract from the day after it ends. Contracts not
+    found or already renewed are refused."""
+    contract_ids = set(contract_ids)
+    now = timezone.now()
+    with transaction.atomic():
+        contracts = list(Contract.objects.visible().filter(pk__in=contract_ids)
+                         .filter(costumer__deletion_requested_at__isnull=True)
+                         .select_for_update(of=('self',)).only('id', 'start_date', 'end_date'))
+        missing = contract_ids - {contract.pk for contract in contracts}
+        if missing:
+            raise ValidationError({'contracts': 'Contracts not found: %s.' % ', '.join(map(str, sorted(missing)))})
+        renewed = sorted(Contract.objects.filter(renewed_from__in=contract_ids).values_list('renewed_from', flat=True))
+        if renewed:
+            raise ValidationError({'contracts': 'Contracts already renewed: %s.' % ', '.join(map(str, renewed))})
+
+        dates = {contract.pk: (start_date, end_date) if start_date else next_dates(contract)
+                 for contract in contracts}
+        insert_renewals(dates, user, now)
+        copy_lines(ContractPOS, ['pos', 'price', 'hardware_cost', 'software_cost'], contract_ids, user, now)
+        copy_lines(ContractService, ['service', 'price', 'cost'], contract_ids, user, now)
+
+        renewals = dict(Contract.objects.filter(renewed_from__in=contract_ids).values_list('renewed_from', 'id'))
+        sync.record_changes(Contract, sorted(renewals.values()), 'C')
+        for model in (ContractPOS, ContractService):
+            line_ids = model.objects.filter(contract__in=renewals.values()).values_list('id', flat=True)
+            sync.record_changes(model, list(line_ids), 'C')
+    return renewals
@@ -0,0 +1,129 @@
+"""Full-text search over the costumers, marketing goals and POSes.
+
+On PostgreSQL the rows carry a `search_vector` column kept up to date by triggers
+(migration core 0033) and indexed with GIN: a search is one indexed match per model
+ranked with ts_rank_cd, and the highlighted snippets are built with ts_headline for
+the returned rows only. Other backends fall back to icontains over the same fields
+with the snippets cut in Python, which is fine for development databases."""
+import html
+import re
+
+from django.db import connection
+from django.db.models import BooleanField, FloatField, Q, TextField
+from django.db.models.expressions import RawSQL
+
+from core.models import Costumer, MarketingGoal, POS
+
+
+CONFIG = 'english'
+HEADLINE_OPTIONS = 'StartSel=<mark>, StopSel=</mark>, MaxFragments=2, MaxWords=20, MinWords=6'
+SNIPPET_LENGTH = 120
+
+
+class Target:
+    """A searchable model: the rows searched, the field naming a row and the fields snippets come from"""
+
+    def __init__(self, model, queryset, title_field, fields, snippet_fields):
+        self.model = model
+        self.queryset = queryset
+        self.title_field = title_field
+        self.fields = fields
+        self.snippet_fields = snippet_fields
+
+    @property
+    def table(self):
+        return connection.ops.quote_name(self.model._meta.db_table)
+
+    def column(self, field):
+        return '%s.%s' % (self.table, connection.ops.quote_name(self.model._meta.get_field(field).column))
+
+
+TARGETS = {
+    'costumer': Target(
+        Costumer, lambda: Costumer.objects.visible(), 'trading_name',
+        ('trading_name', 'legal_name', 'registered_address', 'registered_postal_code', 'director_address',
+         'trading_address__address', 'note'),
+        ('note', 'registered_address', 'director_address'),
+    ),
+    'goal': Target(
+        MarketingGoal, lambda: MarketingGoal.objects.all(), 'trading_name',
+        ('trading_name', 'legal_name', 'trading_address', 'postal_code', 'note'),
+        ('note', 'trading_address'),
+    ),
+    'pos': Target(
+        POS, lambda: POS.objects.all(), 'serial_number',
+        ('serial_number', 'note'),
+        ('note',),
+    ),
+}
+
+
+def mark(text):
+    """Escape a ts_headline snippet, keeping only its <mark> tags"""
+    text = html.escape(text)
+    return text.replace('&lt;mark&gt;', '<mark>').replace('&lt;/mark&gt;', '</mark>')
+
+
+def full_text_search(target, queryset, query, limit):
+    tsquery = 'plainto_tsquery(%s, %s)'
+    matches = RawSQL('%s.search_vector @@ %s' % (target.table, tsquery), (CONFIG, query),
+                     output_field=BooleanField())
+    rank = RawSQL('ts_rank_cd(%s.search_vector, %s)' % (target.table, tsquery), (CONFIG, query),
+                  output_field=FloatField())
+    rows = list(queryset.filter(matches).annotate(rank=rank).order_by('-rank', '-pk')
+                .values_list('pk', target.title_field, 'rank')[:limit])
+
+    document = 'concat_ws(%s, %s)' % ("' … '", ', '.join(target.column(field) for field in target.snippet_fields))
+    headline = RawSQL('ts_headline(%%s, %s, %s, %%s)' % (document, tsquery), (CONFIG, CONFIG, query, HEADLINE_OPTIONS),
+                      output_field=TextField())
+    headlines = dict(target.model.objects.filter(pk__in=[row[0] for row in rows])
+                     .annotate(headline=headline).values_list('pk', 'headline'))
+    return [(pk, title, rank, mark(headlines.get(pk) or '')) for pk, title, rank in rows]
+
+
+def snippet(text, terms):
+    """Cut the text around the first term found, escaped with the terms in <mark> tags"""
+    pattern = re.compile('|'.join(re.escape(term) for term in terms), re.IGNORECASE)
+    found = pattern.search(text)
+    if found is None:
+        return ''
+    start = max(found.start() - SNIPPET_LENGTH // 2, 0)
+    text = text[start:start + SNIPPET_LENGTH]
+    return pattern.sub(lambda term: '<mark>%s</mark>' % term.group(), html.escape(text))
+
+
+def contains_search(target, queryset, query, limit):
+    terms = query.split()
+    condition = Q()
+    for term in terms:
+        condition &= Q(*[Q(**{field + '__icontains': term}) for field in target.fields], _connector=Q.OR)
+    rows = list(queryset.filter(condition).distinct().order_by('-pk')
+                .values_list('pk', target.title_field, *target.snippet_fields)[:limit])
+    results = []
+    for pk, title, *texts in rows:
+        text = ' … '.join(value for value in texts if value)
+        results.append((pk, title, None, snippet(text, terms)))
+    return results
+
+
+def search(query, model_names=None, limit=20, goal_status=None):
+    """Return the best matches of the query, at most `limit`, as dicts best first.
+
+    `model_names` restricts the search to some of TARGETS, `goal_status` the goals
+    searched to one status."""
+    results = []
+    for name, target in TARGETS.items():
+        if model_names and name not in model_names:
+            continue
+        queryset = target.queryset()
+        if name == 'goal' and goal_status:
+            queryset = queryset.filter(status=goal_status)
+        if connection.vendor == 'postgresql':
+            rows = full_text_search(target, queryset, query, limit)
+        else:
+            rows = contains_search(target, queryset, query, limit)
+        results.extend({'model': name, 'id': pk, 'title': title, 'rank': rank, 'headline': headline}
+                       for pk, title, rank, headline in rows)
+    if connection.vendor == 'postgresql':
+        results.sort(key=lambda result: -result['rank'])
+    return results[:limit]
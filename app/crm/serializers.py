@@ -1,10 +1,14 @@
 from rest_framework import serializers
 from core.models import Country, POSCompany, PosModel, POS, VirtualService, MarketingGoal, \
-     Costumer, Contract, ContractPOS, ContractService, PaperRoll, Payment, MIDRevenue
+     Costumer, Contract, ContractPOS, ContractService, PaperRoll, Payment, MIDRevenue, GoalImport, \
+     PCIWorklistItem, PaperRollForecast, MIDRevenueForecast
+from django.conf import settings
 from django.core.exceptions import ValidationError
 
+from core.fieldsets import SparseFieldsMixin
 
-class CountrySerializer(serializers.ModelSerializer):
+
+class CountrySerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """The Country serializer"""
 
     class Meta:
@@ -18,13 +22,14 @@ class CountrySerializer(serializers.ModelSerializer):
         }
 
 
-class POSCompanySerializer(serializers.ModelSerializer):
+class POSCompanySerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """The pos company serializer"""
     model_count = serializers.SerializerMethodField()
     class Meta:
         model = POSCompany
         verbose_name_plural = 'Pos Companies'
         fields = ('id', 'name', 'serial_number_length', 'created_by', 'model_count')
+        field_sources = {'model_count': []}
         extra_kwargs = {
             'id': {
                 'read_only': True
@@ -40,7 +45,7 @@ class POSCompanySerializer(serializers.ModelSerializer):
 
     
 
-class PosModelSerializer(serializers.ModelSerializer):
+class PosModelSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """The POS model serializer"""
     class Meta:
         model = PosModel
@@ -55,7 +60,7 @@ class PosModelSerializer(serializers.ModelSerializer):
         }
 
 
-class PosSerializer(serializers.ModelSerializer):
+class PosSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """The pos serializer"""
     class Meta:
         model = POS
@@ -63,7 +68,7 @@ class PosSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at', 'created_by']
 
 
-class ServiceSerializer(serializers.ModelSerializer):
+class ServiceSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """The virtual services serializer"""
     class Meta:
         model = VirtualService
@@ -71,7 +76,7 @@ class ServiceSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at', 'created_by']
 
 
-class GoalSerializer(serializers.ModelSerializer):
+class GoalSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """The Marketing goal serializer"""
     class Meta:
         model = MarketingGoal
@@ -79,22 +84,31 @@ class GoalSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at', 'created_by', 'last_update', 'updated_at']
 
 
-class GoalDetailSerializer(serializers.ModelSerializer):
+class GoalDetailSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """The Serializer for goal's Details"""
     class Meta:
         model = MarketingGoal
         fields = '__all__'
-        read_only_fields = ['id', 'created_at', 'created_by']
+        read_only_fields = ['id', 'created_at', 'created_by', 'costumer']
 
 
-class CostumerMiniSerializer(serializers.ModelSerializer):
+class GoalImportSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """To follow a lead list import and read the verdict of its rows"""
+    job_status = serializers.CharField(source='job.status', read_only=True, default=None)
+    class Meta:
+        model = GoalImport
+        fields = ['id', 'file_name', 'created_at', 'job', 'job_status', 'summary', 'verdicts']
+        read_only_fields = fields
+
+
+class CostumerMiniSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """The serializer for Costumer Suggestions"""
     class Meta:
         model = Costumer
         fields = ['id', 'legal_name', 'trading_name']
         read_only_fields = ['id']
     
-class CostumerSerializer(serializers.ModelSerializer):
+class CostumerSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """The serializer for managing Costumers"""
     class Meta:
         model = Costumer
@@ -102,24 +116,41 @@ class CostumerSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_by', 'created_at']
 
 
-class ContractSerializer(serializers.ModelSerializer):
+class ContractSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """The Serializer for creating Contracts"""
+    costumer = serializers.PrimaryKeyRelatedField(queryset=Costumer.objects.visible())
+
     class Meta:
         model = Contract
         fields = '__all__'
-        read_only_fields = ['id', 'created_by', 'created_at']
+        read_only_fields = ['id', 'created_by', 'created_at', 'renewed_from']
 
 
-class ContractDetailSerializer(serializers.ModelSerializer):
+class ContractRenewalSerializer(serializers.Serializer):
+    """The contracts to renew and, optionally, the dates of all their renewals"""
+    contracts = serializers.ListField(child=serializers.IntegerField(), allow_empty=False,
+                                      max_length=settings.CONTRACT_RENEWAL_MAX)
+    start_date = serializers.DateField(required=False)
+    end_date = serializers.DateField(required=False)
+
+    def validate(self, attrs):
+        if ('start_date' in attrs) != ('end_date' in attrs):
+            raise serializers.ValidationError('Give both the start and end dates, or neither.')
+        if 'start_date' in attrs and attrs['end_date'] < attrs['start_date']:
+            raise serializers.ValidationError('The end date is before the start date.')
+        return attrs
+
+
+class ContractDetailSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """The Serializer for managing Contracts and showin costumers"""
     costumer = CostumerSerializer(read_only=True)
     class Meta:
         model = Contract
         fields = '__all__'
-        read_only_fields = ['id', 'created_by', 'created_at']
+        read_only_fields = ['id', 'created_by', 'created_at', 'renewed_from']
 
 
-class ContractListSerializer(serializers.ModelSerializer):
+class ContractListSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """The serializer for listing contracts"""
     legal_name = serializers.SerializerMethodField()
     trading_name = serializers.SerializerMethodField()
@@ -127,6 +158,8 @@ class ContractListSerializer(serializers.ModelSerializer):
     class Meta:
         model = Contract
         fields = ['id', 'm_id', 'start_date', 'start_date', 'end_date', 'legal_name', 'trading_name', 'business_type']
+        field_sources = {'legal_name': ['costumer__legal_name'], 'trading_name': ['costumer__trading_name'],
+                         'business_type': ['costumer__business_type']}
 
     def get_legal_name(self, obj):
         return obj.costumer.legal_name
@@ -139,7 +172,7 @@ class ContractListSerializer(serializers.ModelSerializer):
        
 
 
-class ContractPosSerializer(serializers.ModelSerializer):
+class ContractPosSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """To Provide poses of a contract"""
     type = serializers.SerializerMethodField()
     company = serializers.SerializerMethodField()
@@ -148,6 +181,7 @@ class ContractPosSerializer(serializers.ModelSerializer):
     class Meta:
         model = ContractPOS
         fields = ['pos', 'id', 'price', 'hardware_cost', 'software_cost', 'type', 'company', 'pos_model', 'serial_number']
+        field_sources = {'type': ['pos'], 'company': ['pos'], 'pos_model': ['pos'], 'serial_number': ['pos']}
         read_only_fields = ['id']
 
     def get_type(self, obj):
@@ -162,27 +196,28 @@ class ContractPosSerializer(serializers.ModelSerializer):
     def get_serial_number(self, obj):
         return str(obj.pos)
 
-class ContractServiceSerializer(serializers.ModelSerializer):
+class ContractServiceSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """To Provide services of a contract"""
     name = serializers.SerializerMethodField()
     class Meta:
         model = ContractService
         fields = ['service', 'id', 'price', 'cost', 'name']
+        field_sources = {'name': ['service']}
         read_only_fields = ['id']
 
     def get_name(self, obj):
         return str(obj.service)
 
 
-class CostumerPaperrollSerializer(serializers.ModelSerializer):
+class CostumerPaperrollSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """To Manage paper rolls of a costumer"""
     class Meta:
         model = PaperRoll
-        fields = ['amount', 'cost', 'price', 'direct_debit_cost', 'ordered_date', 'id']
-        read_only_fields = ['id']
+        fields = ['amount', 'cost', 'price', 'direct_debit_cost', 'ordered_date', 'id', 'is_draft']
+        read_only_fields = ['id', 'is_draft']
 
 
-class PaymentSerializer(serializers.ModelSerializer):
+class PaymentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """To manage Payments"""
     class Meta:
         model = Payment
@@ -190,9 +225,54 @@ class PaymentSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
-class MIDRevenueSerializer(serializers.ModelSerializer):
+class MIDRevenueSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """To manage mid revenues"""
     class Meta:
         model = MIDRevenue
         fields = ['id', 'income', 'profit', 'date']
         read_only_fields = ['id']
+
+
+class MIDRevenueForecastSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """The projected MID revenue of a contract for a month"""
+    class Meta:
+        model = MIDRevenueForecast
+        fields = ['month', 'income', 'profit', 'method', 'computed_at']
+        read_only_fields = fields
+
+
+def sync_serializer(model):
+    """Return a serializer of every field of a synced model, as the sync feed sends it"""
+    meta = type('Meta', (), {'model': model, 'fields': '__all__'})
+    return type('%sSyncSerializer' % model.__name__, (serializers.ModelSerializer,), {'Meta': meta})
+
+
+class PCIWorklistSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """A contract on the PCI-DSS worklist with its costumer and how many days are left"""
+    costumer = serializers.IntegerField(source='contract.costumer_id', read_only=True)
+    trading_name = serializers.CharField(source='contract.costumer.trading_name', read_only=True)
+    acquire_name = serializers.CharField(source='contract.acquire_name', read_only=True)
+    m_id = serializers.CharField(source='contract.m_id', read_only=True)
+    days_left = serializers.SerializerMethodField()
+
+    class Meta:
+        model = PCIWorklistItem
+        fields = ['contract', 'costumer', 'trading_name', 'acquire_name', 'm_id', 'pci_due_date', 'days_left',
+                  'added_at']
+        read_only_fields = fields
+        field_sources = {'days_left': ['pci_due_date']}
+
+    def get_days_left(self, obj):
+        """Negative once overdue"""
+        return (obj.pci_due_date - self.context['today']).days
+
+
+class PaperRollForecastSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """The projected next paper roll order of a costumer"""
+    trading_name = serializers.CharField(source='costumer.trading_name', read_only=True)
+
+    class Meta:
+        model = PaperRollForecast
+        fields = ['costumer', 'trading_name', 'orders', 'daily_rate', 'last_ordered_date', 'next_order_date',
+                  'amount', 'computed_at']
+        read_only_fields = fields
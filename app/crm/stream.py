@@ -0,0 +1,258 @@
+"""Server-sent events stream of the marketing goal changes, served by app/asgi.py.
+
+Django 3.1 can not stream from async views, so the stream is a plain ASGI app
+mounted beside Django. Each process keeps one listener for all its clients: on
+PostgreSQL it LISTENs on the goal change channel with a connection of its own,
+elsewhere it polls. On every wake up the new goal changes are read once from the
+Change log, up to the transactions that have all ended (see core.sync), and handed
+to every connected client. A change committed behind an older transaction still
+running is notified before it can be read, so while there are such changes the
+listener polls until they are. The change cursor is the event id, so a client
+reconnecting with Last-Event-ID gets the events it missed from the log."""
+import asyncio
+import logging
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, connections
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+
+from core import models, sync
+from crm.serializers import GoalSerializer
+
+
+logger = logging.getLogger(__name__)
+
+PATH = '/api/crm/goals/stream/'
+ACTIONS = {'C': 'created', 'U': 'updated', 'D': 'deleted'}
+
+
+def format_event(cursor, name, data):
+    return b'id: %s\nevent: %s\ndata: %s\n\n' % (
+        sync.format_cursor(cursor).encode(), name.encode(), JSONRenderer().render(data))
+
+
+def fetch_events(since, limit):
+    """Return the (cursor, event) of the goal changes after a cursor, oldest first"""
+    close_old_connections()
+    changes = list(sync.changes_after(since, using=DEFAULT_DB_ALIAS).filter(model='marketinggoal')[:limit])
+    goals = models.MarketingGoal.objects.using(DEFAULT_DB_ALIAS).in_bulk(
+        {change.object_id for change in changes if change.action != 'D'})
+    events = []
+    for change in changes:
+        goal = goals.get(change.object_id)
+        data = {'action': ACTIONS[change.action] if goal is not None else 'deleted', 'id': change.object_id}
+        if goal is not None:
+            data['goal'] = GoalSerializer(goal).data
+        cursor = change.txid, change.seq
+        events.append((cursor, format_event(cursor, 'goal', data)))
+    return events
+
+
+def held_back(since):
+    """Whether goal changes after the cursor are committed but not readable yet"""
+    close_old_connections()
+    return models.Change.objects.using(DEFAULT_DB_ALIAS).filter(sync.after(since), model='marketinggoal').exists()
+
+
+def latest_cursor():
+    close_old_connections()
+    return sync.visible_changes(DEFAULT_DB_ALIAS).values_list('txid', 'seq').last() or (0, 0)
+
+
+def is_pruned(cursor):
+    close_old_connections()
+    return sync.is_pruned(cursor, using=DEFAULT_DB_ALIAS)
+
+
+def authenticate(key):
+    """Return the active user owning the token, or None"""
+    close_old_connections()
+    token = Token.objects.select_related('user').filter(key=key).first()
+    if token is None or not token.user.is_active:
+        return None
+    return token.user
+
+
+def connect_listener():
+    """Open a connection of its own listening for the goal changes"""
+    connection = connections[DEFAULT_DB_ALIAS]
+    listener = connection.get_new_connection(connection.get_connection_params())
+    listener.autocommit = True
+    with listener.cursor() as cursor:
+        cursor.execute('LISTEN %s' % sync.channel(models.MarketingGoal))
+    return listener
+
+
+class Broadcaster:
+    """Reads the goal changes once per wake up and queues them for every subscriber"""
+
+    def __init__(self):
+        self.subscribers = set()
+        self.task = None
+        self.last_cursor = (0, 0)
+        self.started = None
+        self.wakeup = None
+        self.listener = None
+
+    async def subscribe(self):
+        """Return a queue receiving the events after `last_cursor`, starting the listener if needed"""
+        queue = asyncio.Queue()
+        self.subscribers.add(queue)
+        if self.task is None:
+            self.started = asyncio.Event()
+            self.wakeup = asyncio.Event()
+            self.task = asyncio.ensure_future(self.run())
+        task = self.task
+        await self.started.wait()
+        if task.done():
+            # the change log could not be read
+            self.unsubscribe(queue)
+            task.result()
+        return queue
+
+    def unsubscribe(self, queue):
+        self.subscribers.discard(queue)
+        if not self.subscribers and self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+    async def run(self):
+        try:
+            self.last_cursor = await sync_to_async(latest_cursor)()
+            self.started.set()
+            while True:
+                if self.listener is None and connections[DEFAULT_DB_ALIAS].vendor == 'postgresql':
+                    await self.listen()
+                self.wakeup.clear()
+                timeout = settings.GOAL_STREAM_POLL_INTERVAL
+                try:
+                    await self.publish()
+                    if self.listener is not None and not await sync_to_async(held_back)(self.last_cursor):
+                        timeout = settings.GOAL_STREAM_HEARTBEAT
+                except Exception:
+                    logger.exception('Could not read the goal changes')
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self.started.set()
+            self.close_listener()
+
+    async def listen(self):
+        try:
+            self.listener = await sync_to_async(connect_listener)()
+        except Exception:
+            logger.exception('Could not listen for the goal changes, polling instead')
+            return
+        asyncio.get_event_loop().add_reader(self.listener.fileno(), self.notified)
+
+    def notified(self):
+        try:
+            self.listener.poll()
+        except Exception:
+            logger.exception('The goal change listener connection failed')
+            self.close_listener()
+        else:
+            self.listener.notifies.clear()
+        self.wakeup.set()
+
+    def close_listener(self):
+        if self.listener is not None:
+            asyncio.get_event_loop().remove_reader(self.listener.fileno())
+            self.listener.close()
+            self.listener = None
+
+    async def publish(self):
+        limit = settings.GOAL_STREAM_BACKLOG
+        events = await sync_to_async(fetch_events)(self.last_cursor, limit)
+        if not events:
+            return
+        self.last_cursor = events[-1][0]
+        for queue in self.subscribers:
+            queue.put_nowait(events)
+        if len(events) == limit:
+            self.wakeup.set()
+
+
+broadcaster = Broadcaster()
+
+
+async def respond(send, status, body):
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(b'content-type', b'application/json')]})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def wait_for_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+def parse_last_event_id(value):
+    try:
+        return sync.parse_cursor(value) if value else None
+    except ValueError:
+        return None
+
+
+async def goal_stream(scope, receive, send):
+    """ASGI app streaming the goal events to a client authenticated by its token.
+
+    EventSource can not send headers, so the token may be given as `?token=`, as may
+    the last event id as `?last_event_id=` for clients resuming by hand."""
+    if scope['method'] != 'GET':
+        return await respond(send, 405, b'{"detail": "Method not allowed."}')
+    headers = dict(scope['headers'])
+    query = parse_qs(scope['query_string'].decode())
+    key = query.get('token', [None])[0]
+    authorization = headers.get(b'authorization', b'').decode()
+    if authorization.startswith('Token '):
+        key = authorization[len('Token '):]
+    if not key or await sync_to_async(authenticate)(key) is None:
+        return await respond(send, 401, b'{"detail": "Invalid token."}')
+    last_event_id = parse_last_event_id(
+        headers.get(b'last-event-id', b'').decode() or query.get('last_event_id', [None])[0])
+
+    queue = await broadcaster.subscribe()
+    sent = broadcaster.last_cursor
+    disconnect = asyncio.ensure_future(wait_for_disconnect(receive))
+    try:
+        await send({'type': 'http.response.start', 'status': 200, 'headers': [
+            (b'content-type', b'text/event-stream'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+        ]})
+        await send({'type': 'http.response.body', 'body': b'retry: 3000\n\n', 'more_body': True})
+        if last_event_id is not None:
+            limit = settings.GOAL_STREAM_BACKLOG
+            pruned = await sync_to_async(is_pruned)(last_event_id)
+            backlog = [] if pruned else await sync_to_async(fetch_events)(last_event_id, limit)
+            if pruned or len(backlog) == limit:
+                # too far behind, the client reloads the goals and follows from here
+                await send({'type': 'http.response.body', 'more_body': True,
+                            'body': format_event(sent, 'reset', {})})
+            else:
+                for cursor, event in backlog:
+                    await send({'type': 'http.response.body', 'body': event, 'more_body': True})
+                sent = max([sent, last_event_id] + [cursor for cursor, _ in backlog])
+
+        while not disconnect.done():
+            get = asyncio.ensure_future(queue.get())
+            done, _ = await asyncio.wait({get, disconnect}, timeout=settings.GOAL_STREAM_HEARTBEAT,
+                                         return_when=asyncio.FIRST_COMPLETED)
+            if get not in done:
+                get.cancel()
+                if not disconnect.done():
+                    await send({'type': 'http.response.body', 'body': b': ping\n\n', 'more_body': True})
+                continue
+            for cursor, event in get.result():
+                if cursor > sent:
+                    await send({'type': 'http.response.body', 'body': event, 'more_body': True})
+                    sent = cursor
+    finally:
+        disconnect.cancel()
+        broadcaster.unsubscribe(queue)
@@ -0,0 +1,27 @@
+from core import jobs
+from core.models import GoalImport
+from crm import forecasting, leads, pci
+
+
+@jobs.task(name='crm.import_goals', queue='imports', max_attempts=1)
+def import_goals(job, goal_import_id):
+    """Import an uploaded lead list, not retried as the batches already imported are committed"""
+    return leads.run_import(GoalImport.objects.get(pk=goal_import_id), job)
+
+
+@jobs.task(name='crm.scan_pci_due_dates')
+def scan_pci_due_dates(job):
+    """Bring the PCI-DSS worklist up to date, to be scheduled daily"""
+    return pci.scan()
+
+
+@jobs.task(name='crm.forecast_paper_rolls')
+def forecast_paper_rolls(job, create_drafts=None):
+    """Recompute the paper roll forecasts of every costumer, to be scheduled daily"""
+    return forecasting.forecast_paper_rolls(create_drafts)
+
+
+@jobs.task(name='crm.forecast_mid_revenues')
+def forecast_mid_revenues(job, full=False):
+    """Recompute the MID revenue forecasts of the contracts changed since the last run, to be scheduled daily"""
+    return forecasting.forecast_mid_revenues(full, job)
@@ -0,0 +1,91 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Contract, Country, MarketingGoal
+from crm.tests.test_costumers_contracts import create_costumer, create_contract
+
+
+COUNTRY_URL = reverse('crm:country-list')
+
+
+class ConditionalGetTest(TestCase):
+    """Test the ETag and Last-Modified support of detail and reference endpoints"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = get_user_model().objects.create_user(username='testuser',
+                                                          email='test@admin.com',
+                                                          password='testpassword')
+        self.client.force_authenticate(self.admin)
+
+    def test_goal_not_modified(self):
+        """Test that a current copy of a goal is answered with 304 from one query"""
+        goal = MarketingGoal.objects.create(trading_name='Goal', business_field='Test', created_by=self.admin)
+        url = reverse('crm:marketinggoal-detail', args=[goal.id])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('Last-Modified', response)
+        etag = response['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+
+        self.client.patch(url, {'status': 'A'})
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_contract_follows_costumer(self):
+        """Test that the contract detail changes with its version and its costumer"""
+        costumer = create_costumer('Test', self.admin)
+        contract = create_contract(costumer, self.admin, '2020-12-12')
+        url = reverse('crm:contract-detail', args=[contract.id])
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code,
+                         status.HTTP_304_NOT_MODIFIED)
+        costumer.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+        contract.save()
+        self.assertEqual(contract.version, 2)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+
+    def test_versions_bumped_by_the_database(self):
+        """Test that saves of stale copies and queryset updates all get a new version"""
+        contract = create_contract(create_costumer('Test', self.admin), self.admin, '2020-12-12')
+        stale = Contract.objects.get(pk=contract.pk)
+        contract.save()
+        stale.save(update_fields=['t_id'])
+        self.assertEqual((contract.version, stale.version), (2, 3))
+        Contract.objects.filter(pk=contract.pk).update(t_id='T1')
+        contract.refresh_from_db()
+        self.assertEqual(contract.version, 4)
+
+    def test_costumer_detail(self):
+        """Test retrieving a costumer with its ETag"""
+        costumer = create_costumer('Test', self.admin)
+        url = reverse('crm:costumer-detail', args=[costumer.id])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['trading_name'], 'Test')
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(self.client.get(reverse('crm:costumer-detail', args=[0])).status_code,
+                         status.HTTP_404_NOT_FOUND)
+
+    def test_reference_list(self):
+        """Test that reference lists change their ETag when a row is added or edited"""
+        country = Country.objects.create(name='Test', abreviation='TST', created_by=self.admin)
+        etag = self.client.get(COUNTRY_URL)['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(COUNTRY_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        country.is_covered = False
+        country.save()
+        response = self.client.get(COUNTRY_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
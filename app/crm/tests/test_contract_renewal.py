@@ -0,0 +1,108 @@
+from datetime import date, timedelta
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Change, Contract, ContractPOS, ContractService
+from core.testing import QueryBudgetMixin
+from crm.tests.test_costumers_contracts import create_contract, create_costumer, create_pos, create_service
+
+
+EXPIRING_URL = reverse('crm:contract-expiring')
+RENEW_URL = reverse('crm:contract-renew')
+
+
+class TestContractRenewal(QueryBudgetMixin, TestCase):
+    """The expiring contracts and their bulk renewal"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = get_user_model().objects.create_user(username='testuser', email='test@admin.com',
+                                                          password='testpassword')
+        self.client.force_authenticate(self.admin)
+        self.costumer = create_costumer('Test', self.admin)
+
+    def create_contract(self, start_date, end_date):
+        contract = create_contract(self.costumer, self.admin, start_date)
+        contract.end_date = end_date
+        contract.save()
+        return contract
+
+    def test_expiring_contracts(self):
+        """The contracts ending within the days and not renewed yet are listed, soonest first"""
+        today = timezone.localdate()
+        later = self.create_contract(today, today + timedelta(days=20))
+        soon = self.create_contract(today, today + timedelta(days=5))
+        ended = self.create_contract(today - timedelta(days=400), today - timedelta(days=2))
+        self.create_contract(today, today + timedelta(days=200))
+
+        response = self.client.get(EXPIRING_URL, {'days': 30})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([contract['id'] for contract in response.data], [soon.id, later.id])
+        self.assertWithinQueryBudget(response)
+
+        response = self.client.get(EXPIRING_URL, {'days': 30, 'expired': 'true', 'acquire_name': 'EP'})
+        self.assertEqual([contract['id'] for contract in response.data], [ended.id, soon.id, later.id])
+
+        # the renewal, ending 6 days later, takes the place of the renewed contract
+        renewal = self.client.post(RENEW_URL, {'contracts': [soon.id]}, format='json').data[0]['renewal']
+        response = self.client.get(EXPIRING_URL, {'days': 30})
+        self.assertEqual([contract['id'] for contract in response.data], [renewal, later.id])
+
+    def test_renewing_contracts(self):
+        """Renewals copy the contracts with their lines, for the same length from the day after they end"""
+        first = self.create_contract(date(2025, 1, 1), date(2025, 12, 31))
+        second = self.create_contract(date(2025, 6, 1), date(2025, 6, 30))
+        ContractPOS.objects.create(contract=first, pos=create_pos('Model', self.admin), price=50,
+                                   hardware_cost=10, software_cost=5, created_by=self.admin)
+        ContractService.objects.create(contract=first, service=create_service('Service', self.admin), price=12,
+                                       cost=10, created_by=self.admin)
+        other_user = get_user_model().objects.create_user(username='other', email='other@admin.com',
+                                                          password='testpassword')
+        self.client.force_authenticate(other_user)
+        last_seq = Change.objects.latest('seq').seq
+
+        response = self.client.post(RENEW_URL, {'contracts': [first.id, second.id]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        renewals = {item['contract']: Contract.objects.get(id=item['renewal']) for item in response.data}
+
+        renewal = renewals[first.id]
+        self.assertEqual((renewal.start_date, renewal.end_date), (date(2026, 1, 1), date(2026, 12, 31)))
+        self.assertEqual((renewal.renewed_from, renewal.costumer, renewal.m_id), (first, self.costumer, '12345'))
+        self.assertEqual((renewal.created_by, renewal.version), (other_user, 1))
+        self.assertEqual(renewal.contract_pos.get().price, 50)
+        self.assertEqual(renewal.contract_service.get().cost, 10)
+        self.assertEqual(renewal.contract_pos.get().created_by, other_user)
+        self.assertEqual((renewals[second.id].start_date, renewals[second.id].end_date),
+                         (date(2025, 7, 1), date(2025, 7, 30)))
+        self.assertFalse(renewals[second.id].contract_pos.exists())
+        self.assertEqual(first.contract_pos.count(), 1)
+
+        changes = set(Change.objects.filter(seq__gt=last_seq).values_list('model', 'action'))
+        self.assertEqual(changes, {('contract', 'C'), ('contractpos', 'C'), ('contractservice', 'C')})
+
+        response = self.client.post(RENEW_URL, {'contracts': [first.id]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_renewing_with_dates(self):
+        """The dates of all the renewals can be given"""
+        contract = self.create_contract(date(2025, 1, 1), date(2025, 12, 31))
+        payload = {'contracts': [contract.id], 'start_date': '2026-02-01', 'end_date': '2027-01-31'}
+        response = self.client.post(RENEW_URL, payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        renewal = Contract.objects.get(id=response.data[0]['renewal'])
+        self.assertEqual((renewal.start_date, renewal.end_date), (date(2026, 2, 1), date(2027, 1, 31)))
+
+    def test_invalid_renewals(self):
+        """Unknown contracts and half given or reversed dates are refused"""
+        contract = self.create_contract(date(2025, 1, 1), date(2025, 12, 31))
+        for payload in ({'contracts': []}, {'contracts': [contract.id, 999]},
+                        {'contracts': [contract.id], 'start_date': '2026-01-01'},
+                        {'contracts': [contract.id], 'start_date': '2026-01-01', 'end_date': '2025-01-01'}):
+            response = self.client.post(RENEW_URL, payload, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Contract.objects.count(), 1)
@@ -3,6 +3,7 @@ from django.test import TestCase
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APIClient
+from core.testing import QueryBudgetMixin
 from core.models import Costumer, Contract, POSCompany, PosModel, POS, VirtualService, ContractService, ContractPOS, PaperRoll, Payment, MIDRevenue
 from crm.serializers import CostumerMiniSerializer, ContractListSerializer, ContractDetailSerializer, ContractPosSerializer, ContractServiceSerializer, CostumerPaperrollSerializer
 
@@ -108,7 +109,7 @@ def create_contract(costumer, admin, date):
     return contract
 
 
-class CostumerTest(TestCase):
+class CostumerTest(QueryBudgetMixin, TestCase):
     """Test for the costumers and contracts and dependencies"""
 
     def setUp(self):
@@ -194,6 +195,36 @@ class CostumerTest(TestCase):
         response = self.client.get(CONTRACT_URL)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data, serializer.data)
+        self.assertWithinQueryBudget(response)
+
+    def test_filtering_contracts(self):
+        """Test filtering the contract list by dates, acquirer, costumer and missing ids"""
+        self.login()
+        costumer = create_costumer('Test', self.admin)
+        contract1 = create_contract(costumer, self.admin, '2020-10-10')
+        contract2 = create_contract(costumer, self.admin, '2020-11-11')
+        contract3 = create_contract(costumer, self.admin, '2020-12-12')
+        Contract.objects.filter(id=contract2.id).update(acquire_name='FD', m_id='')
+        Contract.objects.filter(id=contract3.id).update(m_id=None, t_id='T1')
+
+        def listed(**params):
+            response = self.client.get(CONTRACT_URL, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            return sorted(contract['id'] for contract in response.data)
+
+        self.assertEqual(listed(start_date__gte='2020-11-01'), [contract2.id, contract3.id])
+        self.assertEqual(listed(start_date__gte='2020-11-01', end_date__lte='2020-11-30'), [contract2.id])
+        self.assertEqual(listed(acquire_name='FD'), [contract2.id])
+        self.assertEqual(listed(acquire_name='EP,FD', has_m_id='false'), [contract2.id, contract3.id])
+        self.assertEqual(listed(has_m_id='true'), [contract1.id])
+        self.assertEqual(listed(has_t_id='true'), [contract3.id])
+        self.assertEqual(listed(business_type='ET', created_by=self.admin.id), [contract1.id, contract2.id, contract3.id])
+        self.assertEqual(listed(business_type='Acc'), [])
+
+        for params in ({'start_date__gte': '10/10/2020'}, {'acquire_name': 'XX'}, {'has_m_id': 'maybe'},
+                       {'created_by': 'me'}):
+            response = self.client.get(CONTRACT_URL, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
     def test_adding_and_retrieving_dependencies_of_contract(self):
         """Test to add services and poses to contracts, and add payrolls, payments and mid revenous to costumers,
@@ -251,6 +282,11 @@ class CostumerTest(TestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         serializer = ContractDetailSerializer(contract)
         self.assertEqual(response.data, serializer.data)
+        self.assertWithinQueryBudget(response)
+
+        response = self.client.get(contract_pos_url(contract.id))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertWithinQueryBudget(response)
 
         response = self.client.get(costumer_paperroll_url(contract.id))
         self.assertEqual(response.status_code, status.HTTP_200_OK)
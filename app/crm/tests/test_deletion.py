@@ -0,0 +1,79 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import jobs
+from core.models import Change, Contract, ContractPOS, Costumer, Job, MIDRevenue, PaperRoll, Payment, POS, \
+     TradingAddress
+from crm.tests.test_costumers_contracts import create_costumer, create_contract, create_pos
+
+
+def costumer_detail_url(costumer_id):
+    return reverse('crm:costumer-detail', args=[costumer_id])
+
+
+def contract_detail_url(contract_id):
+    return reverse('crm:contract-detail', args=[contract_id])
+
+
+@override_settings(DELETION_BATCH_SIZE=2)
+class AsyncDeletionTest(TestCase):
+    """Test the background deletion of costumers and contracts"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = get_user_model().objects.create_user(username='testuser',
+                                                          email='test@admin.com',
+                                                          password='testpassword')
+        self.client.force_authenticate(self.admin)
+        self.costumer = create_costumer('Test', self.admin)
+        self.contract = create_contract(self.costumer, self.admin, '2020-12-12')
+        TradingAddress.objects.create(address='Test', costumer=self.costumer)
+        PaperRoll.objects.create(costumer=self.costumer, cost=1, price=2, direct_debit_cost=1,
+                                 ordered_date='2020-12-12T12:30:00Z')
+        for _ in range(5):
+            Payment.objects.create(contract=self.contract, date='2020-12-12T12:30:00Z', direct_debit_cost=12)
+        MIDRevenue.objects.create(contract=self.contract, income=12, profit=5, date='2020-12-12T12:30:00Z')
+        self.pos = create_pos('Test', self.admin)
+        ContractPOS.objects.create(contract=self.contract, pos=self.pos, price=1, hardware_cost=1, software_cost=1)
+
+    def run_jobs(self):
+        while True:
+            job = jobs.claim(['default'], 'test-worker')
+            if job is None:
+                return
+            jobs.run(job)
+
+    def test_costumer_hidden_then_deleted(self):
+        """Test that a deleted costumer disappears at once and its graph is deleted by the job"""
+        response = self.client.delete(costumer_detail_url(self.costumer.id))
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(self.client.get(costumer_detail_url(self.costumer.id)).status_code,
+                         status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get(contract_detail_url(self.contract.id)).status_code,
+                         status.HTTP_404_NOT_FOUND)
+        self.assertTrue(Costumer.objects.filter(pk=self.costumer.id).exists())
+
+        self.run_jobs()
+        job = Job.objects.get(pk=response.data['job'])
+        self.assertEqual(job.status, 'S')
+        self.assertEqual(job.result, {'rows': 11})
+        self.assertFalse(Costumer.objects.exists())
+        self.assertFalse(Contract.objects.exists())
+        self.assertFalse(Payment.objects.exists())
+        self.assertFalse(TradingAddress.objects.exists())
+        self.assertTrue(POS.objects.filter(pk=self.pos.id).exists())
+        self.assertTrue(Change.objects.filter(model='payment', action='D').exists())
+
+    def test_contract_deleted(self):
+        """Test that deleting a contract leaves its costumer"""
+        response = self.client.delete(contract_detail_url(self.contract.id))
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(self.client.get(reverse('crm:contract-payment', args=[self.contract.id])).status_code,
+                         status.HTTP_404_NOT_FOUND)
+        self.run_jobs()
+        self.assertFalse(Contract.objects.exists())
+        self.assertFalse(MIDRevenue.objects.exists())
+        self.assertTrue(Costumer.objects.filter(pk=self.costumer.id).exists())
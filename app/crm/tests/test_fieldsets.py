@@ -0,0 +1,68 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from crm.tests.test_costumers_contracts import create_costumer, create_contract
+
+
+CONTRACT_URL = reverse('crm:contract-list')
+
+
+def costumer_detail_url(costumer_id):
+    return reverse('crm:costumer-detail', args=[costumer_id])
+
+
+class SparseFieldsetTest(TestCase):
+    """Test the fields and exclude parameters of the read endpoints"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = get_user_model().objects.create_user(username='testuser',
+                                                          email='test@admin.com',
+                                                          password='testpassword')
+        self.client.force_authenticate(self.admin)
+        self.costumer = create_costumer('Test', self.admin)
+        self.contract = create_contract(self.costumer, self.admin, '2020-12-12')
+
+    def test_fields(self):
+        """Test that only the requested fields are sent and their columns loaded"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(costumer_detail_url(self.costumer.id), {'fields': 'id,legal_name'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'id': self.costumer.id, 'legal_name': 'Test'})
+        sql = queries.captured_queries[-1]['sql']
+        self.assertIn('legal_name', sql)
+        self.assertNotIn('director_email', sql)
+
+    def test_exclude(self):
+        """Test that excluded fields are left out"""
+        response = self.client.get(costumer_detail_url(self.costumer.id), {'exclude': 'sort_code,account_number'})
+        self.assertNotIn('sort_code', response.data)
+        self.assertNotIn('account_number', response.data)
+        self.assertEqual(response.data['legal_name'], 'Test')
+
+    def test_method_fields(self):
+        """Test that method fields still get the related columns they read, and only those"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(CONTRACT_URL, {'fields': 'id,legal_name'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, [{'id': self.contract.id, 'legal_name': 'Test'}])
+        sql = queries.captured_queries[-1]['sql']
+        self.assertIn('legal_name', sql)
+        self.assertNotIn('director_email', sql)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(CONTRACT_URL, {'fields': 'id,m_id'})
+        self.assertNotIn('legal_name', queries.captured_queries[-1]['sql'])
+
+    def test_writes_not_trimmed(self):
+        """Test that the parameters do not change what a write validates and saves"""
+        response = self.client.patch(costumer_detail_url(self.costumer.id) + '?fields=id',
+                                     {'trading_name': 'Renamed'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['trading_name'], 'Renamed')
+        self.costumer.refresh_from_db()
+        self.assertEqual(self.costumer.legal_name, 'Test')
@@ -0,0 +1,98 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Costumer, MarketingGoal, TradingAddress
+from crm.tests.test_costumers_contracts import create_costumer
+
+
+def convert_url(id):
+    return reverse('crm:marketinggoal-convert', args=[id])
+
+
+# The costumer details a marketing goal does not hold
+DETAILS = {
+    'business_type': 'ET',
+    'legal_entity': 'ST',
+    'company_number': '0123',
+    'director_email': 'director@test.com',
+    'director_address': 'Director Street',
+    'director_postal_code': 'AB1 2CD',
+    'sort_code': '0123',
+    'issuing_bank': 'Test',
+    'account_number': '0123',
+}
+
+
+class TestGoalConversion(TestCase):
+    """Converting accepted marketing goals into costumers"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = get_user_model().objects.create_user(username='testuser', email='test@admin.com',
+                                                          password='testpassword')
+        self.client.force_authenticate(self.admin)
+        self.goal = MarketingGoal.objects.create(
+            trading_name='Corner Cafe', legal_name='Corner Cafe Ltd', business_field='Food', status='A',
+            land_line='0123', trading_address='1 High Street', postal_code='0123', decision_maker='Jane',
+            mobile='0456', email='cafe@test.com', created_by=self.admin)
+
+    def test_converting_goal(self):
+        """The costumer and its trading address are created from the goal and linked to it"""
+        response = self.client.post(convert_url(self.goal.id), DETAILS)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        costumer = Costumer.objects.get(id=response.data['id'])
+        self.assertEqual(costumer.trading_name, 'Corner Cafe')
+        self.assertEqual(costumer.director_name, 'Jane')
+        self.assertEqual(costumer.business_email, 'cafe@test.com')
+        self.assertEqual(costumer.created_by, self.admin)
+        self.assertTrue(TradingAddress.objects.filter(costumer=costumer, address='1 High Street').exists())
+        self.goal.refresh_from_db()
+        self.assertEqual(self.goal.costumer, costumer)
+
+    def test_goal_not_accepted(self):
+        """Only accepted goals are converted"""
+        MarketingGoal.objects.filter(id=self.goal.id).update(status='P')
+        response = self.client.post(convert_url(self.goal.id), DETAILS)
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertFalse(Costumer.objects.exists())
+
+    def test_invalid_details(self):
+        """Missing costumer details are reported and nothing is created"""
+        response = self.client.post(convert_url(self.goal.id), {'business_type': 'ET'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('sort_code', response.data)
+        self.assertFalse(Costumer.objects.exists())
+        self.goal.refresh_from_db()
+        self.assertIsNone(self.goal.costumer)
+
+    def test_matching_costumer(self):
+        """An existing costumer with the same name and postcode is reported, unless forced or linked"""
+        existing = create_costumer('Corner Cafe', self.admin)
+        response = self.client.post(convert_url(self.goal.id), DETAILS)
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data['matches'], [existing.id])
+        self.assertEqual(Costumer.objects.count(), 1)
+
+        response = self.client.post(convert_url(self.goal.id), {'costumer': existing.id})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.goal.refresh_from_db()
+        self.assertEqual(self.goal.costumer, existing)
+        self.assertEqual(Costumer.objects.count(), 1)
+
+    def test_forcing_conversion(self):
+        """A forced conversion creates the costumer even though a matching one exists"""
+        create_costumer('Corner Cafe', self.admin)
+        response = self.client.post(convert_url(self.goal.id), dict(DETAILS, force='true'))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Costumer.objects.count(), 2)
+
+    def test_converting_twice(self):
+        """A converted goal is not converted again"""
+        self.client.post(convert_url(self.goal.id), DETAILS)
+        response = self.client.post(convert_url(self.goal.id), DETAILS)
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data['costumer'], Costumer.objects.get().id)
+        self.assertEqual(Costumer.objects.count(), 1)
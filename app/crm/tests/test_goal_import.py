@@ -0,0 +1,104 @@
+import io
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import jobs
+from core.models import Change, MarketingGoal
+from core.normalize import dedupe_key, normalize_name, normalize_phone, normalize_postcode
+from crm.tests.test_costumers_contracts import create_costumer
+
+
+IMPORT_URL = reverse('crm:marketinggoal-import-goals')
+
+LEADS = (
+    'Business Name,Industry,Phone,Postcode,Email\n'
+    'Corner Cafe Ltd,Food,+44 20 7946 0000,sw1a 1aa,cafe@example.com\n'
+    'Existing Goal,Retail,,E1 6AN,\n'
+    'Test,Education,,0123,\n'
+    'CORNER CAFE,Food,020 7946 0000,SW1A1AA,\n'
+    ',Food,,N1 9GU,\n'
+)
+
+
+class NormalizeTest(TestCase):
+    """Test the normalization of the business details"""
+
+    def test_normalize(self):
+        self.assertEqual(normalize_postcode(' sw1a 1aa'), 'SW1A1AA')
+        self.assertEqual(normalize_phone('+44 (0)20 7946 0000'), '02079460000')
+        self.assertEqual(normalize_name('The Corner Cafe & Co. Ltd'), 'corner cafe and')
+        self.assertEqual(dedupe_key('sw1a 1aa', 'Corner Cafe Ltd'), dedupe_key('SW1A1AA', 'corner cafe'))
+
+
+class GoalImportTest(TestCase):
+    """Test importing lead lists as marketing goals"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = get_user_model().objects.create_user(username='testuser',
+                                                          email='test@admin.com',
+                                                          password='testpassword')
+        self.client.force_authenticate(self.admin)
+
+    def import_file(self, name, content):
+        response = self.client.post(IMPORT_URL, {'file': SimpleUploadedFile(name, content)}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        jobs.run(jobs.claim(['imports'], 'test-worker'))
+        return self.client.get(response['Location']).data
+
+    def test_import_csv(self):
+        """Test that new leads are inserted and duplicates and invalid rows reported"""
+        existing = MarketingGoal.objects.create(trading_name='Existing Goal', business_field='Retail',
+                                                postal_code='e1 6an')
+        costumer = create_costumer('Test', self.admin)
+        result = self.import_file('leads.csv', LEADS.encode())
+
+        self.assertEqual(result['job_status'], 'S')
+        self.assertEqual(result['summary'], {'rows': 5, 'created': 1, 'duplicate': 3, 'invalid': 1})
+        verdicts = result['verdicts']
+        goal = MarketingGoal.objects.get(trading_name='Corner Cafe Ltd')
+        self.assertEqual(verdicts[0], {'row': 2, 'verdict': 'created', 'goal': goal.id})
+        self.assertEqual(verdicts[1], {'row': 3, 'verdict': 'duplicate', 'goal': existing.id})
+        self.assertEqual(verdicts[2], {'row': 4, 'verdict': 'duplicate', 'costumer': costumer.id})
+        self.assertEqual(verdicts[3], {'row': 5, 'verdict': 'duplicate', 'duplicate_of_row': 2})
+        self.assertEqual(verdicts[4]['verdict'], 'invalid')
+        self.assertIn('trading_name', verdicts[4]['errors'])
+
+        self.assertEqual((goal.land_line, goal.postal_code, goal.created_by), ('02079460000', 'SW1A 1AA', self.admin))
+        self.assertTrue(Change.objects.filter(model='marketinggoal', object_id=goal.id, action='C').exists())
+
+    def test_import_xlsx(self):
+        """Test that XLSX lead lists are read too"""
+        import openpyxl
+        workbook = openpyxl.Workbook()
+        workbook.active.append(['Name', 'Sector', 'Mobile'])
+        workbook.active.append(['Shop', 'Retail', 7700900123])
+        content = io.BytesIO()
+        workbook.save(content)
+        result = self.import_file('leads.xlsx', content.getvalue())
+        self.assertEqual(result['summary'], {'rows': 1, 'created': 1})
+        self.assertEqual(MarketingGoal.objects.get(trading_name='Shop').mobile, '7700900123')
+
+    def test_import_windows_1252_csv(self):
+        """Test that CSV files exported in Windows-1252 rather than UTF-8 are read"""
+        result = self.import_file('leads.csv', 'Name,Sector\nCaf\u00e9 Cr\u00e8me,Food \u2013 Drink\n'.encode('cp1252'))
+        self.assertEqual(result['summary'], {'rows': 1, 'created': 1})
+        self.assertEqual(MarketingGoal.objects.get().business_field, 'Food \u2013 Drink')
+
+    def test_failed_import_summary(self):
+        """Test that an import stopped by an unreadable file still stores its summary"""
+        result = self.import_file('leads.xlsx', b'not a workbook')
+        self.assertEqual(result['job_status'], 'F')
+        self.assertEqual(result['summary']['rows'], 0)
+        self.assertIn('failed', result['summary'])
+
+    def test_import_rejects_other_files(self):
+        """Test that only CSV and XLSX files are accepted"""
+        response = self.client.post(IMPORT_URL, {'file': SimpleUploadedFile('leads.pdf', b'%PDF')},
+                                    format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,102 @@
+import asyncio
+from unittest import skipUnless
+
+from asgiref.sync import sync_to_async
+from asgiref.testing import ApplicationCommunicator
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TransactionTestCase, override_settings
+from rest_framework.authtoken.models import Token
+
+from core.models import Change, MarketingGoal
+from crm import stream
+
+
+def stream_scope(query_string=b'', headers=()):
+    return {'type': 'http', 'method': 'GET', 'path': stream.PATH,
+            'query_string': query_string, 'headers': list(headers)}
+
+
+@override_settings(GOAL_STREAM_POLL_INTERVAL=0.05, GOAL_STREAM_HEARTBEAT=5)
+class GoalStreamTest(TransactionTestCase):
+    """Test the server-sent events stream of the goal changes"""
+
+    def setUp(self):
+        self.admin = get_user_model().objects.create_user(username='testuser',
+                                                          email='test@admin.com',
+                                                          password='testpassword')
+        self.token = Token.objects.create(user=self.admin)
+
+    def create_goal(self, name):
+        return MarketingGoal.objects.create(trading_name=name, business_field='Test', created_by=self.admin)
+
+    def begin_transaction(self):
+        """Open a transaction of another connection, with its own transaction id"""
+        other = connection.get_new_connection(connection.get_connection_params())
+        with other.cursor() as cursor:
+            cursor.execute('SELECT txid_current()')
+        return other
+
+    async def receive_body(self, communicator):
+        message = await communicator.receive_output(2)
+        self.assertEqual(message['type'], 'http.response.body')
+        return message['body']
+
+    async def test_requires_token(self):
+        """Test that the stream is private"""
+        communicator = ApplicationCommunicator(stream.goal_stream, stream_scope(b'token=wrong'))
+        await communicator.send_input({'type': 'http.request'})
+        start = await communicator.receive_output(2)
+        self.assertEqual(start['status'], 401)
+
+    async def test_resume_and_follow(self):
+        """Test that a resuming client gets the missed events, then the new ones"""
+        goal = await sync_to_async(self.create_goal)('Shop')
+        first = await sync_to_async(lambda: Change.objects.get(model='marketinggoal'))()
+        goal.status = 'A'
+        await sync_to_async(goal.save)()
+
+        communicator = ApplicationCommunicator(stream.goal_stream, stream_scope(
+            b'token=' + self.token.key.encode(), [(b'last-event-id', b'%d-%d' % (first.txid, first.seq - 1))]))
+        await communicator.send_input({'type': 'http.request'})
+        start = await communicator.receive_output(2)
+        self.assertEqual(start['status'], 200)
+        self.assertEqual(dict(start['headers'])[b'content-type'], b'text/event-stream')
+        self.assertEqual(await self.receive_body(communicator), b'retry: 3000\n\n')
+        created = await self.receive_body(communicator)
+        self.assertIn(b'id: %d-%d\n' % (first.txid, first.seq), created)
+        self.assertIn(b'"action":"created"', created)
+        updated = await self.receive_body(communicator)
+        self.assertIn(b'"action":"updated"', updated)
+        self.assertIn(b'"status":"A"', updated)
+
+        await sync_to_async(self.create_goal)('Other Shop')
+        followed = await self.receive_body(communicator)
+        self.assertIn(b'"trading_name":"Other Shop"', followed)
+
+        await communicator.send_input({'type': 'http.disconnect'})
+        await communicator.wait(2)
+        await asyncio.sleep(0)
+        self.assertIsNone(stream.broadcaster.task)
+
+    @skipUnless(connection.vendor == 'postgresql', 'Only PostgreSQL holds back the changes of running transactions')
+    async def test_change_held_back(self):
+        """Test that a change notified behind an older running transaction is sent once it ends"""
+        communicator = ApplicationCommunicator(stream.goal_stream, stream_scope(
+            b'token=' + self.token.key.encode()))
+        await communicator.send_input({'type': 'http.request'})
+        await communicator.receive_output(2)
+        await self.receive_body(communicator)
+
+        older = await sync_to_async(self.begin_transaction)()
+        try:
+            await sync_to_async(self.create_goal)('Shop')
+            self.assertTrue(await communicator.receive_nothing(0.5))
+            older.rollback()
+            created = await self.receive_body(communicator)
+            self.assertIn(b'"trading_name":"Shop"', created)
+        finally:
+            older.close()
+
+        await communicator.send_input({'type': 'http.disconnect'})
+        await communicator.wait(2)
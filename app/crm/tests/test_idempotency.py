@@ -0,0 +1,76 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import IdempotencyKey, Payment, MIDRevenue
+from core import idempotency
+from crm.tests.test_costumers_contracts import create_costumer, create_contract
+
+
+def contract_payment_url(contract_id):
+    return reverse('crm:contract-payment', args=[contract_id])
+
+
+def contract_mid_url(contract_id):
+    return reverse('crm:contract-mid', args=[contract_id])
+
+
+class IdempotencyTest(TestCase):
+    """Test the Idempotency-Key support of the create endpoints"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = get_user_model().objects.create_user(username='testuser',
+                                                          email='test@admin.com',
+                                                          password='testpassword')
+        self.client.force_authenticate(self.admin)
+        self.contract = create_contract(create_costumer('Test', self.admin), self.admin, '2020-12-12')
+        self.payment = {'date': '2020-12-12T12:30:00Z', 'direct_debit_cost': '12.00'}
+
+    def test_retry_replayed(self):
+        """Test that a retried create is answered from the stored response without writing"""
+        url = contract_payment_url(self.contract.id)
+        first = self.client.post(url, self.payment, HTTP_IDEMPOTENCY_KEY='key-1')
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        retry = self.client.post(url, self.payment, HTTP_IDEMPOTENCY_KEY='key-1')
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(Payment.objects.filter(contract=self.contract).count(), 1)
+
+    def test_without_key(self):
+        """Test that creates without a key are not deduplicated"""
+        url = contract_payment_url(self.contract.id)
+        self.client.post(url, self.payment)
+        self.client.post(url, self.payment)
+        self.assertEqual(Payment.objects.filter(contract=self.contract).count(), 2)
+
+    def test_key_reused_for_other_request(self):
+        """Test that a key can not be reused for a different request"""
+        url = contract_mid_url(self.contract.id)
+        mid = {'income': 12, 'profit': 5, 'date': '2020-12-12T12:30:00Z'}
+        self.client.post(url, mid, HTTP_IDEMPOTENCY_KEY='key-2')
+        response = self.client.post(url, dict(mid, income=13), HTTP_IDEMPOTENCY_KEY='key-2')
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(MIDRevenue.objects.filter(contract=self.contract).count(), 1)
+
+    def test_failed_create_not_stored(self):
+        """Test that invalid requests do not consume the key"""
+        url = contract_payment_url(self.contract.id)
+        response = self.client.post(url, {'date': 'not a date'}, HTTP_IDEMPOTENCY_KEY='key-3')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(IdempotencyKey.objects.filter(key='key-3').exists())
+
+    def test_expired_key(self):
+        """Test that keys past their TTL run the create again and can be purged"""
+        url = contract_payment_url(self.contract.id)
+        self.client.post(url, self.payment, HTTP_IDEMPOTENCY_KEY='key-4')
+        IdempotencyKey.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(idempotency.purge_expired(), 1)
+        self.client.post(url, self.payment, HTTP_IDEMPOTENCY_KEY='key-4')
+        self.assertEqual(Payment.objects.filter(contract=self.contract).count(), 2)
@@ -1,5 +1,6 @@
 from django.contrib.auth import get_user_model
 from django.urls import reverse
+from django.core.cache import cache
 from django.test import TestCase
 from rest_framework import status
 from rest_framework.test import APIClient
@@ -11,6 +12,7 @@ def goal_url(id):
     return reverse('crm:marketinggoal-detail', args=[id])
 
 GOAL_URL = reverse('crm:marketinggoal-list')
+BOARD_URL = reverse('crm:marketinggoal-board')
 
 
 class TestGoal(TestCase):
@@ -94,3 +96,34 @@ class TestGoal(TestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         goal.refresh_from_db()
         self.assertEqual(goal.last_update, self.admin)
+
+    def test_goal_board(self):
+        """Test the board counts goals by status and admin and lists the latest of each status"""
+        self.login()
+        cache.clear()
+        for index in range(3):
+            MarketingGoal.objects.create(trading_name='Pending %d' % index, business_field='Test', status='P',
+                                         created_by=self.admin)
+        MarketingGoal.objects.create(trading_name='Accepted', business_field='Test', status='A')
+        response = self.client.get(BOARD_URL, {'page_size': 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        columns = {column['status']: column for column in response.data['columns']}
+        self.assertEqual(columns['P']['count'], 3)
+        self.assertEqual([goal['trading_name'] for goal in columns['P']['goals']], ['Pending 2', 'Pending 1'])
+        self.assertEqual(columns['A']['count'], 1)
+        self.assertEqual(columns['R'], {'status': 'R', 'label': 'Rejected', 'count': 0, 'goals': []})
+        self.assertIn({'id': self.admin.id, 'username': 'testuser', 'count': 3}, response.data['created_by'])
+
+    def test_goal_board_invalidated(self):
+        """Test the cached board is dropped when a goal is written"""
+        self.login()
+        cache.clear()
+        goal = MarketingGoal.objects.create(trading_name='Goal', business_field='Test', status='W')
+        self.client.get(BOARD_URL)
+        with self.assertNumQueries(1):
+            self.client.get(BOARD_URL)
+        goal.status = 'A'
+        goal.save()
+        columns = {column['status']: column for column in self.client.get(BOARD_URL).data['columns']}
+        self.assertEqual(columns['A']['count'], 1)
+        self.assertEqual(columns['W']['count'], 0)
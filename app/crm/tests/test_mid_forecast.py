@@ -0,0 +1,115 @@
+from datetime import datetime
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Job, MIDRevenue, MIDRevenueForecast
+from core.testing import QueryBudgetMixin
+from crm.forecasting import forecast_mid_revenues, month_index, month_start, portfolio_rates
+from crm.tests.test_costumers_contracts import create_contract, create_costumer
+
+
+SUMMARY_URL = reverse('crm:mid-forecast')
+
+
+def contract_forecast_url(contract_id):
+    return reverse('crm:contract-mid-forecast', args=[contract_id])
+
+
+class TestMIDForecast(QueryBudgetMixin, TestCase):
+    """The MID revenue forecasts per contract"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = get_user_model().objects.create_user(username='testuser', email='test@admin.com',
+                                                          password='testpassword')
+        self.client.force_authenticate(self.admin)
+        self.current = month_index(timezone.localdate())
+        costumer = create_costumer('Test', self.admin)
+        # growing by 10 a month over the last year
+        self.growing = create_contract(costumer, self.admin, '2020-01-01')
+        for k in range(12):
+            self.revenue(self.growing, self.current - 12 + k, 100 + 10 * k, 10 + k)
+        # 130 on even months and 70 on odd ones over the last two years
+        self.seasonal = create_contract(costumer, self.admin, '2020-01-01')
+        for k in range(24):
+            month = self.current - 24 + k
+            self.revenue(self.seasonal, month, 130 if month % 2 else 70, 10)
+        self.new = create_contract(costumer, self.admin, '2020-01-01')
+
+    def revenue(self, contract, month, income, profit):
+        date = timezone.make_aware(datetime.combine(month_start(month).replace(day=15), datetime.min.time()))
+        MIDRevenue.objects.create(contract=contract, income=income, profit=profit, date=date)
+
+    def forecast(self, contract):
+        return list(MIDRevenueForecast.objects.filter(contract=contract).order_by('month'))
+
+    def test_forecasts(self):
+        """Trends, seasons and card turnover projections for the next 12 months"""
+        self.assertEqual(forecast_mid_revenues(), {'contracts': 3, 'full': True})
+
+        growing = self.forecast(self.growing)
+        self.assertEqual([item.month for item in growing], [month_start(self.current + k) for k in range(12)])
+        self.assertEqual(growing[0].method, 'T')
+        self.assertAlmostEqual(float(growing[0].income), 220, places=1)
+        self.assertAlmostEqual(float(growing[11].income), 330, places=1)
+        self.assertAlmostEqual(float(growing[11].profit), 33, places=1)
+
+        seasonal = self.forecast(self.seasonal)
+        self.assertEqual(seasonal[0].method, 'S')
+        for month, item in zip(range(self.current, self.current + 12), seasonal):
+            if month % 2:
+                self.assertGreater(item.income, 120)
+            else:
+                self.assertLess(item.income, 80)
+
+        new = self.forecast(self.new)
+        income_rate, profit_rate = portfolio_rates(self.current)
+        self.assertEqual(new[0].method, 'C')
+        self.assertAlmostEqual(float(new[0].income), 10 / 12 * income_rate, places=2)
+
+    def test_incremental_runs(self):
+        """Later runs recompute only the contracts with new revenue"""
+        forecast_mid_revenues()
+        self.assertEqual(forecast_mid_revenues(), {'contracts': 0, 'full': False})
+        self.revenue(self.new, self.current - 1, 50, 5)
+        self.assertEqual(forecast_mid_revenues(), {'contracts': 1, 'full': False})
+        self.assertEqual(self.forecast(self.new)[0].method, 'C')
+        self.assertEqual(forecast_mid_revenues(full=True), {'contracts': 3, 'full': True})
+
+    def test_deleted_and_moved_revenue(self):
+        """Deleting revenue, or moving it to another contract, refreshes the contracts it left"""
+        forecast_mid_revenues()
+        before = self.forecast(self.growing)[0].income
+        self.growing.mid_revenues.order_by('date').last().delete()
+        self.assertEqual(forecast_mid_revenues(), {'contracts': 1, 'full': False})
+        self.assertLess(self.forecast(self.growing)[0].income, before)
+
+        revenue = self.seasonal.mid_revenues.order_by('date').last()
+        revenue.contract = self.new
+        revenue.save()
+        self.assertEqual(forecast_mid_revenues(), {'contracts': 2, 'full': False})
+
+    def test_forecast_endpoints(self):
+        """The forecasts of a contract and the monthly totals of the portfolio"""
+        forecast_mid_revenues()
+        response = self.client.get(contract_forecast_url(self.growing.id))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 12)
+        self.assertWithinQueryBudget(response)
+
+        response = self.client.get(SUMMARY_URL)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 12)
+        self.assertEqual(response.data[0]['contracts'], 3)
+        self.assertWithinQueryBudget(response)
+
+        response = self.client.post(SUMMARY_URL, {'full': 'true'})
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertWithinQueryBudget(response)
+        job = Job.objects.get(id=response.data['job'])
+        self.assertEqual((job.task, job.args), ('crm.forecast_mid_revenues', [True]))
@@ -0,0 +1,82 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Job, PaperRoll, PaperRollForecast
+from core.testing import QueryBudgetMixin
+from crm.forecasting import forecast_paper_rolls
+from crm.tests.test_costumers_contracts import create_costumer
+
+
+FORECAST_URL = reverse('crm:paper-roll-forecast')
+
+
+@override_settings(PAPER_ROLL_LEAD_DAYS=5, PAPER_ROLL_DRAFT_DAYS=14, PAPER_ROLL_DRAFT_ORDERS=False)
+class TestPaperRollForecast(QueryBudgetMixin, TestCase):
+    """The paper roll consumption forecast and its draft orders"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = get_user_model().objects.create_user(username='testuser', email='test@admin.com',
+                                                          password='testpassword')
+        self.client.force_authenticate(self.admin)
+        self.now = timezone.now()
+        # 10 rolls a day: 100 rolls every 10 days, the last order runs out in 2 days
+        self.busy = create_costumer('Busy', self.admin)
+        self.order(self.busy, 100, 28)
+        self.order(self.busy, 100, 18)
+        self.order(self.busy, 100, 8)
+        # 1 roll a day: 60 rolls over 60 days, the last order runs out in 50 days
+        self.quiet = create_costumer('Quiet', self.admin)
+        self.order(self.quiet, 60, 70)
+        self.order(self.quiet, 60, 10)
+        # a single order has no rate
+        self.new = create_costumer('New', self.admin)
+        self.order(self.new, 20, 3)
+        # nor do orders placed within a day
+        self.hasty = create_costumer('Hasty', self.admin)
+        self.order(self.hasty, 20, 2)
+        self.order(self.hasty, 20, 2 - 1 / 24)
+
+    def order(self, costumer, amount, days_ago, is_draft=False):
+        return PaperRoll.objects.create(costumer=costumer, amount=amount, cost=1, price=2, direct_debit_cost=0.5,
+                                        ordered_date=self.now - timedelta(days=days_ago), is_draft=is_draft)
+
+    def test_forecast(self):
+        """The consumption rate and next order of every costumer with a history are projected"""
+        self.assertEqual(forecast_paper_rolls(), {'costumers': 2, 'orders': 8, 'drafts': 0})
+        busy = PaperRollForecast.objects.get(costumer=self.busy)
+        self.assertEqual((busy.orders, busy.amount), (3, 100))
+        self.assertAlmostEqual(busy.daily_rate, 10)
+        self.assertEqual(busy.next_order_date, timezone.localdate(self.now - timedelta(days=3)))
+        quiet = PaperRollForecast.objects.get(costumer=self.quiet)
+        self.assertAlmostEqual(quiet.daily_rate, 1)
+        self.assertEqual(quiet.next_order_date, timezone.localdate(self.now + timedelta(days=45)))
+        self.assertFalse(PaperRollForecast.objects.filter(costumer__in=[self.new, self.hasty]).exists())
+
+    def test_draft_orders(self):
+        """Drafts repeat the last order of the costumers due soon, once, and are not counted as orders"""
+        self.assertEqual(forecast_paper_rolls(create_drafts=True)['drafts'], 1)
+        draft = PaperRoll.objects.get(is_draft=True)
+        self.assertEqual((draft.costumer, draft.amount, draft.price), (self.busy, 100, 2))
+        self.assertEqual(forecast_paper_rolls(create_drafts=True), {'costumers': 2, 'orders': 8, 'drafts': 0})
+
+    def test_forecast_endpoint(self):
+        """The forecasts are listed soonest first and can be recomputed in the background"""
+        forecast_paper_rolls()
+        response = self.client.get(FORECAST_URL)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['trading_name'] for item in response.data], ['Busy', 'Quiet'])
+        self.assertWithinQueryBudget(response)
+        response = self.client.get(FORECAST_URL, {'due_within': 10})
+        self.assertEqual([item['costumer'] for item in response.data], [self.busy.id])
+
+        response = self.client.post(FORECAST_URL, {'drafts': 'true'})
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        job = Job.objects.get(id=response.data['job'])
+        self.assertEqual((job.task, job.args), ('crm.forecast_paper_rolls', [True]))
@@ -0,0 +1,93 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Contract, Job, PCIWorklistItem
+from core.testing import QueryBudgetMixin
+from crm import pci
+from crm.tests.test_costumers_contracts import create_contract, create_costumer
+
+
+WORKLIST_URL = reverse('crm:pci-worklist')
+TODAY = timezone.localdate()
+
+
+def listed():
+    return dict(PCIWorklistItem.objects.values_list('contract_id', 'pci_due_date'))
+
+
+@override_settings(PCI_DUE_DAYS=30)
+class TestPCIWorklist(QueryBudgetMixin, TestCase):
+    """The PCI-DSS worklist and its incremental scan"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = get_user_model().objects.create_user(username='testuser', email='test@admin.com',
+                                                          password='testpassword')
+        self.client.force_authenticate(self.admin)
+        self.costumer = create_costumer('Test', self.admin)
+        self.overdue = self.create_contract(TODAY - timedelta(days=3))
+        self.soon = self.create_contract(TODAY + timedelta(days=10))
+        self.later = self.create_contract(TODAY + timedelta(days=90))
+        self.unknown = self.create_contract(None)
+
+    def create_contract(self, pci_due_date):
+        contract = create_contract(self.costumer, self.admin, '2026-01-01')
+        contract.pci_due_date = pci_due_date
+        contract.save()
+        return contract
+
+    def test_first_scan(self):
+        """The contracts due within the days or overdue are listed"""
+        self.assertEqual(pci.scan(TODAY), {'added': 2, 'updated': 0, 'removed': 0})
+        self.assertEqual(listed(), {self.overdue.id: self.overdue.pci_due_date, self.soon.id: self.soon.pci_due_date})
+
+    def test_incremental_scan(self):
+        """Later scans follow the changed contracts and the advancing horizon only"""
+        pci.scan(TODAY)
+        self.soon.pci_due_date = TODAY + timedelta(days=200)
+        self.soon.save()
+        self.unknown.pci_due_date = TODAY + timedelta(days=5)
+        self.unknown.save()
+        self.assertEqual(pci.scan(TODAY), {'added': 1, 'updated': 0, 'removed': 1})
+        self.assertEqual(set(listed()), {self.overdue.id, self.unknown.id})
+
+        # changed without the model signals nor the change log, so not re-examined
+        Contract.objects.filter(id=self.overdue.id).update(pci_due_date=TODAY + timedelta(days=300))
+        self.assertEqual(pci.scan(TODAY + timedelta(days=70)), {'added': 1, 'updated': 0, 'removed': 0})
+        self.assertEqual(set(listed()), {self.overdue.id, self.unknown.id, self.later.id})
+
+    def test_updated_and_hidden_contracts(self):
+        """A changed date is updated and a contract being deleted leaves the worklist"""
+        pci.scan(TODAY)
+        self.soon.pci_due_date = TODAY + timedelta(days=20)
+        self.soon.save()
+        self.client.delete(reverse('crm:contract-detail', args=[self.overdue.id]))
+        self.assertEqual(pci.scan(TODAY), {'added': 0, 'updated': 1, 'removed': 1})
+        self.assertEqual(listed(), {self.soon.id: TODAY + timedelta(days=20)})
+
+    def test_worklist_endpoint(self):
+        """The worklist is listed soonest first and filtered on being overdue"""
+        pci.scan()
+        response = self.client.get(WORKLIST_URL)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([(item['contract'], item['days_left']) for item in response.data],
+                         [(self.overdue.id, -3), (self.soon.id, 10)])
+        self.assertEqual(response.data[0]['trading_name'], 'Test')
+        self.assertWithinQueryBudget(response)
+
+        response = self.client.get(WORKLIST_URL, {'overdue': 'true'})
+        self.assertEqual([item['contract'] for item in response.data], [self.overdue.id])
+        response = self.client.get(WORKLIST_URL, {'overdue': 'false', 'fields': 'contract,days_left'})
+        self.assertEqual(response.data, [{'contract': self.soon.id, 'days_left': 10}])
+
+    def test_queueing_scan(self):
+        """A scan can be queued ahead of the scheduled one"""
+        response = self.client.post(WORKLIST_URL)
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(Job.objects.get(id=response.data['job']).task, 'crm.scan_pci_due_dates')
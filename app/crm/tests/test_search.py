@@ -0,0 +1,74 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import MarketingGoal, TradingAddress
+from crm.tests.test_costumers_contracts import create_costumer
+
+
+SEARCH_URL = reverse('crm:search')
+
+
+class TestSearch(TestCase):
+    """Full-text search over the notes and addresses"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = get_user_model().objects.create_user(username='testuser', email='test@admin.com',
+                                                          password='testpassword')
+        self.client.force_authenticate(self.admin)
+        self.costumer = create_costumer('Corner Cafe', self.admin)
+        self.costumer.note = 'Asked for a <b>second</b> terminal before the summer'
+        self.costumer.save()
+        self.goal = MarketingGoal.objects.create(trading_name='Bakery', business_field='Food', status='P',
+                                                 note='Wants a terminal quote next week', created_by=self.admin)
+
+    def search(self, **params):
+        response = self.client.get(SEARCH_URL, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data['results']
+
+    def test_login_required(self):
+        """Searching needs a logged in user"""
+        self.client.force_authenticate(None)
+        response = self.client.get(SEARCH_URL, {'q': 'terminal'})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_searching_notes(self):
+        """The notes of every model are searched, with the matched words highlighted"""
+        results = self.search(q='terminal')
+        self.assertEqual({(result['model'], result['id']) for result in results},
+                         {('costumer', self.costumer.id), ('goal', self.goal.id)})
+        costumer = next(result for result in results if result['model'] == 'costumer')
+        self.assertEqual(costumer['title'], 'Corner Cafe')
+        self.assertIn('<mark>terminal</mark>', costumer['headline'])
+        self.assertNotIn('<b>', costumer['headline'])
+
+    def test_searching_trading_addresses(self):
+        """Costumers are found by their trading addresses"""
+        TradingAddress.objects.create(address='12 Harbour Road', costumer=self.costumer)
+        results = self.search(q='harbour')
+        self.assertEqual([(result['model'], result['id']) for result in results], [('costumer', self.costumer.id)])
+
+    def test_filters(self):
+        """The models searched and the goal status can be restricted"""
+        self.assertEqual([result['model'] for result in self.search(q='terminal', model='goal')], ['goal'])
+        self.assertEqual(self.search(q='terminal', model='goal', status='A'), [])
+
+    def test_invalid_parameters(self):
+        """The text is required and the filters are validated"""
+        for params in ({}, {'q': 'terminal', 'model': 'invoice'}, {'q': 'terminal', 'status': 'X'}):
+            response = self.client.get(SEARCH_URL, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_ranking(self):
+        """On PostgreSQL a match in the name ranks above one in the notes"""
+        if connection.vendor != 'postgresql':
+            self.skipTest('Ranking needs PostgreSQL')
+        MarketingGoal.objects.create(trading_name='Terminal Repairs', business_field='Tech', status='P',
+                                     created_by=self.admin)
+        results = self.search(q='terminal', model='goal')
+        self.assertEqual(results[0]['title'], 'Terminal Repairs')
@@ -0,0 +1,104 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import sync
+from core.models import Change, MarketingGoal, Payment
+from crm.tests.test_costumers_contracts import create_costumer, create_contract
+
+
+SYNC_URL = reverse('crm:sync')
+
+
+class SyncTest(TestCase):
+    """Test the incremental sync feed"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = get_user_model().objects.create_user(username='testuser',
+                                                          email='test@admin.com',
+                                                          password='testpassword')
+        self.client.force_authenticate(self.admin)
+        self.costumer = create_costumer('Test', self.admin)
+        self.contract = create_contract(self.costumer, self.admin, '2020-12-12')
+
+    def test_login_required(self):
+        """Test that the feed is private"""
+        self.client.force_authenticate(None)
+        response = self.client.get(SYNC_URL)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_changes_since_watermark(self):
+        """Test that only the rows changed after the watermark are sent, once each"""
+        watermark = self.client.get(SYNC_URL).data['next']
+        goal = MarketingGoal.objects.create(trading_name='Shop', created_by=self.admin)
+        goal.status = 'A'
+        goal.save()
+        response = self.client.get(SYNC_URL, {'since': watermark})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.data['has_more'])
+        self.assertEqual(len(response.data['results']), 1)
+        change = response.data['results'][0]
+        self.assertEqual((change['model'], change['id'], change['deleted']), ('marketinggoal', goal.id, False))
+        self.assertEqual(change['data']['status'], 'A')
+        self.assertEqual(self.client.get(SYNC_URL, {'since': response.data['next']}).data['results'], [])
+
+    def test_tombstones(self):
+        """Test that deleted rows, cascaded children included, are sent as tombstones"""
+        watermark = Change.objects.latest('seq').seq
+        payment = Payment.objects.create(contract=self.contract, date='2020-12-12T12:30:00Z', direct_debit_cost=12)
+        contract_id = self.contract.id
+        self.contract.delete()
+        results = self.client.get(SYNC_URL, {'since': watermark}).data['results']
+        deleted = {(change['model'], change['id']) for change in results if change['deleted']}
+        self.assertIn(('contract', contract_id), deleted)
+        self.assertIn(('payment', payment.id), deleted)
+
+    def test_pagination(self):
+        """Test that the feed is paged by the change sequence"""
+        for index in range(3):
+            MarketingGoal.objects.create(trading_name='Shop %d' % index, created_by=self.admin)
+        first = self.client.get(SYNC_URL, {'limit': 2}).data
+        self.assertTrue(first['has_more'])
+        self.assertEqual(len(first['results']), 2)
+        rest = self.client.get(SYNC_URL, {'since': first['next'], 'limit': 1000}).data
+        self.assertFalse(rest['has_more'])
+        seen = [change['seq'] for change in first['results'] + rest['results']]
+        self.assertEqual(seen, sorted(seen))
+
+    def test_invalid_watermark(self):
+        """Test that a malformed watermark is rejected"""
+        response = self.client.get(SYNC_URL, {'since': 'yesterday'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_legacy_watermark(self):
+        """Test that a bare sequence number of older clients is still followed, never missing a change"""
+        watermark = Change.objects.latest('seq').seq
+        goal = MarketingGoal.objects.create(trading_name='Shop', created_by=self.admin)
+        results = self.client.get(SYNC_URL, {'since': watermark}).data['results']
+        self.assertEqual(results[-1]['id'], goal.id)
+        if connection.vendor != 'postgresql':
+            self.assertEqual(len(results), 1)
+
+    def test_pruning(self):
+        """Test that old superseded changes and tombstones are pruned and the clients behind them start over"""
+        watermark = self.client.get(SYNC_URL).data['next']
+        goal = MarketingGoal.objects.create(trading_name='Shop', created_by=self.admin)
+        goal.save()
+        gone = MarketingGoal.objects.create(trading_name='Gone', created_by=self.admin)
+        gone.delete()
+        Change.objects.update(changed_at=timezone.now() - timedelta(days=400))
+
+        self.assertEqual(sync.prune_changes(), 3)
+        self.assertEqual(list(Change.objects.filter(model='marketinggoal').values_list('object_id', 'action')),
+                         [(goal.id, 'U')])
+        response = self.client.get(SYNC_URL, {'since': watermark})
+        self.assertEqual(response.status_code, status.HTTP_410_GONE)
+        results = self.client.get(SYNC_URL).data['results']
+        self.assertIn(('marketinggoal', goal.id), {(change['model'], change['id']) for change in results})
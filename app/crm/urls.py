@@ -29,5 +29,12 @@ urlpatterns = [
     path('contracts/<int:pk>/service/', views.ContractServiceViewSet.as_view(), name='contract-service'),
     path('contracts/<int:pk>/paperroll/', views.CostumerPaperRollViewSet.as_view(), name='contract-paperroll'),
     path('contracts/<int:pk>/payment/', views.PaymentViewSet.as_view(), name='contract-payment'),
-    path('contracts/<int:pk>/mid/', views.MIDViewSet.as_view(), name='contract-mid')
+    path('contracts/<int:pk>/mid/', views.MIDViewSet.as_view(), name='contract-mid'),
+    path('contracts/<int:pk>/mid-forecast/', views.MIDForecastViewSet.as_view(), name='contract-mid-forecast'),
+    path('sync/', views.SyncView.as_view(), name='sync'),
+    path('search/', views.SearchView.as_view(), name='search'),
+    path('pci-worklist/', views.PCIWorklistView.as_view(), name='pci-worklist'),
+    path('paper-roll-forecast/', views.PaperRollForecastView.as_view(), name='paper-roll-forecast'),
+    path('mid-forecast/', views.MIDForecastSummaryView.as_view(), name='mid-forecast'),
+    path('goal-imports/<int:pk>/', views.GoalImportView.as_view(), name='goal-import'),
 ]
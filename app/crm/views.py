@@ -1,13 +1,32 @@
+from datetime import timedelta
+
 from rest_framework import viewsets, mixins, generics, status
 from rest_framework.authentication import TokenAuthentication
+from rest_framework.decorators import action
 from rest_framework.generics import get_object_or_404
+from rest_framework.parsers import MultiPartParser
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.reverse import reverse
 from rest_framework.exceptions import ValidationError
 from rest_framework.views import APIView
 
-from core import models
-from crm import serializers
+from django.conf import settings
+from django.db.models import Count, Max, Sum
+from django.utils import timezone
+
+from core import jobs, models, sync
+from core.deletion import AsyncDestroyMixin
+from core.conditional import ConditionalListMixin, ConditionalRetrieveMixin
+from core.fieldsets import ProjectedQuerysetMixin
+from core.idempotency import IdempotentCreateMixin
+from crm import board, conversion, filters, pci, renewal, search, serializers, tasks
+
+
+def get_contract(pk):
+    """Return the contract unless it or its costumer is being deleted, else raise 404"""
+    contracts = models.Contract.objects.visible().filter(costumer__deletion_requested_at__isnull=True)
+    return get_object_or_404(contracts, pk=pk)
 
 
 class BaseViewSet(viewsets.GenericViewSet, mixins.ListModelMixin, mixins.CreateModelMixin, mixins.DestroyModelMixin):
@@ -19,7 +38,7 @@ class BaseViewSet(viewsets.GenericViewSet, mixins.ListModelMixin, mixins.CreateM
         """To assign the admin to the Serializer"""
         serializer.save(created_by=self.request.user)
 
-class CountryViewSet(BaseViewSet):
+class CountryViewSet(ProjectedQuerysetMixin, ConditionalListMixin, BaseViewSet):
     """Manage Countries"""
     queryset = models.Country.objects.all()
     serializer_class = serializers.CountrySerializer
@@ -29,7 +48,7 @@ class CountryViewSet(BaseViewSet):
         return self.queryset.order_by('abreviation')
 
 
-class POSCompanyViewSet(BaseViewSet):
+class POSCompanyViewSet(ProjectedQuerysetMixin, ConditionalListMixin, BaseViewSet):
     """Manage Companies"""
     serializer_class = (serializers.POSCompanySerializer)
     queryset = models.POSCompany.objects.all()
@@ -38,8 +57,19 @@ class POSCompanyViewSet(BaseViewSet):
         """To order by name"""
         return self.queryset.order_by('name')
 
+    def list_version_aggregates(self):
+        """The model count of each company is listed too"""
+        aggregates = super().list_version_aggregates()
+        aggregates.update({
+            'count': Count('id', distinct=True),
+            'models': Count('pos_models', distinct=True),
+            'last_model': Max('pos_models__id'),
+            'model_versions': Sum('pos_models__version'),
+        })
+        return aggregates
+
 
-class POSModelListView(generics.ListAPIView, mixins.DestroyModelMixin):
+class POSModelListView(ProjectedQuerysetMixin, ConditionalListMixin, generics.ListAPIView, mixins.DestroyModelMixin):
     """Manage pos models"""
     serializer_class = serializers.PosModelSerializer
     queryset = models.PosModel.objects.all()
@@ -64,7 +94,7 @@ class POSModelCreateView(generics.CreateAPIView):
         serializer.save(created_by=self.request.user, company=company)
 
 
-class PosModelCompanyList(generics.ListAPIView):
+class PosModelCompanyList(ProjectedQuerysetMixin, generics.ListAPIView):
     """To retrieve models for a company"""
     serializer_class = serializers.PosModelSerializer
     authentication_classes = (TokenAuthentication,)
@@ -77,7 +107,7 @@ class PosModelCompanyList(generics.ListAPIView):
         return models.PosModel.objects.filter(company=company)
     
 
-class PosViewSet(BaseViewSet, mixins.UpdateModelMixin):
+class PosViewSet(ProjectedQuerysetMixin, BaseViewSet, mixins.UpdateModelMixin):
     """The view set to handle creating and listing poses"""
     queryset = models.POS.objects.all()
     serializer_class = serializers.PosSerializer
@@ -103,7 +133,7 @@ class PosViewSet(BaseViewSet, mixins.UpdateModelMixin):
             return super().partial_update(request, pk)
 
 
-class ServiceViewSet(BaseViewSet, mixins.UpdateModelMixin):
+class ServiceViewSet(ProjectedQuerysetMixin, ConditionalListMixin, BaseViewSet, mixins.UpdateModelMixin):
     """The view set for virtual services"""
     queryset = models.VirtualService.objects.all()
     serializer_class = serializers.ServiceSerializer
@@ -200,12 +230,14 @@ class ActivePos(APIView):
         return Response(status=status.HTTP_200_OK)
 
 
-class GoalViewSet(viewsets.ModelViewSet):
+class GoalViewSet(ProjectedQuerysetMixin, ConditionalRetrieveMixin, viewsets.ModelViewSet):
     """To manage marketing goals"""
     authentication_classes = (TokenAuthentication,)
     permission_classes = (IsAuthenticated,)
     serializer_class = serializers.GoalSerializer
     queryset = models.MarketingGoal.objects.all()
+    version_fields = ('updated_at',)
+    last_modified_field = 'updated_at'
 
     def perform_create(self, serializer):
         """Create new Merketing Goal"""
@@ -221,21 +253,145 @@ class GoalViewSet(viewsets.ModelViewSet):
         """To update the marketing goal"""
         serializer.save(last_update=self.request.user)
 
+    @action(detail=False)
+    def board(self, request):
+        """The goal counts by status and by admin, with the latest goals of every status"""
+        try:
+            page_size = min(int(request.query_params.get('page_size', 20)), 100)
+        except ValueError:
+            raise ValidationError({'page_size': 'A whole number is required.'})
+        return Response(board.get_board(max(page_size, 0)))
+
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser])
+    def import_goals(self, request):
+        """Queue the import of a CSV or XLSX lead list sent as `file`"""
+        upload = request.FILES.get('file')
+        if upload is None:
+            raise ValidationError({'file': 'A CSV or XLSX file is required.'})
+        if not upload.name.lower().endswith(('.csv', '.xlsx')):
+            raise ValidationError({'file': 'Only CSV and XLSX files can be imported.'})
+        if upload.size > settings.GOAL_IMPORT_MAX_BYTES:
+            raise ValidationError({'file': 'The file is larger than %d bytes.' % settings.GOAL_IMPORT_MAX_BYTES})
+        goal_import = models.GoalImport.objects.create(file_name=upload.name, content=upload.read(),
+                                                       created_by=request.user)
+        goal_import.job = jobs.enqueue(tasks.import_goals, goal_import.id, created_by=request.user)
+        goal_import.save(update_fields=['job'])
+        location = reverse('crm:goal-import', args=[goal_import.id], request=request)
+        return Response({'id': goal_import.id, 'job': goal_import.job.id, 'status': location},
+                        status=status.HTTP_202_ACCEPTED, headers={'Location': location})
+
+    @action(detail=True, methods=['post'])
+    def convert(self, request, pk=None):
+        """Create a costumer from an accepted goal, or link it to the existing costumer sent as `costumer`.
+
+        Send the costumer fields the goal does not hold; `force` creates the costumer
+        even though matching costumers exist."""
+        get_object_or_404(models.MarketingGoal, pk=pk)
+        data = request.data.dict() if hasattr(request.data, 'dict') else dict(request.data)
+        force = str(data.pop('force', '')).lower() in ('1', 'true')
+        try:
+            costumer, created = conversion.convert(pk, data, request.user, force=force)
+        except conversion.ConversionConflict as error:
+            return Response(error.data, status=status.HTTP_409_CONFLICT)
+        return Response(serializers.CostumerSerializer(costumer).data,
+                        status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+
+
+class GoalImportView(generics.RetrieveAPIView):
+    """To follow a lead list import, staff see every import and others their own"""
+    serializer_class = serializers.GoalImportSerializer
+    authentication_classes = (TokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+
+    def get_queryset(self):
+        imports = models.GoalImport.objects.defer('content').select_related('job')
+        if self.request.user.is_staff:
+            return imports
+        return imports.filter(created_by=self.request.user)
+
 
-class CostumerListViewSet(generics.ListAPIView):
+class PCIWorklistView(ProjectedQuerysetMixin, generics.ListAPIView):
+    """The contracts whose PCI-DSS compliance is due soon or overdue, soonest first.
+
+    `overdue=true` lists only the overdue ones, `overdue=false` only those still due.
+    POST queues a scan bringing the worklist up to date ahead of the scheduled one."""
+    serializer_class = serializers.PCIWorklistSerializer
+    authentication_classes = (TokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+
+    def get_queryset(self):
+        items = (models.PCIWorklistItem.objects.filter(contract__in=pci.visible_contracts())
+                 .select_related('contract__costumer').order_by('pci_due_date', 'contract_id'))
+        overdue = self.request.query_params.get('overdue')
+        if overdue in ('true', '1'):
+            items = items.filter(pci_due_date__lt=self.today)
+        elif overdue in ('false', '0'):
+            items = items.filter(pci_due_date__gte=self.today)
+        elif overdue:
+            raise ValidationError({'overdue': 'Must be true or false.'})
+        return items
+
+    @property
+    def today(self):
+        return timezone.localdate()
+
+    def get_serializer_context(self):
+        return dict(super().get_serializer_context(), today=self.today)
+
+    def post(self, request):
+        job = jobs.enqueue(tasks.scan_pci_due_dates, created_by=request.user)
+        location = reverse('core:job-detail', args=[job.id], request=request)
+        return Response({'job': job.id, 'status': location}, status=status.HTTP_202_ACCEPTED,
+                        headers={'Location': location})
+
+
+class PaperRollForecastView(ProjectedQuerysetMixin, generics.ListAPIView):
+    """The projected next paper roll orders, soonest first.
+
+    `due_within` keeps the orders due within that many days. POST queues a new
+    forecast, with draft orders for the ones due soon when `drafts` is true."""
+    serializer_class = serializers.PaperRollForecastSerializer
+    authentication_classes = (TokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+
+    def get_queryset(self):
+        forecasts = (models.PaperRollForecast.objects.filter(costumer__deletion_requested_at__isnull=True)
+                     .select_related('costumer').order_by('next_order_date', 'costumer_id'))
+        due_within = self.request.query_params.get('due_within')
+        if due_within:
+            try:
+                days = int(due_within)
+            except ValueError:
+                raise ValidationError({'due_within': 'A whole number is required.'})
+            forecasts = forecasts.filter(next_order_date__lte=timezone.localdate() + timedelta(days=days))
+        return forecasts
+
+    def post(self, request):
+        create_drafts = str(request.data.get('drafts', '')).lower() in ('1', 'true')
+        job = jobs.enqueue(tasks.forecast_paper_rolls, create_drafts, created_by=request.user)
+        location = reverse('core:job-detail', args=[job.id], request=request)
+        return Response({'job': job.id, 'status': location}, status=status.HTTP_202_ACCEPTED,
+                        headers={'Location': location})
+
+
+class CostumerListViewSet(ProjectedQuerysetMixin, generics.ListAPIView):
     """The viewset to handle the mini-list of Costumers"""
     serializer_class = serializers.CostumerMiniSerializer
     authentication_classes = (TokenAuthentication,)
     permission_classes = (IsAuthenticated,)
-    queryset = models.Costumer.objects.all()
+    queryset = models.Costumer.objects.visible()
 
 
-class CostumerViewSet(viewsets.GenericViewSet, mixins.CreateModelMixin, mixins.UpdateModelMixin):
-    """The viewset to handle creating and updating Costumers"""
+class CostumerViewSet(ProjectedQuerysetMixin, ConditionalRetrieveMixin, AsyncDestroyMixin, viewsets.GenericViewSet,
+                      mixins.CreateModelMixin, mixins.UpdateModelMixin, mixins.RetrieveModelMixin,
+                      mixins.DestroyModelMixin):
+    """The viewset to handle creating, updating, showing and deleting Costumers"""
     serializer_class = serializers.CostumerSerializer
     authentication_classes = (TokenAuthentication,)
     permission_classes = (IsAuthenticated,)
-    queryset = models.Costumer.objects.all()
+    queryset = models.Costumer.objects.visible()
+    version_fields = ('updated_at',)
+    last_modified_field = 'updated_at'
 
     def perform_create(self, serializer):
         """To assign the user"""
@@ -246,26 +402,58 @@ class CostumerViewSet(viewsets.GenericViewSet, mixins.CreateModelMixin, mixins.U
         serializer.save(last_update_by=self.request.user)
 
 
-class ContractViewSet(viewsets.GenericViewSet, mixins.CreateModelMixin, mixins.UpdateModelMixin, mixins.ListModelMixin, mixins.RetrieveModelMixin):
-    """The viewset to handle creating and showing contracts"""
+class ContractViewSet(ProjectedQuerysetMixin, ConditionalRetrieveMixin, AsyncDestroyMixin, viewsets.GenericViewSet, mixins.CreateModelMixin, mixins.UpdateModelMixin, mixins.ListModelMixin, mixins.RetrieveModelMixin, mixins.DestroyModelMixin):
+    """The viewset to handle creating, showing and deleting contracts"""
     serializer_class = serializers.ContractSerializer
     authentication_classes = (TokenAuthentication,)
     permission_classes = (IsAuthenticated,)
-    queryset = models.Contract.objects.all()
+    queryset = (models.Contract.objects.visible().filter(costumer__deletion_requested_at__isnull=True)
+                .select_related('costumer'))
+    filter_backends = (filters.ContractFilter,)
+    version_fields = ('version', 'costumer__updated_at')
 
     def perform_create(self, serializer):
         """To assign the user"""
         serializer.save(created_by=self.request.user)
     
     def get_serializer_class(self):
-        if self.action == 'list':
+        if self.action in ('list', 'expiring'):
             return serializers.ContractListSerializer
         if self.action == 'retrieve':
             return serializers.ContractDetailSerializer
+        if self.action == 'renew':
+            return serializers.ContractRenewalSerializer
         return self.serializer_class
 
-
-class ContractPosViewSet(generics.ListCreateAPIView):
+    @action(detail=False)
+    def expiring(self, request):
+        """The contracts not renewed yet ending within `days` (CONTRACT_EXPIRING_DAYS by default), soonest first.
+
+        `expired=true` also lists those already ended."""
+        try:
+            days = int(request.query_params.get('days', settings.CONTRACT_EXPIRING_DAYS))
+        except ValueError:
+            raise ValidationError({'days': 'A whole number is required.'})
+        today = timezone.localdate()
+        contracts = self.filter_queryset(self.get_queryset()).filter(
+            end_date__lte=today + timedelta(days=days), renewals__isnull=True)
+        if request.query_params.get('expired') not in ('true', '1'):
+            contracts = contracts.filter(end_date__gte=today)
+        serializer = self.get_serializer(contracts.order_by('end_date', 'id'), many=True)
+        return Response(serializer.data)
+
+    @action(detail=False, methods=['post'])
+    def renew(self, request):
+        """Renew the listed `contracts` with their POS and service lines in one go"""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        renewals = renewal.renew(serializer.validated_data['contracts'], request.user,
+                                 serializer.validated_data.get('start_date'), serializer.validated_data.get('end_date'))
+        return Response([{'contract': contract, 'renewal': renewals[contract]} for contract in sorted(renewals)],
+                        status=status.HTTP_201_CREATED)
+
+
+class ContractPosViewSet(ProjectedQuerysetMixin, IdempotentCreateMixin, generics.ListCreateAPIView):
     """To see and add poses of a contract"""
     serializer_class = serializers.ContractPosSerializer
     authentication_classes = (TokenAuthentication,)
@@ -274,16 +462,16 @@ class ContractPosViewSet(generics.ListCreateAPIView):
 
     def get_queryset(self):
         contract_id = self.kwargs.get('pk')
-        contract = get_object_or_404(models.Contract, pk=contract_id)
-        return models.ContractPOS.objects.filter(contract=contract)
+        contract = get_contract(contract_id)
+        return models.ContractPOS.objects.filter(contract=contract).select_related('pos__model__company')
     
     def perform_create(self, serializer):
         contract_id = self.kwargs.get('pk')
-        contract = get_object_or_404(models.Contract, pk=contract_id)
+        contract = get_contract(contract_id)
         serializer.save(created_by=self.request.user, contract=contract)
 
 
-class ContractServiceViewSet(generics.ListCreateAPIView):
+class ContractServiceViewSet(ProjectedQuerysetMixin, IdempotentCreateMixin, generics.ListCreateAPIView):
     """To see and add virtual services of a contract"""
     serializer_class = serializers.ContractServiceSerializer
     authentication_classes = (TokenAuthentication,)
@@ -292,16 +480,16 @@ class ContractServiceViewSet(generics.ListCreateAPIView):
 
     def get_queryset(self):
         contract_id = self.kwargs.get('pk')
-        contract = get_object_or_404(models.Contract, pk=contract_id)
-        return models.ContractService.objects.filter(contract=contract)
+        contract = get_contract(contract_id)
+        return models.ContractService.objects.filter(contract=contract).select_related('service')
     
     def perform_create(self, serializer):
         contract_id = self.kwargs.get('pk')
-        contract = get_object_or_404(models.Contract, pk=contract_id)
+        contract = get_contract(contract_id)
         serializer.save(created_by=self.request.user, contract=contract)
 
 
-class CostumerPaperRollViewSet(generics.ListCreateAPIView, generics.DestroyAPIView):
+class CostumerPaperRollViewSet(ProjectedQuerysetMixin, IdempotentCreateMixin, generics.ListCreateAPIView, generics.DestroyAPIView):
     """To list, create and delete PaperRolls of a costumer"""
     serializer_class = serializers.CostumerPaperrollSerializer
     authentication_classes = (TokenAuthentication,)
@@ -310,18 +498,18 @@ class CostumerPaperRollViewSet(generics.ListCreateAPIView, generics.DestroyAPIVi
 
     def get_queryset(self):
         contract_id = self.kwargs.get('pk')
-        contract = get_object_or_404(models.Contract, pk=contract_id)
+        contract = get_contract(contract_id)
         costumer = contract.costumer
         return models.PaperRoll.objects.filter(costumer=costumer)
     
     def perform_create(self, serializer):
         contract_id = self.kwargs.get('pk')
-        contract = get_object_or_404(models.Contract, pk=contract_id)
+        contract = get_contract(contract_id)
         costumer = contract.costumer
         serializer.save(created_by=self.request.user, costumer=costumer)
 
 
-class PaymentViewSet(generics.ListCreateAPIView, generics.DestroyAPIView):
+class PaymentViewSet(ProjectedQuerysetMixin, IdempotentCreateMixin, generics.ListCreateAPIView, generics.DestroyAPIView):
     """To see and add virtual services of a contract"""
     serializer_class = serializers.PaymentSerializer
     authentication_classes = (TokenAuthentication,)
@@ -330,16 +518,16 @@ class PaymentViewSet(generics.ListCreateAPIView, generics.DestroyAPIView):
 
     def get_queryset(self):
         contract_id = self.kwargs.get('pk')
-        contract = get_object_or_404(models.Contract, pk=contract_id)
+        contract = get_contract(contract_id)
         return models.Payment.objects.filter(contract=contract)
     
     def perform_create(self, serializer):
         contract_id = self.kwargs.get('pk')
-        contract = get_object_or_404(models.Contract, pk=contract_id)
+        contract = get_contract(contract_id)
         serializer.save(created_by=self.request.user, contract=contract)
 
 
-class MIDViewSet(generics.ListCreateAPIView, generics.DestroyAPIView):
+class MIDViewSet(ProjectedQuerysetMixin, IdempotentCreateMixin, generics.ListCreateAPIView, generics.DestroyAPIView):
     """To see and add virtual services of a contract"""
     serializer_class = serializers.MIDRevenueSerializer
     authentication_classes = (TokenAuthentication,)
@@ -348,10 +536,144 @@ class MIDViewSet(generics.ListCreateAPIView, generics.DestroyAPIView):
 
     def get_queryset(self):
         contract_id = self.kwargs.get('pk')
-        contract = get_object_or_404(models.Contract, pk=contract_id)
+        contract = get_contract(contract_id)
         return models.MIDRevenue.objects.filter(contract=contract)
     
     def perform_create(self, serializer):
         contract_id = self.kwargs.get('pk')
-        contract = get_object_or_404(models.Contract, pk=contract_id)
-        serializer.save(created_by=self.request.user, contract=contract)
\ No newline at end of file
+        contract = get_contract(contract_id)
+        serializer.save(created_by=self.request.user, contract=contract)
+
+
+class MIDForecastViewSet(ProjectedQuerysetMixin, generics.ListAPIView):
+    """The projected MID revenue of a contract for the next months"""
+    serializer_class = serializers.MIDRevenueForecastSerializer
+    authentication_classes = (TokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+
+    def get_queryset(self):
+        contract = get_contract(self.kwargs.get('pk'))
+        return models.MIDRevenueForecast.objects.filter(contract=contract).order_by('month')
+
+
+class MIDForecastSummaryView(APIView):
+    """The projected MID income and profit of the portfolio per month, for the dashboards.
+
+    POST queues a recompute of the contracts changed since the last one, or of all
+    the contracts when `full` is true."""
+    authentication_classes = (TokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request):
+        months = (models.MIDRevenueForecast.objects
+                  .filter(contract__deletion_requested_at__isnull=True,
+                          contract__costumer__deletion_requested_at__isnull=True)
+                  .values('month').annotate(income=Sum('income'), profit=Sum('profit'), contracts=Count('id'))
+                  .order_by('month'))
+        return Response(list(months))
+
+    def post(self, request):
+        full = str(request.data.get('full', '')).lower() in ('1', 'true')
+        job = jobs.enqueue(tasks.forecast_mid_revenues, full, created_by=request.user)
+        location = reverse('core:job-detail', args=[job.id], request=request)
+        return Response({'job': job.id, 'status': location}, status=status.HTTP_202_ACCEPTED,
+                        headers={'Location': location})
+
+
+class SyncView(APIView):
+    """The changes of the synced models since a cursor, for the offline clients.
+
+    `since` is the `next` of the previous page (0 for a first sync). Every changed
+    object is sent once with its current fields, or as a tombstone once deleted.
+    A cursor from before the last pruned tombstones gets 410 Gone, the client has
+    to sync again from 0."""
+    authentication_classes = (TokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+    default_limit = 500
+    max_limit = 1000
+
+    def get_int_param(self, name, default):
+        try:
+            value = int(self.request.query_params.get(name, default))
+        except ValueError:
+            raise ValidationError({name: 'A whole number is required.'})
+        if value < 0:
+            raise ValidationError({name: 'Must not be negative.'})
+        return value
+
+    def get(self, request):
+        try:
+            since = sync.parse_cursor(request.query_params.get('since', '0'))
+        except ValueError:
+            raise ValidationError({'since': 'The next of the previous page is required.'})
+        limit = min(self.get_int_param('limit', self.default_limit) or self.default_limit, self.max_limit)
+        if sync.is_pruned(since):
+            return Response({'detail': 'The changes since this cursor were pruned, sync again from 0.'},
+                            status=status.HTTP_410_GONE)
+        changes = list(sync.changes_after(since)
+                       .values_list('txid', 'seq', 'model', 'object_id', 'action')[:limit + 1])
+        has_more = len(changes) > limit
+        changes = changes[:limit]
+
+        latest = {}
+        for _, seq, model_name, object_id, change_action in changes:
+            latest.pop((model_name, object_id), None)
+            latest[(model_name, object_id)] = (seq, change_action)
+
+        synced = {model._meta.model_name: model for model in sync.SYNCED_MODELS}
+        rows = {}
+        for model_name, model in synced.items():
+            ids = [object_id for (name, object_id), (_, change_action) in latest.items()
+                   if name == model_name and change_action != 'D']
+            if ids:
+                serializer = serializers.sync_serializer(model)
+                for instance in model.objects.filter(pk__in=ids):
+                    rows[(model_name, instance.pk)] = serializer(instance).data
+
+        results = []
+        for key, (seq, _) in latest.items():
+            data = rows.get(key)
+            results.append({
+                'seq': seq,
+                'model': key[0],
+                'id': key[1],
+                'deleted': data is None,
+                'data': data,
+            })
+        return Response({
+            'next': sync.format_cursor(changes[-1][:2] if changes else since),
+            'has_more': has_more,
+            'results': results,
+        })
+
+
+class SearchView(APIView):
+    """Full-text search over the costumers, goals and POSes, best matches first.
+
+    `q` is the text searched, `model` a comma separated list of costumer, goal and
+    pos to search only those, and `status` restricts the goals to one status. Each
+    result has its rank (none without PostgreSQL) and a snippet with the matched
+    words in <mark> tags."""
+    authentication_classes = (TokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+    default_limit = 20
+    max_limit = 100
+
+    def get(self, request):
+        params = request.query_params
+        query = params.get('q', '').strip()
+        if not query:
+            raise ValidationError({'q': 'The text to search is required.'})
+        model_names = {name.strip() for name in params.get('model', '').split(',') if name.strip()}
+        unknown = model_names - set(search.TARGETS)
+        if unknown:
+            raise ValidationError({'model': 'Unknown models: %s.' % ', '.join(sorted(unknown))})
+        goal_status = params.get('status')
+        if goal_status and goal_status not in dict(models.MarketingGoal.status_choices):
+            raise ValidationError({'status': 'Not a goal status.'})
+        try:
+            limit = int(params.get('limit', self.default_limit))
+        except ValueError:
+            raise ValidationError({'limit': 'A whole number is required.'})
+        limit = min(max(limit, 1), self.max_limit)
+        return Response({'results': search.search(query, model_names, limit, goal_status)})
@@ -0,0 +1,8 @@
+"""Scenario based HTTP load test suite for the API.
+
+Seed a local database first, start the server, then run for example:
+
+    python manage.py seed_loadtest
+    python -m loadtest --base-url http://localhost:8000 --users 20 --duration 60 \\
+        --output run.json --baseline baseline.json
+"""
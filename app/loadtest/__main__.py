@@ -0,0 +1,55 @@
+import argparse
+import sys
+import threading
+import time
+
+from loadtest import report
+from loadtest.scenarios import run_user
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog='python -m loadtest', description='Run the API load test scenarios.')
+    parser.add_argument('--base-url', default='http://localhost:8000')
+    parser.add_argument('--username', default='loadtest')
+    parser.add_argument('--password', default='loadtest1234')
+    parser.add_argument('--users', type=int, default=10, help='concurrent virtual users')
+    parser.add_argument('--duration', type=float, default=60, help='seconds to run')
+    parser.add_argument('--think-time', type=float, default=0, help='maximum pause between scenarios')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='write the JSON report to this file')
+    parser.add_argument('--baseline', help='JSON report of an earlier run to compare with')
+    parser.add_argument('--max-regression', type=float, default=0.2,
+                        help='allowed relative p95 increase against the baseline')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    samples = []
+    start = time.monotonic()
+    deadline = start + args.duration
+    users = [
+        threading.Thread(target=run_user, args=(args.base_url, args.username, args.password, deadline,
+                                                samples, args.seed + index, args.think_time))
+        for index in range(args.users)
+    ]
+    for user in users:
+        user.start()
+    for user in users:
+        user.join()
+
+    result = report.summarize(samples, time.monotonic() - start)
+    print(report.format_table(result))
+    if args.output:
+        report.dump(result, args.output)
+    if args.baseline:
+        regressions = report.compare(result, report.load(args.baseline), args.max_regression)
+        for regression in regressions:
+            print('REGRESSION ' + regression)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,72 @@
+import json
+import math
+
+
+def percentile(values, fraction):
+    """Return the percentile of the sorted values, interpolating between neighbours"""
+    if not values:
+        return None
+    position = (len(values) - 1) * fraction
+    lower = math.floor(position)
+    upper = math.ceil(position)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def summarize(samples, duration):
+    """Build the report of a run from its (endpoint, latency seconds, ok) samples"""
+    by_endpoint = {}
+    for endpoint, latency, ok in samples:
+        by_endpoint.setdefault(endpoint, []).append((latency, ok))
+    by_endpoint['TOTAL'] = [(latency, ok) for _, latency, ok in samples]
+
+    endpoints = {}
+    for endpoint, results in sorted(by_endpoint.items()):
+        latencies = sorted(latency * 1000 for latency, _ in results)
+        errors = sum(1 for _, ok in results if not ok)
+        endpoints[endpoint] = {
+            'requests': len(results),
+            'errors': errors,
+            'error_rate': errors / len(results) if results else 0.0,
+            'throughput': len(results) / duration if duration else 0.0,
+            'p50_ms': percentile(latencies, 0.50),
+            'p95_ms': percentile(latencies, 0.95),
+            'p99_ms': percentile(latencies, 0.99),
+        }
+    return {'duration': duration, 'endpoints': endpoints}
+
+
+def compare(report, baseline, max_regression):
+    """Return the endpoints whose p95 or error rate regressed against the baseline"""
+    regressions = []
+    for endpoint, stats in report['endpoints'].items():
+        before = baseline['endpoints'].get(endpoint)
+        if before is None:
+            continue
+        if before['p95_ms'] and stats['p95_ms'] > before['p95_ms'] * (1 + max_regression):
+            regressions.append('%s p95 %.1f ms -> %.1f ms' % (endpoint, before['p95_ms'], stats['p95_ms']))
+        if stats['error_rate'] > before['error_rate'] + max_regression / 10:
+            regressions.append('%s error rate %.2f%% -> %.2f%%'
+                               % (endpoint, before['error_rate'] * 100, stats['error_rate'] * 100))
+    return regressions
+
+
+def format_table(report):
+    """Return the report as a fixed width text table"""
+    lines = ['%-45s %8s %8s %8s %9s %9s %9s' % ('endpoint', 'requests', 'req/s', 'errors',
+                                                'p50 ms', 'p95 ms', 'p99 ms')]
+    for endpoint, stats in report['endpoints'].items():
+        lines.append('%-45s %8d %8.1f %7.2f%% %9.1f %9.1f %9.1f' % (
+            endpoint, stats['requests'], stats['throughput'], stats['error_rate'] * 100,
+            stats['p50_ms'] or 0, stats['p95_ms'] or 0, stats['p99_ms'] or 0
+        ))
+    return '\n'.join(lines)
+
+
+def load(path):
+    with open(path) as report_file:
+        return json.load(report_file)
+
+
+def dump(report, path):
+    with open(path, 'w') as report_file:
+        json.dump(report, report_file, indent=2, sort_keys=True)
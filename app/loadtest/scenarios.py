@@ -0,0 +1,138 @@
+import json
+import random
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+
+class Client:
+    """Minimal JSON HTTP client recording the latency of every request by endpoint"""
+
+    def __init__(self, base_url, samples, timeout=30):
+        self.base_url = base_url.rstrip('/')
+        self.samples = samples
+        self.timeout = timeout
+        self.token = None
+
+    def request(self, method, path, endpoint, data=None):
+        """Send the request and return the decoded JSON body, or None if it failed"""
+        body = json.dumps(data).encode() if data is not None else None
+        request = urllib.request.Request(self.base_url + path, data=body, method=method)
+        request.add_header('Accept', 'application/json')
+        if body is not None:
+            request.add_header('Content-Type', 'application/json')
+        if self.token:
+            request.add_header('Authorization', 'Token ' + self.token)
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                content = response.read()
+                ok = True
+        except (urllib.error.URLError, OSError):
+            content = None
+            ok = False
+        self.samples.append(('%s %s' % (method, endpoint), time.perf_counter() - start, ok))
+        if not content:
+            return None
+        return json.loads(content)
+
+
+class Session:
+    """One virtual staff member walking through the API"""
+
+    def __init__(self, client, username, password, rng):
+        self.client = client
+        self.username = username
+        self.password = password
+        self.rng = rng
+        self.contract_ids = []
+        self.goal_ids = []
+
+    def login(self):
+        data = self.client.request('POST', '/api/admins/token/', '/api/admins/token/',
+                                   {'username': self.username, 'password': self.password})
+        self.client.token = data['token'] if data else None
+        return self.client.token is not None
+
+    def browse_contracts(self):
+        contracts = self.client.request('GET', '/api/crm/contracts/', '/api/crm/contracts/')
+        if contracts:
+            self.contract_ids = [contract['id'] for contract in contracts]
+
+    def open_contract(self):
+        contract_id = self.pick_contract()
+        if contract_id is None:
+            return
+        self.client.request('GET', '/api/crm/contracts/%d/' % contract_id, '/api/crm/contracts/{id}/')
+        for resource in ('pos', 'service', 'paperroll', 'payment', 'mid'):
+            self.client.request('GET', '/api/crm/contracts/%d/%s/' % (contract_id, resource),
+                                '/api/crm/contracts/{id}/%s/' % resource)
+
+    def create_payment(self):
+        contract_id = self.pick_contract()
+        if contract_id is None:
+            return
+        self.client.request('POST', '/api/crm/contracts/%d/payment/' % contract_id,
+                            '/api/crm/contracts/{id}/payment/',
+                            {'date': '2021-01-01T12:00:00Z', 'direct_debit_cost': '12.00'})
+
+    def create_mid_revenue(self):
+        contract_id = self.pick_contract()
+        if contract_id is None:
+            return
+        self.client.request('POST', '/api/crm/contracts/%d/mid/' % contract_id, '/api/crm/contracts/{id}/mid/',
+                            {'date': '2021-01-01T12:00:00Z', 'income': '120.00', 'profit': '30.00'})
+
+    def update_goal(self):
+        if not self.goal_ids:
+            goals = self.client.request('GET', '/api/crm/goals/', '/api/crm/goals/')
+            self.goal_ids = [goal['id'] for goal in goals or []]
+        if not self.goal_ids:
+            return
+        goal_id = self.rng.choice(self.goal_ids)
+        self.client.request('PATCH', '/api/crm/goals/%d/' % goal_id, '/api/crm/goals/{id}/',
+                            {'status': self.rng.choice('ARWP')})
+
+    def search_costumers(self):
+        # names, postcodes and streets of the seeded costumers, and a word matching none
+        term = self.rng.choice((
+            'Merchant %d' % self.rng.randrange(1000),
+            'Load Test Merchant',
+            'LT%d' % self.rng.randrange(90),
+            'High Street',
+            'Director %d' % self.rng.randrange(1000),
+            'Bakery',
+        ))
+        query = urllib.parse.urlencode({'q': term, 'model': 'costumer'})
+        self.client.request('GET', '/api/crm/search/?' + query, '/api/crm/search/')
+
+    def pick_contract(self):
+        if not self.contract_ids:
+            self.browse_contracts()
+        return self.rng.choice(self.contract_ids) if self.contract_ids else None
+
+
+# Relative weight of every flow, roughly how often the sales staff do it
+SCENARIOS = (
+    ('browse_contracts', 20),
+    ('open_contract', 30),
+    ('create_payment', 10),
+    ('create_mid_revenue', 10),
+    ('update_goal', 15),
+    ('search_costumers', 15),
+)
+
+
+def run_user(base_url, username, password, deadline, samples, seed, think_time):
+    """Log in and run weighted random scenarios until the deadline"""
+    rng = random.Random(seed)
+    session = Session(Client(base_url, samples), username, password, rng)
+    if not session.login():
+        return
+    names = [name for name, _ in SCENARIOS]
+    weights = [weight for _, weight in SCENARIOS]
+    while time.monotonic() < deadline:
+        getattr(session, rng.choices(names, weights)[0])()
+        if think_time:
+            time.sleep(rng.uniform(0, think_time))
@@ -0,0 +1,32 @@
+from django.test import SimpleTestCase
+
+from loadtest import report
+
+
+class ReportTest(SimpleTestCase):
+    """Test the load test report"""
+
+    def test_percentile(self):
+        """Test the interpolated percentiles"""
+        values = [float(value) for value in range(1, 101)]
+        self.assertEqual(report.percentile(values, 0.5), 50.5)
+        self.assertAlmostEqual(report.percentile(values, 0.99), 99.01)
+        self.assertIsNone(report.percentile([], 0.5))
+
+    def test_summarize(self):
+        """Test the per endpoint throughput, error rate and latency"""
+        samples = [('GET /a/', 0.1, True), ('GET /a/', 0.3, False), ('POST /b/', 0.2, True)]
+        result = report.summarize(samples, 2)
+        self.assertEqual(result['endpoints']['GET /a/']['requests'], 2)
+        self.assertEqual(result['endpoints']['GET /a/']['error_rate'], 0.5)
+        self.assertEqual(result['endpoints']['GET /a/']['throughput'], 1)
+        self.assertAlmostEqual(result['endpoints']['GET /a/']['p50_ms'], 200)
+        self.assertEqual(result['endpoints']['TOTAL']['requests'], 3)
+
+    def test_compare(self):
+        """Test that p95 and error rate regressions against the baseline are reported"""
+        baseline = report.summarize([('GET /a/', 0.1, True)] * 10, 1)
+        same = report.summarize([('GET /a/', 0.11, True)] * 10, 1)
+        slower = report.summarize([('GET /a/', 0.2, True)] * 9 + [('GET /a/', 0.2, False)], 1)
+        self.assertEqual(report.compare(same, baseline, 0.2), [])
+        self.assertEqual(len(report.compare(slower, baseline, 0.2)), 4)